@@ -0,0 +1,314 @@
+"""
+型付きの設定 (config.json) と変更通知
+
+値は読み込み時と変更時に1回だけ検証し、以降は検証済みの値をそのまま参照する。
+変更は項目ごとに登録した通知先 (定期解放のスケジューラ、除外リスト、閾値など) へ配信し、
+ファイルへの書き込みは変更が落ち着いてから一時ファイルへの書き出しと置き換えで行う
+(書き込み中に終了しても config.json が壊れない)。
+
+    config = AppConfig("config.json")
+    config.subscribe(("warning_threshold",), lambda changed: print(changed["warning_threshold"]))
+    config.load()
+    config.set("warning_threshold", 85)
+    config.flush()
+"""
+import os
+import json
+import logging
+import tempfile
+import threading
+from cgroup_reclaimer import DEFAULT_CGROUP_ROOT
+from single_instance import DEFAULT_PORT
+from numa import DEFAULT_NODE_ROOT
+from ksm_manager import DEFAULT_KSM_ROOT
+
+
+class Field:
+    """設定の1項目 (型、既定値、範囲)"""
+    __slots__ = ("key", "kind", "default", "minimum", "maximum", "choices")
+
+    def __init__(self, key, kind, default, minimum=None, maximum=None, choices=None):
+        self.key = key
+        self.kind = kind # bool / int / float / str / list
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+
+    def coerce(self, value):
+        """
+        値を検証して型をそろえる (画面の入力値の文字列も受け付ける)
+        Raises:
+            ValueError: 型または範囲が不正な場合
+        """
+        if self.kind is bool:
+            if isinstance(value, bool):
+                return value
+            if value in (0, 1):
+                return bool(value)
+            raise ValueError(f"{self.key} must be true or false")
+        if self.kind is list:
+            if not isinstance(value, (list, tuple)):
+                raise ValueError(f"{self.key} must be a list")
+            return list(value)
+        if self.kind is str:
+            if not isinstance(value, str):
+                raise ValueError(f"{self.key} must be a string")
+            value = value.strip()
+        else:
+            if isinstance(value, bool):
+                raise ValueError(f"{self.key} must be a number")
+            try:
+                value = self.kind(value.strip() if isinstance(value, str) else value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{self.key} must be {'an integer' if self.kind is int else 'a number'}")
+            if self.minimum is not None and value < self.minimum:
+                raise ValueError(f"{self.key} must be at least {self.minimum}")
+            if self.maximum is not None and value > self.maximum:
+                raise ValueError(f"{self.key} must be at most {self.maximum}")
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"{self.key} must be one of {', '.join(self.choices)}")
+        return value
+
+
+# config.json の項目 (画面やコンポーネントが追加した項目もここに定義する)
+FIELDS = (
+    Field("warning_threshold", int, 80, 1, 100),
+    Field("auto_free_interval", int, 1, 1),
+    Field("topmost", bool, False),
+    Field("start_minimized", bool, False),
+    Field("shortcut_key", str, ""),
+    Field("exclusion_list", list, []),
+    Field("flash_color", str, "lightblue"),
+    Field("warning_color", str, "tomato"),
+    Field("cgroup_root", str, DEFAULT_CGROUP_ROOT),
+    Field("cgroup_policies", list, []),
+    Field("process_rules", list, []),
+    Field("memory_accounting", str, "auto", choices=("auto", "host", "cgroup")),
+    Field("fast_clean", bool, False),
+    Field("low_priority_standby_only", bool, False),
+    Field("leak_target_only", bool, False),
+    Field("group_apps", bool, True),
+    Field("ksm_mode", bool, False),
+    Field("low_footprint_tray", bool, False),
+    Field("predictive_free", bool, False),
+    Field("forecast_horizon_sec", float, 120.0, 1),
+    Field("sampling_max_interval_sec", float, 60.0, 1),
+    Field("battery_slowdown", float, 2.0, 1),
+    Field("leak_cap_mb", float, 0.0, 0),
+    Field("auto_exclusions", list, []),
+    Field("ipc_port", int, DEFAULT_PORT, 1, 65535),
+    Field("control_port", int, 0, 0, 65535),
+    Field("numa_threshold", float, 0.0, 0, 100),
+    Field("swap_cache_only_percent", float, 80.0, 0, 100),
+    Field("swap_abort_percent", float, 95.0, 0, 100),
+    Field("swap_cache_only_mb_s", float, 8.0, 0),
+    Field("swap_abort_mb_s", float, 64.0, 0),
+    Field("numa_root", str, DEFAULT_NODE_ROOT),
+    Field("ksm_root", str, DEFAULT_KSM_ROOT),
+    Field("control_bind", str, "127.0.0.1"),
+    Field("control_token", str, ""),
+    Field("cooperative_grace_sec", float, 2.0, 0),
+    Field("launch_rules", list, []),
+    Field("trace_file", str, ""),
+)
+
+
+class AppConfig:
+    """
+    検証済みの設定を保持し、変更を通知先に配信して config.json に保存するクラス
+    通知は変更した呼び出し元のスレッドで行う (GUI ではメインスレッドから変更する)
+    """
+    def __init__(self, path, save_delay=1.0):
+        """
+        Args:
+            path (str): 設定ファイルのパス
+            save_delay (float): 最後の変更から書き込むまでの待ち時間 (秒、続けて変更した場合は1回にまとめる)
+        """
+        self.path = path
+        self.save_delay = save_delay
+        self.fields = {field.key: field for field in FIELDS}
+        self.logger = logging.getLogger("MemoryCleaner")
+        self._values = {key: self._copy(field.default) for key, field in self.fields.items()}
+        self._extra = {} # 未知の項目 (新しいバージョンで追加された項目などは、そのまま書き戻す)
+        self._subscribers = [] # (項目の集合 (None はすべて), 通知先)
+        self._lock = threading.Lock() # 値の更新と書き込み用スレッドの排他
+        self._write_lock = threading.Lock() # 書き込みの順序 (古い内容で新しい内容を上書きしない)
+        self._timer = None
+        self._read_only = False # 読み込めなかったファイルを上書きしないよう、書き込みを止めている
+
+    @staticmethod
+    def _copy(value):
+        return list(value) if isinstance(value, list) else value
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def as_dict(self):
+        """保存する内容 (未知の項目を含む) を返す"""
+        with self._lock:
+            data = dict(self._extra)
+            data.update((key, self._copy(value)) for key, value in self._values.items())
+            return data
+
+    def subscribe(self, keys, callback):
+        """
+        変更の通知先を登録する
+        Args:
+            keys (iterable): 通知を受ける項目 (None の場合はすべての項目)
+            callback (callable): (変更された項目 -> 新しい値の dict) -> None
+        """
+        self._subscribers.append((None if keys is None else frozenset(keys), callback))
+
+    def set(self, key, value):
+        """1つの項目を変更する (変更があった場合 True)"""
+        return key in self.update({key: value})
+
+    def update(self, values, persist=True):
+        """
+        複数の項目をまとめて変更する (すべて検証してから反映する)
+        Args:
+            values (dict): 項目 -> 値
+            persist (bool): False の場合はファイルに書き込まない
+        Returns:
+            dict: 実際に変更された項目 -> 新しい値
+        Raises:
+            ValueError: 未知の項目や不正な値を含む場合 (何も変更しない)
+        """
+        coerced = {}
+        for key, value in values.items():
+            field = self.fields.get(key)
+            if field is None:
+                raise ValueError(f"unknown setting: {key}")
+            coerced[key] = field.coerce(value)
+        with self._lock:
+            changed = {key: value for key, value in coerced.items() if self._values[key] != value}
+            self._values.update(changed)
+        if changed:
+            self._notify(changed)
+            if persist:
+                self.schedule_save()
+        return changed
+
+    def _notify(self, changed):
+        # リストは通知先ごとに複製して渡す (通知先が変更しても設定の値と他の通知先に影響しない)
+        for keys, callback in list(self._subscribers):
+            subset = {key: self._copy(value) for key, value in changed.items() if keys is None or key in keys}
+            if not subset:
+                continue
+            try:
+                callback(subset)
+            except Exception as e:
+                # 1つの通知先の失敗で他の通知先への配信を止めない
+                self.logger.info(f"Config: failed to apply {', '.join(subset)}: {e}")
+
+    def load(self):
+        """
+        設定ファイルを読み込み、すべての通知先に現在の値を配信する
+        不正な値の項目は既定値を使い、ログに記録する
+        Returns:
+            bool: 読み込めた場合、またはファイルがなく既定値で作成できた場合 True
+                (解析できない・読み込めない場合は既定値で動作して False)
+        """
+        data = None
+        loaded = False
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("top level must be an object")
+            loaded = True
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            # 壊れたファイルは別名で残してから既定値で動作する (退避できない場合は上書きしない)
+            self.logger.info(f"Config: cannot parse {self.path}, using defaults: {e}")
+            self._set_aside()
+            data = {}
+        except OSError as e:
+            # 読み込めないファイルは上書きせず、既定値で動作する
+            self.logger.info(f"Config: cannot read {self.path}, using defaults and not saving: {e}")
+            self._read_only = True
+            data = {}
+
+        values = {}
+        for key, value in (data or {}).items():
+            field = self.fields.get(key)
+            if field is None:
+                self._extra[key] = value
+                continue
+            try:
+                values[key] = field.coerce(value)
+            except ValueError as e:
+                self.logger.info(f"Config: {e}, using default {field.default!r}")
+        with self._lock:
+            self._values.update(values)
+        self._notify(dict(self._values))
+        if data is None:
+            loaded = self.flush()
+        return loaded
+
+    def _set_aside(self):
+        """解析できない設定ファイルを config.json.corrupt に移す"""
+        backup = self.path + ".corrupt"
+        try:
+            os.replace(self.path, backup)
+            self.logger.info(f"Config: kept the unreadable file as {backup}")
+        except OSError as e:
+            self.logger.info(f"Config: cannot move {self.path} aside, not saving: {e}")
+            self._read_only = True
+
+    def reset(self):
+        """すべての項目を既定値に戻す (未知の項目は残す)"""
+        return self.update({key: self._copy(field.default) for key, field in self.fields.items()})
+
+    def schedule_save(self):
+        """save_delay 秒後に書き込む (待っている間に変更された場合は待ち直す)"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """
+        待っている書き込みをすぐに行う (終了時にも呼び出す)
+        読み込めなかった設定ファイルを退避できなかった場合は、上書きしないよう何もしない
+        Returns:
+            bool: 書き込めた場合 True
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if self._read_only:
+            return False
+        with self._write_lock:
+            return self._write(self.as_dict())
+
+    def _write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            # 同じディレクトリの一時ファイルに書き出してから置き換える (置き換えは同じファイルシステム内で不可分)
+            fd, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+        except OSError as e:
+            self.logger.info(f"Config: failed to save {self.path}: {e}")
+            return False
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            return True
+        except OSError as e:
+            self.logger.info(f"Config: failed to save {self.path}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
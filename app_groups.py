@@ -0,0 +1,194 @@
+import os
+import logging
+import psutil
+
+# 複数のアプリの実行ファイルが置かれる共有のディレクトリ (同じディレクトリでも別のアプリとして扱う)
+if os.name == 'nt':
+    _system_root = os.environ.get("SystemRoot", r"C:\Windows")
+    SHARED_DIRS = {os.path.normcase(path) for path in (
+        _system_root, os.path.join(_system_root, "System32"), os.path.join(_system_root, "SysWOW64"),
+    )}
+else:
+    SHARED_DIRS = {"/bin", "/sbin", "/usr/bin", "/usr/sbin", "/usr/local/bin", "/usr/local/sbin",
+                   "/usr/libexec", "/usr/lib", "/snap/bin"}
+
+# 端末エミュレーターとシェル (これらを含む scope は、端末から起動したすべてのコマンドを含むため scope ではまとめない)
+TERMINAL_NAMES = frozenset((
+    "gnome-terminal-server", "kgx", "ptyxis-agent", "konsole", "xfce4-terminal", "mate-terminal", "lxterminal",
+    "tilix", "terminator", "xterm", "urxvt", "alacritty", "kitty", "wezterm-gui", "foot", "st",
+    "bash", "zsh", "fish", "sh", "dash", "ksh", "tcsh", "csh", "nu", "pwsh", "tmux: server", "screen",
+))
+
+
+def read_app_scope(pid, proc_root="/proc"):
+    """
+    プロセスが属する systemd のアプリ用 scope (app-*.scope, snap.*.scope) を返す
+    デスクトップ環境はアプリの起動ごとに scope を作るため、子プロセスが別の親に付け替えられても同じアプリとしてまとめられる
+    Returns:
+        str or None: cgroup のパス (アプリ用の scope に属さない場合は None)
+    """
+    try:
+        with open(f"{proc_root}/{pid}/cgroup", "r") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        # cgroup v2 の行は "0::/user.slice/.../app.slice/app-firefox-1234.scope"
+        if not line.startswith("0::"):
+            continue
+        path = line[3:]
+        leaf = path.rsplit("/", 1)[-1]
+        if leaf.endswith(".scope") and (leaf.startswith("app-") or leaf.startswith("snap.")):
+            return path
+    return None
+
+
+class AppGroup:
+    """同じアプリに属するプロセスのまとまり"""
+    __slots__ = ("key", "name", "root_pid", "pids", "rss", "source")
+
+    def __init__(self, key, source):
+        self.key = key
+        self.name = "" # 代表のプロセス (グループ内に親を持たないプロセス) の名前
+        self.root_pid = None
+        self.pids = []
+        self.rss = 0 # 常駐メモリの合計 (バイト)
+        self.source = source # "tree" (親子関係と実行ファイル) / "cgroup" (アプリ用の scope)
+
+
+class AppGrouper:
+    """
+    プロセスをアプリ単位 (ブラウザやIDEの本体とヘルパープロセス) にまとめるクラス
+    子プロセスは、親と同じ実行ファイル、または親の実行ファイルと同じディレクトリ (その下) の実行ファイルであれば親と同じグループに入る
+    Linux では systemd のアプリ用 scope に属するプロセスを scope ごとにまとめる
+    (端末エミュレーターやシェルを含む scope は、端末から起動した別々のコマンドを1つにまとめてしまうため、親子関係と実行ファイルで判定する)
+    (Windows のジョブオブジェクトは外部のプロセスから所属を調べられないため、親子関係と実行ファイルで判定する)
+    グループはプロセス一覧の取得ごとに1回作り直し、実行ファイルと scope はプロセスごとに1回だけ読み取る
+    """
+    def __init__(self, proc_root="/proc"):
+        """
+        Args:
+            proc_root (str): procfs のルート (Linux)
+        """
+        self.proc_root = proc_root
+        self.enabled = True
+        self.groups = {} # グループのキー -> AppGroup
+        self._group_of = {} # pid -> AppGroup
+        self._info = {} # pid -> (親の pid, プロセス名, 実行ファイル, scope)
+        self.logger = logging.getLogger("MemoryCleaner")
+
+    def __len__(self):
+        return len(self.groups)
+
+    def _exe(self, pid):
+        if os.name != 'nt':
+            try:
+                return os.readlink(f"{self.proc_root}/{pid}/exe")
+            except OSError:
+                return None
+        try:
+            return psutil.Process(pid).exe() or None
+        except psutil.Error:
+            return None
+
+    def _resolve(self, pid, ppid, name):
+        """プロセスの情報を返す (親と名前が変わらない限り前回の読み取り結果を使う)"""
+        info = self._info.get(pid)
+        if info is not None and info[0] == ppid and info[1] == name:
+            return info
+        exe = self._exe(pid)
+        scope = read_app_scope(pid, self.proc_root) if os.name != 'nt' else None
+        return (ppid, name, os.path.normcase(exe) if exe else None, scope)
+
+    def _joins_parent(self, info, parent):
+        """子プロセスが親と同じアプリに属するかどうか"""
+        exe, parent_exe = info[2], parent[2]
+        if exe is None or parent_exe is None:
+            # 実行ファイルを読み取れない (権限がない) 場合は名前で判定する
+            return info[1] == parent[1]
+        if exe == parent_exe:
+            return True
+        parent_dir = os.path.dirname(parent_exe)
+        if parent_dir in SHARED_DIRS:
+            return False
+        child_dir = os.path.dirname(exe)
+        return child_dir == parent_dir or child_dir.startswith(parent_dir + os.sep)
+
+    def update(self, processes, parents):
+        """
+        プロセス一覧からグループを作り直す
+        Args:
+            processes (list): (pid, プロセス名, RSS バイト) のリスト
+            parents (dict): pid -> 親の pid
+        """
+        if not self.enabled:
+            self.groups = {}
+            self._group_of = {}
+            self._info = {}
+            return
+        info = {}
+        for pid, name, _ in processes:
+            info[pid] = self._resolve(pid, parents.get(pid), name)
+        self._info = info
+
+        # 端末の scope に属するプロセスは scope を持たないものとして扱う
+        terminal_scopes = {scope for _, name, _, scope in info.values() if scope is not None and name in TERMINAL_NAMES}
+        if terminal_scopes:
+            info = {pid: (i[0], i[1], i[2], None) if i[3] in terminal_scopes else i for pid, i in info.items()}
+
+        # 親をたどってグループの起点 (同じアプリに属さない親を持つプロセス) を求める
+        roots = {}
+        for pid in info:
+            chain = []
+            current = pid
+            while current not in roots:
+                chain.append(current)
+                current_info = info[current]
+                ppid = current_info[0]
+                parent = info.get(ppid)
+                if (parent is None or ppid == current or ppid in chain or current_info[3] is not None
+                        or not self._joins_parent(current_info, parent)):
+                    roots[current] = current
+                    break
+                current = ppid
+            root = roots[current]
+            for member in chain:
+                roots[member] = root
+
+        groups = {}
+        group_of = {}
+        for pid, name, rss in processes:
+            scope = info[pid][3]
+            key = ("cgroup", scope) if scope is not None else ("tree", roots[pid])
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = AppGroup(key, key[0])
+            group.pids.append(pid)
+            group.rss += rss or 0
+            group_of[pid] = group
+        # 代表はグループ内に親を持たないプロセス (複数ある場合は pid の小さいもの)
+        for pid, name, _ in processes:
+            group = group_of[pid]
+            if group_of.get(info[pid][0]) is not group and (group.root_pid is None or pid < group.root_pid):
+                group.root_pid = pid
+                group.name = name
+        names = {pid: name for pid, name, _ in processes}
+        for group in groups.values():
+            if group.root_pid is None:
+                group.root_pid = min(group.pids)
+                group.name = names[group.root_pid]
+        self.groups = groups
+        self._group_of = group_of
+
+    def group_of(self, pid):
+        """プロセスが属するグループを返す (一覧にない場合は None)"""
+        return self._group_of.get(pid)
+
+    def group_name(self, pid, default=None):
+        """プロセスが属するグループの名前を返す (一覧にない場合は default)"""
+        group = self._group_of.get(pid)
+        return group.name if group is not None else default
+
+    def multi_process_groups(self):
+        """複数のプロセスからなるグループを常駐メモリの多い順に返す"""
+        return sorted((g for g in self.groups.values() if len(g.pids) > 1), key=lambda g: g.rss, reverse=True)
@@ -1,5 +1,8 @@
+import time
 import threading
 from tkinter import messagebox
+from sampling_policy import coalesce_delay
+from numa import pressured_node, reclaim_budget
 
 class AutoFreeScheduler:
     """
@@ -13,6 +16,24 @@ class AutoFreeScheduler:
         self.app = app
         self.is_running = False
         self.job_id = None
+        self.predictive_cooldown_sec = 60 # 予測による解放の最短間隔 (秒)
+        self.predictive_margin = 5 # 予測による解放で、警告閾値からさらに下げる使用率 (ポイント)
+        self.predictive_min_budget_mb = 256 # 予測による解放の解放量の目安の下限 (MB)
+        self._last_predictive = None
+        self.numa_cooldown_sec = 60 # NUMA ノードの回収の最短間隔 (秒)
+        self._last_numa = None
+        app.config.subscribe(("auto_free_interval", "forecast_horizon_sec"), self._on_config_changed)
+
+    def _on_config_changed(self, changed):
+        """間隔の変更は実行中の定期解放に、予測範囲の変更は予測に反映する"""
+        if "forecast_horizon_sec" in changed:
+            self.app.forecaster.set_horizon(changed["forecast_horizon_sec"])
+        if "auto_free_interval" in changed and self.is_running:
+            # 次の実行を新しい間隔で予約し直す
+            if self.job_id:
+                self.app.root.after_cancel(self.job_id)
+            delay = coalesce_delay(changed["auto_free_interval"] * 60 * 1000, self.app.sampling_policy.granularity(visible=False))
+            self.job_id = self.app.root.after(delay, lambda: self._loop(changed["auto_free_interval"]))
 
     def toggle(self):
         """定期解放の開始/停止を切り替える"""
@@ -20,15 +41,10 @@ class AutoFreeScheduler:
             self.stop()
             messagebox.showinfo("停止", "定期解放を停止しました。")
         else:
-            try:
-                interval_min = int(self.app.interval_var.get())
-                if interval_min <= 0:
-                    messagebox.showwarning("入力エラー", "間隔は正の整数で指定してください。")
-                    return
-                self.start(interval_min)
-                messagebox.showinfo("開始", f"{interval_min}分ごとの定期解放を開始しました。")
-            except ValueError:
-                messagebox.showwarning("入力エラー", "間隔は半角数字で入力してください。")
+            # 設定の間隔は検証済み (入力欄の不正な値は反映されず、直前の有効な値が使われる)
+            interval_min = self.app.config["auto_free_interval"]
+            self.start(interval_min)
+            messagebox.showinfo("開始", f"{interval_min}分ごとの定期解放を開始しました。")
 
     def start(self, interval_min):
         """定期解放を開始する"""
@@ -52,17 +68,113 @@ class AutoFreeScheduler:
         if not self.is_running:
             return
         
-        self.app.flash_window()
-        threading.Thread(target=self._task, daemon=True).start()
+        # 手動解放などの実行中はこの回を見送る
+        if not self.app.is_freeing:
+            self.app.is_freeing = True
+            self.app.flash_window()
+            threading.Thread(target=self._task, daemon=True).start()
 
-        self.job_id = self.app.root.after(interval_min * 60 * 1000, lambda: self._loop(interval_min))
+        # 使用率の取得と同じ時刻に発火させ、起床回数をまとめる
+        delay = coalesce_delay(interval_min * 60 * 1000, self.app.sampling_policy.granularity(visible=False))
+        self.job_id = self.app.root.after(delay, lambda: self._loop(interval_min))
 
     def _task(self):
         try:
-            self.app.cleaner_logic.execute()
-            self.app.root.after(0, self.app.update_memory_info)
+            # 警告閾値を超えている場合は登録プロセスへ緊急度の高い解放要求を送る
+            urgency = "high" if self.app.is_warning_state else "medium"
+            self.app.cleaner_logic.execute(trigger="auto", urgency=urgency)
+            # cgroup単位の回収ポリシーを評価 (Linuxのみ有効)
+            self.app.cgroup_reclaimer.run_policies()
         except Exception:
             pass # エラーが発生しても定期実行は継続する
+        self.app.root.after(0, self._on_background_free_done)
+
+    def check_forecast(self, sample, warning):
+        """
+        使用率の予測が予測範囲内に警告閾値に達する場合、解放量の目安を付けて事前に解放する
+        (メモリ情報の更新ごとに UIスレッドから呼び出される)
+        Args:
+            sample (Sample): 最新のサンプル
+            warning (int): 警告閾値 (%、不正な場合は None)
+        """
+        if not self.app.config["predictive_free"] or warning is None or self.app.is_freeing:
+            return
+        # 既に閾値を超えている場合は予測ではなく警告表示の対象
+        if sample.percent >= warning:
+            return
+        forecaster = self.app.forecaster
+        now = time.monotonic()
+        if self._last_predictive is not None and now - self._last_predictive < self.predictive_cooldown_sec:
+            return
+        if not forecaster.will_cross(warning):
+            return
+
+        # 予測範囲の終わりに (警告閾値 - 余裕) まで下げるのに必要な量を解放量の目安にする
+        predicted = forecaster.forecast()
+        eta = forecaster.time_to_threshold(warning)
+        budget_mb = max(self.predictive_min_budget_mb,
+                        (predicted - (warning - self.predictive_margin)) / 100 * sample.total / (1024 * 1024))
+        self._last_predictive = now
+        forecaster.triggers += 1
+        self.app.is_freeing = True
+        self.app.flash_window()
+        threading.Thread(target=self._predictive_task, args=(predicted, eta, warning, budget_mb), daemon=True).start()
+
+    def _predictive_task(self, predicted, eta, warning, budget_mb):
+        logger = self.app.cleaner_logic.logger
+        try:
+            freed_mb = self.app.cleaner_logic.execute(trigger="predictive", urgency="medium", budget_mb=budget_mb)
+            stats = self.app.forecaster.stats()
+            accuracy = (f"MAE {stats['mae']:.2f} pt vs naive {stats['naive_mae']:.2f} pt over {stats['count']} forecasts"
+                        if stats["count"] else "no scored forecasts yet")
+            logger.info(
+                f"Predictive Free: {predicted:.1f}% forecast in {self.app.forecaster.horizon_sec:.0f} s "
+                f"(threshold {warning}%, ETA {eta:.0f} s), budget {budget_mb:.0f} MB, freed {freed_mb:.2f} MB; {accuracy}"
+            )
+        except Exception as e:
+            logger.info(f"Predictive Free: failed: {e}")
+        self.app.root.after(0, self._on_background_free_done)
+
+    def check_numa(self, stats):
+        """
+        NUMA ノードの使用率がノードごとの閾値に達した場合、そのノードを対象に回収する
+        (メモリ情報の更新ごとに UIスレッドから呼び出される)
+        Args:
+            stats (list): NodeStats のリスト (NUMA 構成でない場合は空)
+        """
+        threshold = self.app.config["numa_threshold"]
+        if not stats or threshold <= 0 or self.app.is_freeing:
+            return
+        now = time.monotonic()
+        if self._last_numa is not None and now - self._last_numa < self.numa_cooldown_sec:
+            return
+        node = pressured_node(stats, threshold)
+        if node is None:
+            return
+        self._last_numa = now
+        self.app.is_freeing = True
+        threading.Thread(target=self._numa_task, args=(node, threshold), daemon=True).start()
+
+    def _numa_task(self, node, threshold):
+        logic = self.app.cleaner_logic
+        budget = reclaim_budget(node, threshold)
+        try:
+            freed_mb = logic.execute(trigger="numa", urgency="medium", budget_mb=budget / (1024 * 1024), numa_node=node.node)
+            after = {s.node: s for s in logic.numa.read()}.get(node.node)
+            result = (f"{node.percent}% -> {after.percent}%, numa_miss +{after.numa_miss - node.numa_miss}"
+                      if after is not None else f"{node.percent}%")
+            logic.logger.info(
+                f"NUMA Free: node{node.node} {result} (threshold {threshold}%), "
+                f"budget {budget / (1024 * 1024):.0f} MB, host freed {freed_mb:.2f} MB"
+            )
+        except Exception as e:
+            logic.logger.info(f"NUMA Free: failed: {e}")
+        self.app.root.after(0, self._on_background_free_done)
+
+    def _on_background_free_done(self):
+        self.app.is_freeing = False
+        self.app.run_pending_launch()
+        self.app.refresh_memory_info()
 
     def _update_settings_ui(self):
         """設定ウィンドウのUIを更新する"""
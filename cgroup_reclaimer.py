@@ -0,0 +1,187 @@
+import os
+import errno
+import logging
+
+# cgroupfs のデフォルトのマウント位置 (cgroup v2 unified hierarchy)
+DEFAULT_CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def read_stat_file(path):
+    """
+    memory.stat 形式 ("項目名 値" の行) のファイルを読み取る
+    Returns:
+        dict: 項目名 -> 値
+    """
+    stat = {}
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                try:
+                    stat[parts[0]] = int(parts[1])
+                except ValueError:
+                    pass
+    return stat
+
+
+class CgroupReclaimer:
+    """
+    cgroup v2 の memory.reclaim を使用して cgroup 単位でメモリを回収するクラス
+    """
+    def __init__(self, cgroup_root=DEFAULT_CGROUP_ROOT):
+        """
+        Args:
+            cgroup_root (str): cgroupfs のルートディレクトリ (テスト時は偽のツリーを指定可能)
+        """
+        self.cgroup_root = cgroup_root
+        self.policies = []
+        self.logger = logging.getLogger("MemoryCleaner")
+
+    def _path(self, cgroup, filename):
+        """cgroup 内のインターフェースファイルのパスを返す"""
+        return os.path.join(self.cgroup_root, cgroup.strip("/"), filename)
+
+    def is_available(self, cgroup=""):
+        """指定した cgroup で memory.reclaim が利用可能かどうかを返す"""
+        return os.path.exists(self._path(cgroup, "memory.reclaim"))
+
+    def read_current(self, cgroup):
+        """
+        memory.current を読み取る
+        Returns:
+            int: 現在の使用量 (バイト)
+        """
+        with open(self._path(cgroup, "memory.current"), "r") as f:
+            return int(f.read().strip())
+
+    def read_stat(self, cgroup):
+        """
+        memory.stat を読み取る
+        Returns:
+            dict: 項目名 -> 値 (バイトまたは件数)
+        """
+        return read_stat_file(self._path(cgroup, "memory.stat"))
+
+    def read_pressure(self, cgroup):
+        """
+        memory.pressure (PSI) を読み取る
+        Returns:
+            dict: {"some": {"avg10": float, ...}, "full": {...}}
+        """
+        pressure = {}
+        try:
+            with open(self._path(cgroup, "memory.pressure"), "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if not parts:
+                        continue
+                    values = {}
+                    for item in parts[1:]:
+                        key, _, value = item.partition("=")
+                        try:
+                            values[key] = float(value)
+                        except ValueError:
+                            pass
+                    pressure[parts[0]] = values
+        except FileNotFoundError:
+            # PSI が無効なカーネルでは存在しない
+            pass
+        return pressure
+
+    def reclaim(self, cgroup, amount_bytes):
+        """
+        memory.reclaim に回収量を書き込み、実際に減少した量を返す
+        Args:
+            cgroup (str): cgroupfs ルートからの相対パス (例: "user.slice")
+            amount_bytes (int): 回収を要求するバイト数
+        Returns:
+            int: memory.current の減少量 (バイト)
+        """
+        before = self.read_current(cgroup)
+        try:
+            with open(self._path(cgroup, "memory.reclaim"), "w") as f:
+                f.write(str(int(amount_bytes)))
+        except OSError as e:
+            # 要求量を回収しきれなかった場合は EAGAIN が返るが、一部は回収されている
+            if e.errno != errno.EAGAIN:
+                raise
+        after = self.read_current(cgroup)
+        return max(0, before - after)
+
+    def set_policies(self, policies):
+        """
+        cgroup ごとの回収ポリシーを設定する
+        Args:
+            policies (list): ポリシーの辞書のリスト
+                {"cgroup": "user.slice", "threshold_gb": 8, "reclaim_percent": 20}
+                ("reclaim_percent" の代わりに "reclaim_mb" も指定可能)
+        """
+        valid = []
+        for policy in policies or []:
+            if isinstance(policy, dict) and policy.get("cgroup"):
+                valid.append(policy)
+            else:
+                self.logger.info(f"Cgroup Reclaim: invalid policy ignored: {policy!r}")
+        self.policies = valid
+
+    def evaluate(self, policy):
+        """
+        1つのポリシーを評価し、閾値を超えていれば回収を実行する
+        Returns:
+            dict: 評価結果 (cgroup, current, requested, freed, pressure, skipped)
+        """
+        cgroup = policy["cgroup"]
+        threshold = int(float(policy.get("threshold_gb", 0)) * (1024 ** 3))
+        current = self.read_current(cgroup)
+        result = {
+            "cgroup": cgroup,
+            "current": current,
+            "requested": 0,
+            "freed": 0,
+            "pressure": self.read_pressure(cgroup).get("some", {}).get("avg10", 0.0),
+            "skipped": True,
+        }
+        if current < threshold:
+            return result
+
+        if "reclaim_mb" in policy:
+            requested = int(float(policy["reclaim_mb"]) * 1024 * 1024)
+        else:
+            requested = int(current * float(policy.get("reclaim_percent", 0)) / 100)
+        if requested <= 0:
+            return result
+
+        result["requested"] = requested
+        result["freed"] = self.reclaim(cgroup, requested)
+        result["skipped"] = False
+        return result
+
+    def run_policies(self):
+        """
+        設定されたすべてのポリシーを評価する (スケジューラから呼び出される)
+        Returns:
+            list: 各ポリシーの評価結果
+        """
+        results = []
+        for policy in self.policies:
+            try:
+                result = self.evaluate(policy)
+            except Exception as e:
+                self.logger.info(f"Cgroup Reclaim: {policy.get('cgroup')} failed: {e}")
+                continue
+            results.append(result)
+            if not result["skipped"]:
+                # 回収の直後に cgroup が削除された場合や memory.stat がない場合も、残りのポリシーの評価を続ける
+                try:
+                    stat = self.read_stat(result["cgroup"])
+                except OSError:
+                    stat = {}
+                self.logger.info(
+                    f"Cgroup Reclaim: {result['cgroup']} "
+                    f"Requested: {result['requested'] / (1024 * 1024):.2f} MB, "
+                    f"Freed: {result['freed'] / (1024 * 1024):.2f} MB "
+                    f"(Current: {result['current'] / (1024 * 1024):.2f} MB, "
+                    f"Inactive File: {stat.get('inactive_file', 0) / (1024 * 1024):.2f} MB, "
+                    f"PSI some avg10: {result['pressure']:.2f})"
+                )
+        return results
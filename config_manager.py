@@ -1,8 +1,35 @@
-import json
+import tkinter as tk
+from app_config import AppConfig
+
+# 設定画面の Tk 変数と対応する設定の項目
+VAR_KEYS = {
+    "warning_threshold": "warning_threshold_var",
+    "auto_free_interval": "interval_var",
+    "topmost": "topmost_var",
+    "start_minimized": "start_minimized_var",
+    "shortcut_key": "shortcut_var",
+    "flash_color": "flash_color_var",
+    "warning_color": "warning_color_var",
+    "memory_accounting": "accounting_mode_var",
+    "fast_clean": "fast_clean_var",
+    "low_priority_standby_only": "low_priority_standby_var",
+    "leak_target_only": "leak_target_only_var",
+    "group_apps": "group_apps_var",
+    "ksm_mode": "ksm_mode_var",
+    "low_footprint_tray": "low_footprint_var",
+    "predictive_free": "predictive_free_var",
+    "forecast_horizon_sec": "forecast_horizon_var",
+}
+
+# 解放方法の項目 (変更されたらロジッククラスに反映する)
+CLEAN_OPTION_KEYS = ("fast_clean", "low_priority_standby_only", "leak_target_only", "group_apps", "ksm_mode")
+
 
 class ConfigManager:
     """
-    設定ファイルの読み書きを管理するクラス
+    設定 (AppConfig) と設定画面の Tk 変数、各コンポーネントを結び付けるクラス
+    Tk 変数への入力は検証してから設定に反映し、設定の変更 (読み込み、初期化、フリートからの変更) は
+    Tk 変数とコンポーネントに反映する。コンポーネントは Tk 変数を参照せず、設定の値と変更通知のみを使う
     """
     def __init__(self, app, config_file="config.json"):
         """
@@ -12,68 +39,122 @@ class ConfigManager:
         """
         self.app = app
         self.config_file = config_file
+        self.config = AppConfig(config_file)
+        self._syncing = False # 設定から Tk 変数へ反映中 (Tk 変数の変更を設定に戻さない)
+        self._writing = None # Tk 変数から反映中の項目 (入力中の文字列を書き換えない)
+        for key, var_name in VAR_KEYS.items():
+            getattr(app, var_name).trace_add("write", lambda *args, key=key: self._on_var_write(key))
+        self.config.subscribe(VAR_KEYS, self._update_vars)
+        self.config.subscribe(None, self._apply)
+
+    def _on_var_write(self, key):
+        """Tk 変数の変更を設定に反映する (入力途中や不正な値は反映せず、直前の有効な値を使い続ける)"""
+        if self._syncing:
+            return
+        try:
+            value = getattr(self.app, VAR_KEYS[key]).get()
+        except tk.TclError:
+            return
+        self._writing = key
+        try:
+            self.config.set(key, value)
+        except ValueError:
+            pass
+        finally:
+            self._writing = None
+
+    def _update_vars(self, changed):
+        """設定の変更を Tk 変数に反映する"""
+        self._syncing = True
+        try:
+            for key, value in changed.items():
+                if key == self._writing:
+                    continue
+                var = getattr(self.app, VAR_KEYS[key])
+                if isinstance(var, tk.BooleanVar):
+                    var.set(value)
+                else:
+                    var.set(f"{value:g}" if isinstance(value, float) else str(value))
+        finally:
+            self._syncing = False
+
+    def _apply(self, changed):
+        """設定の変更を各コンポーネントに反映する"""
+        app = self.app
+        logic = app.cleaner_logic
+        if "exclusion_list" in changed:
+            logic.exclusion_list = list(changed["exclusion_list"])
+        if "cgroup_root" in changed:
+            app.cgroup_reclaimer.cgroup_root = changed["cgroup_root"]
+            app.memory_source.set_cgroup_root(changed["cgroup_root"])
+            logic.rule_engine.cgroup_root = changed["cgroup_root"]
+        if "process_rules" in changed:
+            logic.rule_engine.set_rules(changed["process_rules"])
+        if "cgroup_policies" in changed:
+            app.cgroup_reclaimer.set_policies(changed["cgroup_policies"])
+        if "memory_accounting" in changed:
+            app.memory_source.set_mode(changed["memory_accounting"])
+        if "ksm_root" in changed:
+            logic.ksm.ksm_root = changed["ksm_root"]
+        if "ksm_root" in changed or any(key in changed for key in CLEAN_OPTION_KEYS):
+            app.update_clean_options()
+        if "sampling_max_interval_sec" in changed:
+            app.sampling_policy.idle_max_ms = int(changed["sampling_max_interval_sec"] * 1000)
+        if "battery_slowdown" in changed:
+            app.sampling_policy.battery_factor = changed["battery_slowdown"]
+        if "leak_cap_mb" in changed:
+            logic.leak_cap_mb = changed["leak_cap_mb"]
+        if "auto_exclusions" in changed and set(changed["auto_exclusions"]) != logic.refault_tracker.auto_excluded:
+            logic.refault_tracker.set_auto_exclusions(changed["auto_exclusions"])
+        swap_policy = logic.swap_policy
+        for key, attr in (("swap_cache_only_percent", "cache_only_percent"), ("swap_abort_percent", "abort_percent"),
+                          ("swap_cache_only_mb_s", "cache_only_mb_s"), ("swap_abort_mb_s", "abort_mb_s")):
+            if key in changed:
+                setattr(swap_policy, attr, changed[key])
+        if "numa_root" in changed and logic.numa is not None:
+            logic.numa.set_root(changed["numa_root"])
+        if "cooperative_grace_sec" in changed:
+            logic.cooperative.grace_period = changed["cooperative_grace_sec"]
+        if "launch_rules" in changed:
+            # 実行中の監視はルールの索引を参照し直すため、ルールの有無が変わった場合のみ開始・停止する
+            app.launch_watcher.set_rules(changed["launch_rules"])
+            if app.launch_watcher.index:
+                app.launch_watcher.start()
+            else:
+                app.launch_watcher.stop()
+        if "trace_file" in changed:
+            app.set_trace_file(changed["trace_file"])
+        if "topmost" in changed:
+            app.toggle_topmost()
+        if "shortcut_key" in changed:
+            app.setup_shortcut()
+        if "flash_color" in changed:
+            app.update_flash_style()
+        if "warning_color" in changed:
+            app.update_warning_style()
+        # 閾値と使用率の基準は表示と警告状態に影響するため、定期更新が始まっていれば即時に更新する
+        if ("warning_threshold" in changed or "memory_accounting" in changed) and app.update_job_id:
+            app.refresh_memory_info()
 
     def load(self):
         """
-        config.jsonから設定を読み込む
+        config.jsonから設定を読み込み、Tk 変数と各コンポーネントに反映する
+        (ファイルがない場合はデフォルト設定で作成し、不正な値の項目はデフォルト値を使う)
         """
-        try:
-            with open(self.config_file, "r") as f:
-                config_data = json.load(f)
-                # 設定ファイルの値があれば上書きする。なければ初期値のまま。
-                self.app.warning_threshold_var.set(config_data.get("warning_threshold", self.app.warning_threshold_var.get()))
-                self.app.interval_var.set(config_data.get("auto_free_interval", self.app.interval_var.get()))
-                self.app.topmost_var.set(config_data.get("topmost", False))
-                self.app.start_minimized_var.set(config_data.get("start_minimized", False))
-                self.app.shortcut_var.set(config_data.get("shortcut_key", ""))
-                self.app.exclusion_list = config_data.get("exclusion_list", [])
-                self.app.flash_color_var.set(config_data.get("flash_color", "lightblue"))
-                self.app.warning_color_var.set(config_data.get("warning_color", "tomato"))
-                self.app.cleaner_logic.exclusion_list = self.app.exclusion_list # ロジッククラスに反映
-                self.app.toggle_topmost() # 読み込んだ設定を反映
-                self.app.setup_shortcut() # ショートカットキーを反映
-                self.app.update_flash_style() # 点滅色を反映
-                self.app.update_warning_style() # 警告色を反映
-        except FileNotFoundError:
-            # ファイルがない場合はデフォルト設定で作成する
-            self.save()
-        except json.JSONDecodeError:
-            # 不正な形式の場合はデフォルト値が使用されるため、何もしない
-            pass
+        self.config.load()
 
     def reset_to_defaults(self):
         """設定を初期値に戻す"""
-        self.app.warning_threshold_var.set("80")
-        self.app.interval_var.set("1")
-        self.app.topmost_var.set(False)
-        self.app.start_minimized_var.set(False)
-        self.app.shortcut_var.set("")
-        self.app.exclusion_list = []
-        self.app.flash_color_var.set("lightblue")
-        self.app.warning_color_var.set("tomato")
-        self.app.cleaner_logic.exclusion_list = []
-        
-        # 設定反映
-        self.app.toggle_topmost()
-        self.app.setup_shortcut()
-        self.app.update_flash_style()
-        self.app.update_warning_style()
-        
+        self.config.reset()
+        self.app.cleaner_logic.refault_tracker.clear_auto_exclusions()
+        self.app.launch_watcher.stop()
         self.save()
 
     def save(self):
         """
-        現在の設定をconfig.jsonに保存する
+        自動で変わる状態 (自動除外) を設定に取り込み、待っている書き込みをすぐに行う
+        (設定の変更は AppConfig が変更後に自動で保存するため、終了時などに呼び出す)
         """
-        config_data = {
-            "warning_threshold": self.app.warning_threshold_var.get(),
-            "auto_free_interval": self.app.interval_var.get(),
-            "topmost": self.app.topmost_var.get(),
-            "start_minimized": self.app.start_minimized_var.get(),
-            "shortcut_key": self.app.shortcut_var.get(),
-            "exclusion_list": self.app.exclusion_list,
-            "flash_color": self.app.flash_color_var.get(),
-            "warning_color": self.app.warning_color_var.get()
-        }
-        with open(self.config_file, "w") as f:
-            json.dump(config_data, f, indent=4)
\ No newline at end of file
+        auto_excluded = sorted(self.app.cleaner_logic.refault_tracker.auto_excluded)
+        self.config.update({"auto_exclusions": auto_excluded}, persist=False)
+        self.config.flush()
@@ -0,0 +1,187 @@
+"""
+協調解放のリファレンスクライアント (Python プロセス向け)
+
+メモリ解放ツールに登録し、解放要求を受け取ったらキャッシュを手放して
+ガベージコレクションと malloc_trim を実行し、解放量を応答する。
+他のプロジェクトにそのままコピーして使えるよう、標準ライブラリのみに依存する。
+
+    from cooperative_client import CooperativeClient
+
+    client = CooperativeClient("my-service")
+    client.add_callback(lambda urgency: my_cache.clear() if urgency == "high" else None)
+    client.start()
+
+Linux ではルールで指定されたプロセスに KSM (同一ページ併合) の有効化が依頼されることがあり、
+その場合は prctl(PR_SET_MEMORY_MERGE) で自プロセスの匿名メモリを併合の対象にする。
+"""
+import os
+import gc
+import sys
+import json
+import time
+import socket
+import ctypes
+import ctypes.util
+import threading
+
+DEFAULT_PORT = 47651 # single_instance.DEFAULT_PORT と同じ値
+PR_SET_MEMORY_MERGE = 67 # Linux 6.4 以降
+
+
+def current_rss():
+    """自プロセスの常駐サイズ (バイト) を返す。取得できない場合は None"""
+    try:
+        if os.name == 'nt':
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            GetCurrentProcess = ctypes.windll.kernel32.GetCurrentProcess
+            GetCurrentProcess.restype = wintypes.HANDLE
+            if ctypes.windll.psapi.GetProcessMemoryInfo(GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def malloc_trim():
+    """C ランタイムのヒープの空き領域を OS に返す (glibc の malloc_trim、Windows の _heapmin)"""
+    try:
+        if os.name == 'nt':
+            ctypes.cdll.msvcrt._heapmin()
+        else:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+            libc.malloc_trim(0)
+    except (OSError, AttributeError):
+        # musl など malloc_trim を持たない環境
+        pass
+
+
+def enable_memory_merge():
+    """
+    自プロセスの匿名メモリを KSM の併合対象にする (Linux 6.4 以降)
+    Raises:
+        OSError: 対応していない、または権限がない場合
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError("KSM is only available on Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if libc.prctl(PR_SET_MEMORY_MERGE, 1, 0, 0, 0) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+
+def release_memory(urgency="medium"):
+    """既定の解放処理: ガベージコレクションと C ヒープの切り詰め"""
+    gc.collect()
+    if urgency != "low":
+        malloc_trim()
+
+
+class CooperativeClient:
+    """
+    メモリ解放ツールへの接続を維持し、解放要求に応答するクライアント
+    接続が切れた場合は一定間隔で再接続する
+    """
+    def __init__(self, name=None, port=DEFAULT_PORT, reconnect_interval=10.0):
+        """
+        Args:
+            name (str): 登録名 (ログに表示される)
+            port (int): メモリ解放ツールの待ち受けポート
+            reconnect_interval (float): 再接続までの待ち時間 (秒)
+        """
+        self.name = name or os.path.basename(sys.argv[0] or "python")
+        self.port = port
+        self.reconnect_interval = reconnect_interval
+        self.callbacks = [] # 解放要求時に呼び出す関数 (urgency)
+        self._sock = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add_callback(self, callback):
+        """解放要求時に呼び出す関数を追加する (既定の解放処理より先に呼び出される)"""
+        self.callbacks.append(callback)
+
+    def start(self):
+        """バックグラウンドスレッドで接続を開始する"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """登録を解除して接続を閉じる"""
+        self._stopped.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                self._send(sock, {"cmd": "unregister", "pid": os.getpid()})
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=5) as sock:
+                    sock.settimeout(None)
+                    self._sock = sock
+                    self._send(sock, {"cmd": "register", "pid": os.getpid(), "name": self.name})
+                    with sock.makefile("rb") as reader:
+                        for line in reader:
+                            message = json.loads(line)
+                            # サーバーからの応答 ({"ok": ...}) は読み捨て、解放要求のみ処理する
+                            if message.get("event") == "release":
+                                self._on_release(sock, message)
+                            elif message.get("event") == "ksm":
+                                self._on_ksm(sock)
+            except (OSError, ValueError):
+                pass
+            finally:
+                self._sock = None
+            self._stopped.wait(self.reconnect_interval)
+
+    def _on_release(self, sock, message):
+        urgency = message.get("urgency", "medium")
+        before = current_rss()
+        for callback in self.callbacks:
+            try:
+                callback(urgency)
+            except Exception:
+                pass
+        release_memory(urgency)
+        after = current_rss()
+        released = max(0, before - after) if before is not None and after is not None else 0
+        self._send(sock, {"cmd": "released", "id": message.get("id"), "bytes": released})
+
+    def _on_ksm(self, sock):
+        try:
+            enable_memory_merge()
+            self._send(sock, {"cmd": "merged", "ok": True})
+        except OSError as e:
+            self._send(sock, {"cmd": "merged", "ok": False, "error": str(e)})
+
+    def _send(self, sock, message):
+        sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+if __name__ == "__main__":
+    # 動作確認用: 登録して解放要求を待ち続ける
+    client = CooperativeClient()
+    client.add_callback(lambda urgency: print(f"release requested ({urgency})", flush=True))
+    client.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        client.stop()
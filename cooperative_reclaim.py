@@ -0,0 +1,185 @@
+import os
+import time
+import logging
+import threading
+import psutil
+from fast_readers import StatmReader
+
+# 解放要求の緊急度 (クライアントは緊急度に応じて手放すキャッシュを選ぶ)
+URGENCY_LEVELS = ("low", "medium", "high")
+
+
+class CooperativeClient:
+    """登録されたクライアント (解放要求を受け取るプロセス)"""
+    __slots__ = ("pid", "name", "connection", "acked", "reported")
+
+    def __init__(self, pid, name, connection):
+        self.pid = pid
+        self.name = name
+        self.connection = connection
+        self.acked = False # 今回の解放要求に応答したかどうか
+        self.reported = 0 # クライアントが申告した解放量 (バイト)
+
+
+class CooperativeReclaimer:
+    """
+    ワーキングセットを強制的に解放する前に、登録されたプロセスへ解放要求を通知し、
+    猶予時間内に自発的に手放したメモリを測定するクラス
+    十分に解放したプロセスはその回の強制解放の対象から外す
+
+    プロトコル (改行区切りの JSON、待ち受けサーバーへの接続を維持する):
+        クライアント → {"cmd": "register", "pid": 1234, "name": "service"}
+        サーバー     → {"event": "release", "id": 1, "urgency": "high"}
+        クライアント → {"cmd": "released", "id": 1, "bytes": 10485760}
+        サーバー     → {"event": "ksm", "merge": true} (KSM の併合の依頼、Linux のみ)
+        クライアント → {"cmd": "merged", "ok": true} (失敗した場合は "error" に理由)
+    """
+    def __init__(self, grace_period=2.0, min_release_mb=1.0):
+        """
+        Args:
+            grace_period (float): 解放要求の後に応答を待つ時間 (秒)
+            min_release_mb (float): 強制解放を見送るのに必要な実測の解放量 (MB)
+        """
+        self.grace_period = grace_period
+        self.min_release_mb = min_release_mb
+        self.logger = logging.getLogger("MemoryCleaner")
+        self.clients = {} # pid -> CooperativeClient
+        self.results = [] # 直近の解放要求の結果 (pid, 名前, 申告値, 実測値, 応答の有無)
+        self._request_id = 0
+        self._cond = threading.Condition()
+
+    def attach(self, server):
+        """待ち受けサーバー (InstanceServer) にコマンドを登録する"""
+        server.register("register", self._handle_register)
+        server.register("released", self._handle_released)
+        server.register("unregister", self._handle_unregister)
+        server.register("merged", self._handle_merged)
+
+    @property
+    def has_clients(self):
+        with self._cond:
+            return bool(self.clients)
+
+    def registered_pids(self):
+        """登録中のプロセスIDの集合を返す"""
+        with self._cond:
+            return set(self.clients)
+
+    # --- 待ち受けスレッドから呼び出されるハンドラ ---
+
+    def _handle_register(self, message, connection):
+        pid = int(message["pid"])
+        name = str(message.get("name") or pid)
+        with self._cond:
+            self.clients[pid] = CooperativeClient(pid, name, connection)
+        self.logger.info(f"Cooperative: registered {name} (PID {pid})")
+        return {"grace_period": self.grace_period}
+
+    def _handle_unregister(self, message, connection):
+        with self._cond:
+            client = self.clients.get(int(message["pid"]))
+            if client is not None and client.connection is connection:
+                del self.clients[client.pid]
+        return None
+
+    def _handle_merged(self, message, connection):
+        with self._cond:
+            client = next((c for c in self.clients.values() if c.connection is connection), None)
+        if client is not None:
+            if message.get("ok"):
+                self.logger.info(f"KSM: {client.name} (PID {client.pid}) opted into merging")
+            else:
+                self.logger.info(f"KSM: {client.name} (PID {client.pid}) could not opt into merging: {message.get('error')}")
+        return None
+
+    def _handle_released(self, message, connection):
+        with self._cond:
+            if message.get("id") != self._request_id:
+                return None # 猶予時間を過ぎた古い要求への応答
+            for client in self.clients.values():
+                if client.connection is connection:
+                    client.acked = True
+                    client.reported = int(message.get("bytes") or 0)
+            self._cond.notify_all()
+        return None
+
+    # --- 解放処理から呼び出す ---
+
+    def notify(self, urgency="medium"):
+        """
+        登録されたプロセスに解放要求を送り、猶予時間内の応答を待って解放量を測定する
+        Args:
+            urgency (str): URGENCY_LEVELS のいずれか
+        Returns:
+            set: 十分に解放したため強制解放を見送るプロセスIDの集合
+        """
+        self.results = []
+        with self._cond:
+            # 切断されたクライアントを除く
+            for pid in [pid for pid, c in self.clients.items() if c.connection.closed]:
+                del self.clients[pid]
+            clients = list(self.clients.values())
+            if not clients:
+                return set()
+            self._request_id += 1
+            request_id = self._request_id
+            for client in clients:
+                client.acked = False
+                client.reported = 0
+
+        statm = StatmReader(max_open=len(clients)) if os.name != 'nt' else None
+        try:
+            before = {c.pid: self._read_rss(statm, c.pid) for c in clients}
+            message = {"event": "release", "id": request_id, "urgency": urgency}
+            sent = [c for c in clients if c.connection.send(message)]
+
+            # すべてのクライアントが応答するか、猶予時間が過ぎるまで待つ
+            deadline = time.monotonic() + self.grace_period
+            with self._cond:
+                while not all(c.acked for c in sent):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._request_id += 1 # 以降の遅れた応答は無視する
+
+            released = set()
+            for client in sent:
+                rss_before = before.get(client.pid)
+                rss_after = self._read_rss(statm, client.pid)
+                measured = max(0, rss_before - rss_after) if rss_before is not None and rss_after is not None else 0
+                self.results.append((client.pid, client.name, client.reported, measured, client.acked))
+                if client.acked and measured / (1024 * 1024) >= self.min_release_mb:
+                    released.add(client.pid)
+        finally:
+            if statm is not None:
+                statm.close()
+
+        for pid, name, reported, measured, acked in self.results:
+            if acked:
+                self.logger.info(
+                    f"Cooperative Release: {name} (PID {pid}) reported {reported / (1024 * 1024):.2f} MB, "
+                    f"measured {measured / (1024 * 1024):.2f} MB ({urgency})"
+                )
+            else:
+                self.logger.info(f"Cooperative Release: {name} (PID {pid}) did not respond within {self.grace_period:.1f}s")
+        return released
+
+    def request_merge(self, pids):
+        """
+        登録されたプロセスに KSM の併合の有効化を依頼する (PR_SET_MEMORY_MERGE は自プロセスにしか設定できないため)
+        Returns:
+            set: 依頼を送信できたプロセスID
+        """
+        with self._cond:
+            clients = [self.clients[pid] for pid in pids if pid in self.clients]
+        return {c.pid for c in clients if c.connection.send({"event": "ksm", "merge": True})}
+
+    def _read_rss(self, statm, pid):
+        # 申告された PID は検証できないため、解放量は必ず実測する
+        if statm is not None:
+            return statm.rss(pid)
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
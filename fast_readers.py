@@ -0,0 +1,278 @@
+"""
+/proc/meminfo と /proc/<pid>/statm の高速リーダー (Linux専用)
+
+ファイルディスクリプタを開いたままにし、再利用する bytearray に os.preadv で読み込む。
+必要な項目だけを事前に確保した配列へ解析するため、1回の読み取りで新しいオブジェクトをほとんど生成しない。
+
+python fast_readers.py を実行すると psutil とのマイクロベンチマークを表示する。
+"""
+import os
+import mmap
+import threading
+from array import array
+
+PAGE_SIZE = mmap.PAGESIZE
+
+
+def _fd_budget():
+    """
+    すべての StatmReader で開いたままにできるファイルディスクリプタの合計
+    (ソケットや履歴データベースなどのために、RLIMIT_NOFILE のソフトリミットの4分の1に抑える)
+    """
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ImportError, ValueError, OSError):
+        return 256
+    if soft == resource.RLIM_INFINITY:
+        return 1024
+    return max(16, soft // 4)
+
+
+FD_BUDGET = _fd_budget()
+
+# 数字と空白の文字コード
+_SPACE = 0x20
+_ZERO = 0x30
+_NINE = 0x39
+
+
+def _read_into(fd, view):
+    """ファイルの先頭から再利用バッファへ読み込み、読み込んだバイト数を返す"""
+    if hasattr(os, "preadv"):
+        return os.preadv(fd, [view], 0)
+    data = os.pread(fd, len(view), 0)
+    view[:len(data)] = data
+    return len(data)
+
+
+def _parse_uint(buf, pos, end):
+    """buf[pos:end] の先頭の空白を飛ばして符号なし整数を解析する (値, 次の位置)"""
+    while pos < end and buf[pos] == _SPACE:
+        pos += 1
+    value = 0
+    while pos < end:
+        c = buf[pos]
+        if c < _ZERO or c > _NINE:
+            break
+        value = value * 10 + (c - _ZERO)
+        pos += 1
+    return value, pos
+
+
+class MeminfoReader:
+    """
+    /proc/meminfo を開いたまま再読み込みするリーダー
+    """
+    def __init__(self, fields, path="/proc/meminfo", buffer_size=8192):
+        """
+        Args:
+            fields (tuple): 読み取る項目名 (例: ("MemTotal", "MemAvailable"))
+            path (str): /proc/meminfo のパス
+            buffer_size (int): 読み込みバッファのサイズ
+        """
+        self.fields = tuple(fields)
+        self.values = array('Q', bytes(8 * len(self.fields))) # 項目ごとの値 (バイト)
+        self._keys = [name.encode("ascii") + b":" for name in self.fields]
+        self._hints = [0] * len(self.fields) # 前回見つかった位置 (行の並びはほぼ変わらない)
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._fd = os.open(path, os.O_RDONLY)
+
+    def read(self):
+        """
+        meminfo を再読み込みして self.values を更新する
+        Returns:
+            array: self.values (項目の並びは fields と同じ)
+        """
+        buf = self._buffer
+        size = _read_into(self._fd, self._view)
+        for i, key in enumerate(self._keys):
+            pos = buf.find(key, self._hints[i], size)
+            if pos < 0:
+                pos = buf.find(key, 0, size)
+                if pos < 0:
+                    self.values[i] = 0
+                    continue
+            self._hints[i] = pos
+            start = pos + len(key)
+            end = buf.find(b" kB", start, size)
+            # meminfo の値は kB 単位 (HugePages_* などの件数は今回の用途では読まない)
+            # スライスを作らずにバッファ上で直接解析する
+            if end >= 0:
+                value, _ = _parse_uint(buf, start, end)
+                self.values[i] = value * 1024
+            else:
+                self.values[i] = 0
+        return self.values
+
+    def as_dict(self):
+        """最後に読み込んだ値を辞書で返す"""
+        return dict(zip(self.fields, self.values))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class StatmReader:
+    """
+    /proc/<pid>/statm をプロセスごとに開いたまま再読み込みするリーダー
+    開いたままにする fd は、すべてのリーダーの合計が FD_BUDGET を超えないようにする
+    (超えた分のプロセスは読み取りのたびに開いて閉じる)
+    """
+    _open_total = 0 # すべてのリーダーが開いたままにしている fd の数
+    _total_lock = threading.Lock()
+
+    def __init__(self, proc_root="/proc", max_open=512):
+        """
+        Args:
+            proc_root (str): procfs のルートディレクトリ
+            max_open (int): このリーダーが開いたままにするファイルディスクリプタの上限
+        """
+        self.proc_root = proc_root
+        self.max_open = max_open
+        self.values = array('Q', [0, 0]) # (仮想サイズ, 常駐サイズ) バイト
+        self._fds = {}
+        self._buffer = bytearray(128)
+        self._view = memoryview(self._buffer)
+
+    def read(self, pid):
+        """
+        指定したプロセスの statm を読み込んで self.values を更新する
+        Returns:
+            array or None: self.values。プロセスが終了していた場合は None
+        """
+        fd = self._fds.get(pid)
+        cached = fd is not None
+        if not cached:
+            try:
+                fd = os.open(f"{self.proc_root}/{pid}/statm", os.O_RDONLY)
+            except OSError:
+                return None
+            if len(self._fds) < self.max_open and self._reserve():
+                self._fds[pid] = fd
+                cached = True
+        try:
+            size = _read_into(fd, self._view)
+        except OSError:
+            # 終了したプロセスの fd は ESRCH を返す (PID が再利用されても古い fd は無効)
+            size = 0
+        if not cached:
+            os.close(fd)
+        elif size == 0:
+            self._close(pid, fd)
+        if size == 0:
+            return None
+
+        vsize, pos = _parse_uint(self._buffer, 0, size)
+        resident, _ = _parse_uint(self._buffer, pos, size)
+        self.values[0] = vsize * PAGE_SIZE
+        self.values[1] = resident * PAGE_SIZE
+        return self.values
+
+    def rss(self, pid):
+        """指定したプロセスの常駐サイズ (バイト) を返す。終了していれば None"""
+        values = self.read(pid)
+        return None if values is None else values[1]
+
+    def prune(self, live_pids):
+        """存在しなくなったプロセスのファイルディスクリプタを閉じる"""
+        for pid in [pid for pid in self._fds if pid not in live_pids]:
+            self._close(pid, self._fds[pid])
+
+    @classmethod
+    def _reserve(cls):
+        """共有の上限の範囲で fd を1つ開いたままにできる場合 True"""
+        with cls._total_lock:
+            if cls._open_total >= FD_BUDGET:
+                return False
+            cls._open_total += 1
+            return True
+
+    def _close(self, pid, fd):
+        if self._fds.pop(pid, None) is not None:
+            with StatmReader._total_lock:
+                StatmReader._open_total -= 1
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def close(self):
+        for pid, fd in list(self._fds.items()):
+            self._close(pid, fd)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def list_pids(proc_root="/proc"):
+    """procfs から現在のプロセスIDの一覧を返す"""
+    return [int(entry.name) for entry in os.scandir(proc_root) if entry.name.isdigit()]
+
+
+def _benchmark(iterations=20000):
+    """psutil との比較 (1回あたりのCPU時間と一時的なメモリ確保量) を表示する"""
+    import timeit
+    import tracemalloc
+    import psutil
+    from memory_lists import MEMINFO_FIELDS
+
+    def measure(name, func, number):
+        func() # ウォームアップ
+        seconds = timeit.timeit(func, number=number)
+        # 1回の呼び出しで一時的に確保されるメモリ量 (ピーク) を測定する
+        tracemalloc.start()
+        transient = 0
+        for _ in range(100):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func()
+            transient += tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        print(f"{name:<28} {seconds / number * 1e6:10.2f} us/call  {transient / 100:10.1f} B/call (peak)")
+
+    meminfo = MeminfoReader(MEMINFO_FIELDS)
+    print(f"--- /proc/meminfo ({iterations} iterations) ---")
+    measure("psutil.virtual_memory()", psutil.virtual_memory, iterations)
+    measure("MeminfoReader.read()", meminfo.read, iterations)
+
+    pids = list_pids()
+    processes = []
+    for pid in pids:
+        try:
+            processes.append(psutil.Process(pid))
+        except psutil.Error:
+            pass
+    statm = StatmReader()
+
+    def psutil_sweep():
+        for p in processes:
+            try:
+                p.memory_info()
+            except psutil.Error:
+                pass
+
+    def statm_sweep():
+        for pid in pids:
+            statm.read(pid)
+
+    sweeps = max(1, iterations // max(1, len(pids)))
+    print(f"--- per-process RSS sweep ({len(pids)} processes, {sweeps} sweeps) ---")
+    measure("Process.memory_info() x N", psutil_sweep, sweeps)
+    measure("StatmReader.read() x N", statm_sweep, sweeps)
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,301 @@
+"""
+フリート管理用の制御・メトリクスインターフェース
+
+常駐中のインスタンス (または画面を持たないビルドエージェントなどのヘッドレスエージェント) が
+InstanceServer で待ち受け、集約ツール (fleet_aggregator.py) からの問い合わせと操作に応答する。
+
+コマンド (改行区切りの JSON、1つの接続で続けて送信できる):
+    {"cmd": "hello"}                                  → アプリ名、バージョン、ホスト名
+    {"cmd": "metrics"}                                → 現在の使用率、直近の解放結果、過去24時間の集計
+    {"cmd": "history", "since": 1700000000}           → 分単位の使用率と解放結果
+    {"cmd": "free"}                                   → メモリ解放を開始する
+    {"cmd": "policy", "settings": {"warning_threshold": 85}} → 設定を変更する
+
+トークンを設定した場合は、すべてのメッセージに "token" を含める。最初のメッセージが一定時間内に届かない接続や、
+トークンが一致しない接続は切断する。トークンと応答は平文で送られるため、ローカルホスト以外で待ち受ける場合は
+信頼できるネットワーク内で使うか、SSH のポート転送や VPN を経由する。
+
+    python fleet_agent.py --port 47700 --data-dir ./agent1
+"""
+import os
+import sys
+import math
+import time
+import socket
+import logging
+import argparse
+import threading
+
+# フリートから変更できる設定と型
+POLICY_KEYS = {
+    "warning_threshold": int,
+    "auto_free_interval": int,
+    "auto_free": bool,
+    "predictive_free": bool,
+    "forecast_horizon_sec": float,
+    "fast_clean": bool,
+    "leak_target_only": bool,
+}
+
+HISTORY_LIMIT = 1440 # 1回の history で返す行数の上限 (分単位で24時間)
+IDLE_TIMEOUT = 600 # 制御・メトリクスの接続を要求なしで維持する時間 (秒、集約ツールの問い合わせ間隔より十分長くする)
+
+
+def validate_policy(settings):
+    """
+    フリートから受け取った設定を検証して型をそろえる
+    Returns:
+        dict: 検証済みの設定
+    Raises:
+        ValueError: 未知の項目や不正な値を含む場合
+    """
+    if not isinstance(settings, dict) or not settings:
+        raise ValueError("settings must be a non-empty object")
+    policy = {}
+    for key, value in settings.items():
+        kind = POLICY_KEYS.get(key)
+        if kind is None:
+            raise ValueError(f"unknown setting: {key}")
+        if kind is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"{key} must be true or false")
+            policy[key] = value
+            continue
+        # JSON の true/false は int の一種のため数値として受け付けない。文字列も受け付けない
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{key} must be a number")
+        if not math.isfinite(value):
+            raise ValueError(f"{key} must be finite")
+        if kind is int and value != int(value):
+            raise ValueError(f"{key} must be an integer")
+        value = kind(value)
+        if value <= 0 or (key == "warning_threshold" and value > 100):
+            raise ValueError(f"{key} is out of range")
+        policy[key] = value
+    return policy
+
+
+class FleetAgent:
+    """
+    InstanceServer にフリート管理用のコマンドを登録するクラス
+    解放と設定変更は呼び出し元から渡された関数で行う (GUI ではメインスレッドに委ねる)
+    """
+    def __init__(self, version, sampler, history_store, cleaner_logic, free_callback, policy_callback, status_callback=None):
+        """
+        Args:
+            version (str): アプリのバージョン
+            sampler (MemorySampler): 使用率の取得元 (最新のサンプルを返す)
+            history_store (HistoryStore): 履歴データベース
+            cleaner_logic (MemoryCleanerLogic): 直近の解放結果の取得元
+            free_callback (callable): 解放を開始する関数 () -> bool (開始できた場合 True)
+            policy_callback (callable): 検証済みの設定を反映する関数 (dict) -> None
+            status_callback (callable): metrics に加える状態を返す関数 () -> dict
+        """
+        self.version = version
+        self.sampler = sampler
+        self.history_store = history_store
+        self.cleaner_logic = cleaner_logic
+        self.free_callback = free_callback
+        self.policy_callback = policy_callback
+        self.status_callback = status_callback
+        self.hostname = socket.gethostname()
+        self.logger = logging.getLogger("MemoryCleaner")
+
+    def attach(self, server):
+        """待ち受けサーバー (InstanceServer) にコマンドを登録する"""
+        server.register("hello", self._handle_hello)
+        server.register("metrics", self._handle_metrics)
+        server.register("history", self._handle_history)
+        server.register("free", self._handle_free)
+        server.register("policy", self._handle_policy)
+
+    # --- 待ち受けスレッドから呼び出されるハンドラ ---
+
+    def _handle_hello(self, message, connection):
+        return {"version": self.version, "host": self.hostname, "pid": os.getpid()}
+
+    def _handle_metrics(self, message, connection):
+        sample = self.sampler.latest()
+        report = self.cleaner_logic.last_report
+        result = {
+            "host": self.hostname,
+            "timestamp": time.time(),
+            "sample": {
+                "timestamp": sample.timestamp, "percent": sample.percent, "used": sample.used,
+                "total": sample.total, "source": sample.source,
+            } if sample is not None else None,
+            "last_run": {
+                "timestamp": report["timestamp"], "trigger": report["trigger"], "freed_mb": report["freed_mb"],
+            } if report else None,
+            "stats_24h": self.history_store.run_stats(time.time() - 86400),
+        }
+        ksm = self.cleaner_logic.ksm
+        ksm_stats = ksm.read_stats() if ksm.enabled else None
+        if ksm_stats is not None:
+            result["ksm"] = {"level": ksm.level, "shared_mb": ksm_stats.shared_mb, "saved_mb": ksm_stats.saved_mb,
+                             "pages_sharing": ksm_stats.pages_sharing, "full_scans": ksm_stats.full_scans}
+        if self.status_callback is not None:
+            result["status"] = self.status_callback()
+        return result
+
+    def _handle_history(self, message, connection):
+        since = float(message.get("since") or time.time() - 86400)
+        return {
+            "since": since,
+            "samples": self.history_store.query_samples(since, resolution="minute")[-HISTORY_LIMIT:],
+            "runs": [row[1:4] for row in self.history_store.query_runs(since, limit=HISTORY_LIMIT)],
+        }
+
+    def _handle_free(self, message, connection):
+        started = self.free_callback()
+        self.logger.info(f"Fleet: free requested ({'started' if started else 'already running'})")
+        return {"started": bool(started)}
+
+    def _handle_policy(self, message, connection):
+        policy = validate_policy(message.get("settings"))
+        self.policy_callback(policy)
+        self.logger.info(f"Fleet: policy applied {policy}")
+        return {"applied": policy}
+
+
+class HeadlessAgent:
+    """
+    画面を持たない環境 (ビルドエージェント、サーバー) 向けのエージェント
+    使用率の取得、定期解放、予測による解放の判定と履歴の保存を GUI なしで行う
+    """
+    def __init__(self, data_dir, interval=2.0, numa_threshold=0, ksm=False):
+        # 重いモジュールはヘッドレスで起動する場合のみ読み込む
+        from memory_cleaner_logic import MemoryCleanerLogic
+        from memory_source import MemoryUsageSource
+        from memory_sampler import MemorySampler
+        from history_store import HistoryStore
+        from forecaster import UsageForecaster
+
+        self.interval = interval
+        self.numa_threshold = numa_threshold # NUMA ノードごとの回収の閾値 (%、0 は無効)
+        self.logic = MemoryCleanerLogic()
+        self.logic.ksm.set_enabled(ksm)
+        self.sampler = MemorySampler(MemoryUsageSource(), self.logic.list_reader)
+        self.history_store = HistoryStore(os.path.join(data_dir, "history.db"))
+        self.forecaster = UsageForecaster()
+        self.sampler.listeners.append(self.history_store.add_sample)
+        self.sampler.listeners.append(self.forecaster.add_sample)
+        self.sampler.listeners.append(self.logic.swap_monitor.add_sample)
+        self.logic.run_listeners.append(self.history_store.add_run)
+        self.logic.run_listeners.append(self.forecaster.on_run)
+        self.policy = {"warning_threshold": 80, "auto_free_interval": 1, "auto_free": False,
+                       "predictive_free": False, "forecast_horizon_sec": 120.0,
+                       "fast_clean": False, "leak_target_only": False}
+        self._freeing = threading.Lock()
+        self._next_auto = None
+        self._last_numa = None
+        self._stopped = threading.Event()
+
+    def free(self, trigger="fleet", budget_mb=None, numa_node=None):
+        """別スレッドで解放する (実行中の場合は開始しない)"""
+        if not self._freeing.acquire(blocking=False):
+            return False
+        def task():
+            try:
+                self.logic.execute(trigger=trigger, budget_mb=budget_mb, numa_node=numa_node)
+            except Exception as e:
+                self.logic.logger.info(f"Fleet: free failed: {e}")
+            finally:
+                self._freeing.release()
+        threading.Thread(target=task, daemon=True).start()
+        return True
+
+    def apply_policy(self, policy):
+        self.policy.update(policy)
+        self.logic.fast_mode = self.policy["fast_clean"]
+        self.logic.leak_target_only = self.policy["leak_target_only"]
+        self.forecaster.set_horizon(self.policy["forecast_horizon_sec"])
+        self._next_auto = None
+
+    def status(self):
+        status = {"policy": dict(self.policy), "forecast": self.forecaster.stats()}
+        numa = self.logic.numa
+        if numa is not None and numa.is_numa:
+            status["numa"] = [{"node": s.node, "percent": s.percent, "total": s.total, "numa_miss": s.numa_miss}
+                              for s in numa.read()]
+        return status
+
+    def check_numa(self, now):
+        """使用率がノードごとの閾値に達した NUMA ノードを対象に回収する (最短間隔は60秒)"""
+        from numa import pressured_node, reclaim_budget
+
+        numa = self.logic.numa
+        if self.numa_threshold <= 0 or numa is None or not numa.is_numa:
+            return
+        if self._last_numa is not None and now - self._last_numa < 60:
+            return
+        node = pressured_node(numa.read(), self.numa_threshold)
+        if node is None:
+            return
+        budget_mb = reclaim_budget(node, self.numa_threshold) / (1024 * 1024)
+        if self.free(trigger="numa", budget_mb=budget_mb, numa_node=node.node):
+            self._last_numa = now
+            self.logic.logger.info(f"NUMA Free: node{node.node} {node.percent}% (threshold {self.numa_threshold}%), budget {budget_mb:.0f} MB")
+
+    def run(self):
+        """使用率を一定間隔で取得し、定期解放と予測による解放を判定する"""
+        while not self._stopped.wait(self.interval):
+            sample = self.sampler.sample()
+            now = time.monotonic()
+            if self.policy["auto_free"]:
+                if self._next_auto is None:
+                    self._next_auto = now + self.policy["auto_free_interval"] * 60
+                elif now >= self._next_auto:
+                    self._next_auto = now + self.policy["auto_free_interval"] * 60
+                    self.free(trigger="auto")
+            warning = self.policy["warning_threshold"]
+            if (self.policy["predictive_free"] and sample.percent < warning
+                    and self.forecaster.will_cross(warning) and self.free(trigger="predictive")):
+                self.forecaster.triggers += 1
+            self.check_numa(now)
+            self.logic.ksm.adjust(sample.percent, warning, now)
+
+    def stop(self):
+        self._stopped.set()
+        self.logic.ksm.restore()
+        self.history_store.close()
+
+
+def _main():
+    from single_instance import InstanceServer
+
+    parser = argparse.ArgumentParser(description="メモリ解放ツールのヘッドレスエージェント")
+    parser.add_argument("--port", type=int, default=47700, help="制御・メトリクスの待ち受けポート")
+    parser.add_argument("--bind", default="127.0.0.1", help="待ち受けるアドレス (ローカルホスト以外ではトークンが必要)")
+    parser.add_argument("--token", default=os.environ.get("MEMORY_CLEANER_TOKEN", ""), help="認証トークン")
+    parser.add_argument("--data-dir", default=".", help="履歴データベースの保存先")
+    parser.add_argument("--interval", type=float, default=2.0, help="使用率の取得間隔 (秒)")
+    parser.add_argument("--numa-threshold", type=float, default=0, help="NUMA ノードごとの回収の閾値 (%%、既定の 0 は無効)")
+    parser.add_argument("--ksm", action="store_true", help="KSM の走査速度を使用率に応じて調整する (Linux、root 権限が必要)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    if args.bind not in ("127.0.0.1", "localhost", "::1") and not args.token:
+        parser.error("--token is required when binding to a non-loopback address")
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    agent = HeadlessAgent(args.data_dir, args.interval, args.numa_threshold, args.ksm)
+    server = InstanceServer(args.port, host=args.bind, token=args.token, idle_timeout=IDLE_TIMEOUT)
+    if not server.acquire():
+        print(f"port {args.port} is already in use", file=sys.stderr)
+        sys.exit(1)
+    FleetAgent("headless", agent.sampler, agent.history_store, agent.logic,
+               agent.free, agent.apply_policy, agent.status).attach(server)
+    server.start()
+    agent.sampler.sample()
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        agent.stop()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,389 @@
+"""
+複数のインスタンス (ワークステーション、ビルドエージェント) の状態を集約するツール
+
+各インスタンスの制御・メトリクスインターフェース (fleet_agent.py) に接続を維持したまま問い合わせ、
+メモリ使用率と解放結果の履歴をフリート全体の分単位の表にまとめる。
+グループを指定して解放や設定変更を一斉に送ることもできる。
+
+fleet.json:
+    {
+        "poll_interval_sec": 10,
+        "hosts": [
+            {"name": "ws01", "host": "10.0.0.5", "port": 47700, "token": "secret", "groups": ["office"]},
+            {"name": "build1", "host": "10.0.1.20", "port": 47700, "token": "secret", "groups": ["build"]}
+        ]
+    }
+
+    python fleet_aggregator.py fleet.json
+    python fleet_aggregator.py fleet.json --watch
+    python fleet_aggregator.py fleet.json --free build
+    python fleet_aggregator.py fleet.json --policy build '{"auto_free": true, "auto_free_interval": 5}'
+"""
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from single_instance import APP_ID
+
+ALL_GROUP = "all" # すべてのホストを表すグループ名
+
+
+class FleetHost:
+    """集約対象の1つのインスタンス"""
+    __slots__ = ("name", "address", "port", "token", "groups")
+
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): {"name": "ws01", "host": "10.0.0.5", "port": 47700, "token": "...", "groups": ["office"]}
+        Raises:
+            ValueError: 設定が不正な場合
+        """
+        self.address = config.get("host") or "127.0.0.1"
+        self.port = int(config["port"])
+        self.name = config.get("name") or f"{self.address}:{self.port}"
+        self.token = config.get("token") or None
+        self.groups = set(config.get("groups") or ())
+
+
+class HostUnavailable(Exception):
+    """ホストに接続できない、または応答が不正"""
+
+
+class HostConnection:
+    """
+    1つのホストへの持続的な接続
+    複数の要求をまとめて送信してから応答を順に読み取り (パイプライン)、往復の回数を減らす
+    接続できない場合は指数的に間隔を延ばして再接続を試みる
+    """
+    def __init__(self, host, timeout=5.0, backoff_initial=1.0, backoff_max=300.0):
+        """
+        Args:
+            host (FleetHost): 接続先
+            timeout (float): 接続と応答のタイムアウト (秒)
+            backoff_initial (float): 最初の再接続までの待ち時間 (秒)
+            backoff_max (float): 再接続までの待ち時間の上限 (秒)
+        """
+        self.host = host
+        self.timeout = timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.failures = 0 # 連続して失敗した回数
+        self.next_attempt = 0.0 # 次に接続を試みる時刻 (time.monotonic() 基準)
+        self.last_error = None
+        self.rtt = None # 直近のパイプライン全体の往復時間 (秒)
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock() # 1つの接続で要求と応答の順序を守る
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def available(self, now=None):
+        """再接続の待ち時間を過ぎているかどうかを返す"""
+        return (time.monotonic() if now is None else now) >= self.next_attempt
+
+    def request_many(self, messages):
+        """
+        複数の要求をまとめて送信し、応答を同じ順序で返す
+        Raises:
+            HostUnavailable: 待ち時間中、接続できない、または応答が不正な場合
+        """
+        with self._lock:
+            if not self.available():
+                raise HostUnavailable(self.last_error or "backing off")
+            started = time.monotonic()
+            try:
+                if self._sock is None:
+                    self._connect()
+                payload = b"".join(json.dumps(self._sign(message)).encode("utf-8") + b"\n" for message in messages)
+                self._sock.sendall(payload)
+                responses = []
+                for _ in messages:
+                    line = self._reader.readline()
+                    if not line:
+                        raise OSError("connection closed")
+                    response = json.loads(line)
+                    if not isinstance(response, dict) or response.get("app") != APP_ID:
+                        raise ValueError("not a memory cleaner instance")
+                    if response.get("error") == "unauthorized":
+                        # インスタンスは認証に失敗した接続を切るため、続きの応答は届かない
+                        raise PermissionError("unauthorized")
+                    responses.append(response)
+            except (OSError, ValueError) as e:
+                self._fail(e)
+                raise HostUnavailable(str(e)) from e
+            self.rtt = time.monotonic() - started
+            self.failures = 0
+            self.last_error = None
+            return responses
+
+    def request(self, message):
+        return self.request_many([message])[0]
+
+    def _sign(self, message):
+        if self.host.token:
+            return {**message, "token": self.host.token}
+        return message
+
+    def _connect(self):
+        sock = socket.create_connection((self.host.address, self.host.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+
+    def _fail(self, error):
+        """接続を閉じ、次に接続を試みるまでの待ち時間を延ばす (同時に再接続しないよう揺らぎを加える)"""
+        self.close()
+        self.failures += 1
+        self.last_error = str(error)
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** (self.failures - 1))
+        self.next_attempt = time.monotonic() + delay * random.uniform(0.8, 1.2)
+
+    def close(self):
+        if self._reader is not None:
+            try:
+                self._reader.close()
+            except OSError:
+                pass
+            self._reader = None
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+
+class FleetAggregator:
+    """
+    ホストごとの接続を保持し、状態と履歴を集約するクラス
+    """
+    def __init__(self, hosts, max_workers=16, retention_sec=86400, timeout=5.0):
+        """
+        Args:
+            hosts (list): FleetHost のリスト
+            max_workers (int): 同時に問い合わせるホスト数
+            retention_sec (float): 集約した履歴を保持する時間 (秒)
+            timeout (float): 接続と応答のタイムアウト (秒)
+        """
+        self.logger = logging.getLogger("MemoryCleaner")
+        self.hosts = {host.name: host for host in hosts}
+        self.connections = {host.name: HostConnection(host, timeout=timeout) for host in hosts}
+        self.retention_sec = retention_sec
+        self.info = {} # ホスト名 -> hello の応答
+        self.metrics = {} # ホスト名 -> 直近の metrics の応答
+        self.samples = {name: {} for name in self.hosts} # ホスト名 -> {分: (平均, 最小, 最大)}
+        self.runs = {name: {} for name in self.hosts} # ホスト名 -> {時刻: (契機, 解放量 MB)}
+        self._since = {} # ホスト名 -> 次に history で問い合わせる開始時刻
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """fleet.json の内容から作成する"""
+        return cls([FleetHost(host) for host in config.get("hosts", [])], **kwargs)
+
+    def select(self, group=None):
+        """グループに属するホスト名を返す (None または "all" はすべて)"""
+        if group in (None, ALL_GROUP):
+            return list(self.hosts)
+        return [name for name, host in self.hosts.items() if group in host.groups]
+
+    def poll(self, group=None):
+        """
+        ホストに並行して問い合わせ、状態と履歴を更新する
+        Returns:
+            dict: ホスト名 -> エラー (成功した場合は None、待ち時間中のホストは問い合わせない)
+        """
+        names = [name for name in self.select(group) if self.connections[name].available()]
+        return dict(zip(names, self._executor.map(self._poll_host, names)))
+
+    def _poll_host(self, name):
+        connection = self.connections[name]
+        # 初回は hello も同じパイプラインで送る
+        messages = [] if name in self.info else [{"cmd": "hello"}]
+        since = self._since.get(name, time.time() - self.retention_sec)
+        messages += [{"cmd": "metrics"}, {"cmd": "history", "since": since}]
+        try:
+            responses = connection.request_many(messages)
+        except HostUnavailable as e:
+            return str(e)
+        if len(responses) == 3:
+            self.info[name] = responses.pop(0)
+        metrics, history = responses
+        if not metrics.get("ok"):
+            # 認証の失敗など、接続はできたが要求を拒否された場合
+            connection.last_error = metrics.get("error", "request rejected")
+            return connection.last_error
+        with self._lock:
+            self.metrics[name] = metrics
+            if history.get("ok"):
+                self._merge_history(name, history)
+        return None
+
+    def _merge_history(self, name, history):
+        samples = self.samples[name]
+        for bucket, average, low, high in history.get("samples", []):
+            samples[bucket] = (average, low, high)
+        runs = self.runs[name]
+        for ts, trigger, freed_mb in history.get("runs", []):
+            runs[ts] = (trigger, freed_mb)
+        if samples:
+            # 集計中の最新の分は次回も問い合わせて更新する
+            self._since[name] = max(samples)
+        cutoff = time.time() - self.retention_sec
+        for bucket in [bucket for bucket in samples if bucket < cutoff]:
+            del samples[bucket]
+        for ts in [ts for ts in runs if ts < cutoff]:
+            del runs[ts]
+
+    def fleet_view(self, since=None, group=None):
+        """
+        ホストの履歴を分単位でまとめたフリート全体の表を返す
+        Returns:
+            list: (分, ホスト数, 平均使用率, 最大使用率, 解放回数, 解放量 MB) のリスト (古い順)
+        """
+        since = time.time() - 3600 if since is None else since
+        names = self.select(group)
+        buckets = {}
+        with self._lock:
+            for name in names:
+                for bucket, (average, _, high) in self.samples[name].items():
+                    if bucket < since:
+                        continue
+                    row = buckets.setdefault(bucket, [0, 0.0, 0.0, 0, 0.0])
+                    row[0] += 1
+                    row[1] += average
+                    row[2] = max(row[2], high)
+                for ts, (_, freed_mb) in self.runs[name].items():
+                    if ts < since:
+                        continue
+                    row = buckets.setdefault(int(ts // 60) * 60, [0, 0.0, 0.0, 0, 0.0])
+                    row[3] += 1
+                    row[4] += freed_mb
+        return [
+            (bucket, count, total / count if count else None, high if count else None, runs, freed)
+            for bucket, (count, total, high, runs, freed) in sorted(buckets.items())
+        ]
+
+    def summary(self, group=None):
+        """
+        ホストごとの状態を返す
+        Returns:
+            list: {"name", "reachable", "percent", "runs_24h", "freed_24h_mb", "average_mb", "rtt_ms", "error"} のリスト
+        """
+        rows = []
+        for name in self.select(group):
+            connection = self.connections[name]
+            metrics = self.metrics.get(name) or {}
+            sample = metrics.get("sample") or {}
+            stats = metrics.get("stats_24h") or {}
+            rows.append({
+                "name": name,
+                "reachable": connection.failures == 0 and connection.last_error is None and name in self.metrics,
+                "percent": sample.get("percent"),
+                "runs_24h": stats.get("runs"),
+                "freed_24h_mb": stats.get("total_mb"),
+                "average_mb": stats.get("average_mb"),
+                "rtt_ms": connection.rtt * 1000 if connection.rtt is not None else None,
+                "error": connection.last_error,
+            })
+        return rows
+
+    def broadcast(self, message, group=None):
+        """
+        グループのホストにコマンドを一斉に送る
+        Returns:
+            dict: ホスト名 -> 応答 (接続できなかった場合は {"ok": False, "error": ...})
+        """
+        names = self.select(group)
+
+        def send(name):
+            try:
+                return self.connections[name].request(message)
+            except HostUnavailable as e:
+                return {"ok": False, "error": str(e)}
+
+        results = dict(zip(names, self._executor.map(send, names)))
+        failed = [name for name, response in results.items() if not response.get("ok")]
+        self.logger.info(f"Fleet: {message.get('cmd')} sent to {len(names) - len(failed)}/{len(names)} hosts"
+                         + (f" (failed: {', '.join(failed)})" if failed else ""))
+        return results
+
+    def free(self, group=None):
+        """グループのホストで解放を開始する"""
+        return self.broadcast({"cmd": "free"}, group)
+
+    def set_policy(self, settings, group=None):
+        """グループのホストの設定を変更する"""
+        return self.broadcast({"cmd": "policy", "settings": settings}, group)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for connection in self.connections.values():
+            connection.close()
+
+
+def _format_value(value, fmt):
+    return format(value, fmt) if value is not None else "-"
+
+
+def _print_report(aggregator, group):
+    print(f"{'host':<16}{'state':<8}{'use %':>7}{'runs 24h':>10}{'freed MB':>10}{'avg MB':>8}{'rtt ms':>8}  error")
+    for row in aggregator.summary(group):
+        print(f"{row['name']:<16}{'up' if row['reachable'] else 'down':<8}{_format_value(row['percent'], '.1f'):>7}"
+              f"{_format_value(row['runs_24h'], 'd'):>10}{_format_value(row['freed_24h_mb'], '.0f'):>10}"
+              f"{_format_value(row['average_mb'], '.1f'):>8}{_format_value(row['rtt_ms'], '.1f'):>8}  {row['error'] or ''}")
+    view = aggregator.fleet_view(group=group)
+    if view:
+        print(f"\n{'minute':<8}{'hosts':>6}{'avg %':>8}{'max %':>8}{'runs':>6}{'freed MB':>10}")
+        for bucket, hosts, average, high, runs, freed in view[-15:]:
+            print(f"{time.strftime('%H:%M', time.localtime(bucket)):<8}{hosts:>6}{_format_value(average, '.1f'):>8}"
+                  f"{_format_value(high, '.1f'):>8}{runs:>6}{freed:>10.0f}")
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="複数のメモリ解放ツールの状態を集約する")
+    parser.add_argument("config", help="ホストの一覧 (fleet.json)")
+    parser.add_argument("--group", default=ALL_GROUP, help="対象のグループ (既定: all)")
+    parser.add_argument("--watch", action="store_true", help="poll_interval_sec ごとに問い合わせ続ける")
+    parser.add_argument("--free", metavar="GROUP", help="グループのホストで解放を開始する")
+    parser.add_argument("--policy", nargs=2, metavar=("GROUP", "JSON"), help="グループのホストの設定を変更する")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    with open(args.config, "r") as f:
+        config = json.load(f)
+    aggregator = FleetAggregator.from_config(config)
+    try:
+        if args.free:
+            for name, response in aggregator.free(args.free).items():
+                print(f"{name}: {'started' if response.get('started') else response.get('error', 'already running')}")
+            return
+        if args.policy:
+            group, settings = args.policy
+            for name, response in aggregator.set_policy(json.loads(settings), group).items():
+                print(f"{name}: {response.get('applied') if response.get('ok') else response.get('error')}")
+            return
+        interval = float(config.get("poll_interval_sec", 10))
+        while True:
+            aggregator.poll(args.group)
+            _print_report(aggregator, args.group)
+            if not args.watch:
+                return
+            time.sleep(interval)
+            print()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        aggregator.close()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,171 @@
+import math
+import threading
+from collections import deque
+
+
+class UsageForecaster:
+    """
+    メモリ使用率の短期予測 (Holt の減衰トレンド法) を行うクラス
+    サンプルの間隔が一定でない (取得間隔が状況によって変わる) ため、トレンドは1秒あたりの変化量で持つ
+    メモリの増加はいずれ止まるため、トレンドは1秒ごとに phi 倍に減衰させて遠い先の予測を抑える
+    予測の誤差は、予測範囲先の予測値と実際の値を比べて記録し、変化しないと見なす単純な予測と比較する
+    検証待ちの間に解放が実行された予測は、解放で実際の値が下がっているため、誤差の集計とは分けて記録する
+    """
+    def __init__(self, alpha=0.3, beta=0.1, phi=0.99, horizon_sec=120, max_errors=200, min_samples=3):
+        """
+        Args:
+            alpha (float): 水準の平滑化係数
+            beta (float): トレンドの平滑化係数
+            phi (float): トレンドの1秒あたりの減衰率 (1 で減衰なし)
+            horizon_sec (float): 予測範囲 (秒)
+            max_errors (int): 誤差を保持する件数
+            min_samples (int): 閾値の判定に必要なサンプル数 (初期化またはやり直しから)
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.phi = phi
+        self.horizon_sec = horizon_sec
+        self.level = None # 平滑化した使用率 (%)
+        self.trend = 0.0 # 使用率の変化量 (ポイント/秒)
+        self.timestamp = None
+        self.min_samples = min_samples
+        self.samples = 0 # 初期化またはやり直しからのサンプル数
+        self.triggers = 0 # 予測による解放の回数
+        self._pending = deque() # 検証待ちの予測 [対象時刻, 予測値, 予測時点の値, 解放の影響を受けたか]
+        self._errors = deque(maxlen=max_errors) # (予測の誤差, 単純な予測の誤差)
+        self._affected_errors = deque(maxlen=max_errors) # 検証待ちの間に解放が実行された予測の誤差
+        self._reset_pending = False
+        self._lock = threading.Lock() # サンプル (UIスレッド) と解放結果 (解放スレッド) の排他
+
+    def set_horizon(self, horizon_sec):
+        """予測範囲を変更する (範囲が変わると誤差を比較できないため、記録した誤差は捨てる)"""
+        if horizon_sec == self.horizon_sec:
+            return
+        with self._lock:
+            self.horizon_sec = horizon_sec
+            self._pending.clear()
+            self._errors.clear()
+            self._affected_errors.clear()
+
+    def add_sample(self, sample):
+        """サンプラーのサンプル (Sample) で予測を更新する"""
+        self.update(sample.timestamp, sample.percent)
+
+    def update(self, timestamp, percent):
+        """
+        観測値で水準とトレンドを更新する
+        Args:
+            timestamp (float): 時刻 (秒)
+            percent (float): 使用率 (%)
+        """
+        with self._lock:
+            if self._reset_pending:
+                # 解放で使用率が不連続に下がったため、トレンドを捨てて初めからやり直す
+                # (検証待ちの予測は on_run で印を付けて残す)
+                self._reset_pending = False
+                self.level = None
+
+            self._score(timestamp, percent)
+
+            if self.level is None:
+                self.level = percent
+                self.trend = 0.0
+                self.samples = 0
+            else:
+                dt = timestamp - self.timestamp
+                if dt <= 0:
+                    return
+                predicted = self.level + self.trend * self._damped(dt)
+                level = self.alpha * percent + (1 - self.alpha) * predicted
+                self.trend = self.beta * (level - self.level) / dt + (1 - self.beta) * self.trend * self.phi ** dt
+                self.level = level
+            self.timestamp = timestamp
+            self.samples += 1
+            self._pending.append([timestamp + self.horizon_sec, self.forecast(), percent, False])
+
+    def _damped(self, ahead):
+        """ahead 秒先までのトレンドの累積倍率 (減衰なしの場合は ahead)"""
+        if self.phi >= 1:
+            return ahead
+        return (1 - self.phi ** ahead) / (1 - self.phi)
+
+    def _score(self, timestamp, percent):
+        """対象時刻を過ぎた予測の誤差を記録する"""
+        while self._pending and self._pending[0][0] <= timestamp:
+            _, predicted, baseline, affected = self._pending.popleft()
+            errors = self._affected_errors if affected else self._errors
+            errors.append((percent - predicted, percent - baseline))
+
+    def on_run(self, report=None):
+        """
+        解放が実行されたことを通知する (解放結果の通知先として登録し、解放処理のスレッドから呼び出される)
+        検証待ちの予測には解放の影響を受けた印を付ける
+        """
+        with self._lock:
+            for entry in self._pending:
+                entry[3] = True
+            self._reset_pending = True
+
+    def forecast(self, ahead_sec=None):
+        """
+        ahead_sec 秒後の使用率の予測値を返す (まだ予測できない場合は None)
+        """
+        if self.level is None:
+            return None
+        ahead = self.horizon_sec if ahead_sec is None else ahead_sec
+        return self.level + self.trend * self._damped(ahead)
+
+    def time_to_threshold(self, threshold):
+        """
+        使用率が閾値に達するまでの推定時間 (秒) を返す
+        Returns:
+            float: 既に閾値以上の場合は 0、減少または横ばいで達しない場合は None
+        """
+        if self.level is None:
+            return None
+        if self.level >= threshold:
+            return 0.0
+        if self.trend <= 0:
+            return None
+        if self.phi >= 1:
+            return (threshold - self.level) / self.trend
+        # trend * (1 - phi^t) / (1 - phi) = threshold - level を t について解く
+        remaining = 1 - (threshold - self.level) * (1 - self.phi) / self.trend
+        if remaining <= 0:
+            # 減衰したトレンドでは閾値に届かない
+            return None
+        return math.log(remaining) / math.log(self.phi)
+
+    def will_cross(self, threshold, horizon_sec=None):
+        """予測範囲内に閾値に達すると予測されるかどうかを返す"""
+        if self.samples < self.min_samples:
+            return False
+        eta = self.time_to_threshold(threshold)
+        return eta is not None and eta <= (self.horizon_sec if horizon_sec is None else horizon_sec)
+
+    def stats(self):
+        """
+        予測の誤差の集計を返す
+        Returns:
+            dict: {"count": 件数, "mae": 平均絶対誤差, "bias": 平均誤差 (正は過小予測),
+                   "naive_mae": 単純な予測の平均絶対誤差, "skill": 1 - mae / naive_mae, "triggers": 予測による解放の回数,
+                   "affected": 解放の影響を受けたため集計から除いた件数, "affected_bias": それらの平均誤差 (負は解放で下がった分)}
+                   (誤差がまだ記録されていない場合は count 0 で誤差は None)
+        """
+        with self._lock:
+            errors = list(self._errors)
+            affected = list(self._affected_errors)
+        result = {"count": len(errors), "mae": None, "bias": None, "naive_mae": None, "skill": None, "triggers": self.triggers,
+                  "affected": len(affected),
+                  "affected_bias": sum(error for error, _ in affected) / len(affected) if affected else None}
+        if not errors:
+            return result
+        mae = sum(abs(error) for error, _ in errors) / len(errors)
+        naive = sum(abs(baseline) for _, baseline in errors) / len(errors)
+        result.update(
+            mae=mae,
+            bias=sum(error for error, _ in errors) / len(errors),
+            naive_mae=naive,
+            skill=1 - mae / naive if naive > 0 else (0.0 if mae == 0 else -math.inf),
+        )
+        return result
@@ -0,0 +1,317 @@
+import csv
+import json
+import time
+import queue
+import sqlite3
+import logging
+import threading
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts REAL NOT NULL,
+    percent REAL NOT NULL,
+    used INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    free INTEGER,
+    standby INTEGER,
+    modified INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_samples_ts ON samples (ts);
+
+CREATE TABLE IF NOT EXISTS samples_minute (
+    bucket INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL,
+    sum_percent REAL NOT NULL,
+    min_percent REAL NOT NULL,
+    max_percent REAL NOT NULL,
+    sum_used REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS samples_hour (
+    bucket INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL,
+    sum_percent REAL NOT NULL,
+    min_percent REAL NOT NULL,
+    max_percent REAL NOT NULL,
+    sum_used REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    trigger TEXT NOT NULL,
+    freed_mb REAL NOT NULL,
+    working_set_mb REAL NOT NULL,
+    standby_mb REAL NOT NULL,
+    modified_mb REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_ts ON runs (ts);
+
+CREATE TABLE IF NOT EXISTS process_outcomes (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    pid INTEGER NOT NULL,
+    name TEXT,
+    action TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outcomes_run ON process_outcomes (run_id);
+CREATE INDEX IF NOT EXISTS idx_outcomes_name ON process_outcomes (name);
+"""
+
+# ロールアップの UPSERT (バケット単位で件数と合計を加算する)
+_ROLLUP_SQL = """
+INSERT INTO {table} (bucket, count, sum_percent, min_percent, max_percent, sum_used)
+VALUES (?, 1, ?, ?, ?, ?)
+ON CONFLICT (bucket) DO UPDATE SET
+    count = count + 1,
+    sum_percent = sum_percent + excluded.sum_percent,
+    min_percent = MIN(min_percent, excluded.min_percent),
+    max_percent = MAX(max_percent, excluded.max_percent),
+    sum_used = sum_used + excluded.sum_used
+"""
+
+# 解像度ごとのテーブルとバケット幅 (秒)
+_RESOLUTIONS = {"minute": ("samples_minute", 60), "hour": ("samples_hour", 3600)}
+
+# エクスポート可能なテーブル
+EXPORT_TABLES = ("samples", "samples_minute", "samples_hour", "runs", "process_outcomes")
+
+
+class HistoryStore:
+    """
+    サンプル履歴、解放結果、プロセスごとの結果を SQLite に保存するクラス
+    書き込みは専用スレッドでまとめて行い、UIスレッドや解放処理を待たせない
+    """
+    def __init__(self, path, raw_retention_hours=24, minute_retention_days=7,
+                 retention_days=90, batch_size=500, flush_interval=2.0):
+        """
+        Args:
+            path (str): データベースファイルのパス
+            raw_retention_hours (int): 生のサンプルを保持する時間
+            minute_retention_days (int): 分単位のロールアップを保持する日数
+            retention_days (int): 時間単位のロールアップと解放結果を保持する日数
+            batch_size (int): 1回のトランザクションで書き込む最大件数
+            flush_interval (float): 書き込みをまとめる待ち時間 (秒)
+        """
+        self.path = path
+        self.raw_retention_hours = raw_retention_hours
+        self.minute_retention_days = minute_retention_days
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger("MemoryCleaner")
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._last_retention = 0.0
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        """スレッドごとの接続を返す (WALモードで読み取りと書き込みを並行させる)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # --- 書き込み (任意のスレッドから呼び出し可能) ---
+
+    def add_sample(self, sample):
+        """サンプラーのサンプル (Sample) を書き込みキューに追加する"""
+        lists = sample.lists
+        self._queue.put(("sample", (
+            sample.timestamp, sample.percent, sample.used, sample.total, sample.source,
+            lists.free if lists else None,
+            lists.standby if lists else None,
+            lists.modified if lists else None,
+        )))
+
+    def add_run(self, report):
+        """
+        解放結果を書き込みキューに追加する
+        Args:
+            report (dict): MemoryCleanerLogic.execute() の結果
+        """
+        self._queue.put(("run", report))
+
+    def close(self, timeout=5.0):
+        """キューに残った書き込みを反映して書き込みスレッドを終了する"""
+        if self._thread.is_alive():
+            self._queue.put(("stop", None))
+            self._thread.join(timeout)
+
+    def _writer_loop(self):
+        conn = self._connect()
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # 一定時間または一定件数までまとめてから1トランザクションで書き込む
+            while len(items) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or items[-1][0] == "stop":
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = any(kind == "stop" for kind, _ in items)
+            try:
+                self._write_batch(conn, items)
+                self._apply_retention(conn)
+            except Exception as e:
+                self.logger.info(f"History Store: write failed: {e}")
+            if stop:
+                conn.close()
+                self._local.conn = None
+                return
+
+    def _write_batch(self, conn, items):
+        samples = [data for kind, data in items if kind == "sample"]
+        runs = [data for kind, data in items if kind == "run"]
+        with conn:
+            if samples:
+                conn.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?)", samples)
+                for table, width in _RESOLUTIONS.values():
+                    conn.executemany(_ROLLUP_SQL.format(table=table), [
+                        (int(ts // width) * width, percent, percent, percent, used)
+                        for ts, percent, used, *_ in samples
+                    ])
+            for report in runs:
+                cursor = conn.execute(
+                    "INSERT INTO runs (ts, trigger, freed_mb, working_set_mb, standby_mb, modified_mb) VALUES (?, ?, ?, ?, ?, ?)",
+                    (report["timestamp"], report.get("trigger", "manual"), report["freed_mb"],
+                     report["working_set_mb"], report["standby_mb"], report["modified_mb"])
+                )
+                outcomes = report.get("outcomes", [])
+                if outcomes:
+                    conn.executemany(
+                        "INSERT INTO process_outcomes VALUES (?, ?, ?, ?, ?, ?)",
+                        [(cursor.lastrowid, pid, name, action, int(success), detail)
+                         for pid, name, action, success, detail in outcomes]
+                    )
+
+    def _apply_retention(self, conn, interval=600):
+        """保持期間を過ぎたデータを削除する (10分に1回)"""
+        now = time.time()
+        if now - self._last_retention < interval:
+            return
+        self._last_retention = now
+        with conn:
+            conn.execute("DELETE FROM samples WHERE ts < ?", (now - self.raw_retention_hours * 3600,))
+            conn.execute("DELETE FROM samples_minute WHERE bucket < ?", (now - self.minute_retention_days * 86400,))
+            conn.execute("DELETE FROM samples_hour WHERE bucket < ?", (now - self.retention_days * 86400,))
+            conn.execute("DELETE FROM runs WHERE ts < ?", (now - self.retention_days * 86400,))
+
+    # --- 読み取り ---
+
+    def query_samples(self, since, until=None, resolution="raw"):
+        """
+        指定期間のメモリ使用率を返す
+        Args:
+            since (float): 開始時刻 (UNIX時間)
+            until (float): 終了時刻 (省略時は現在)
+            resolution (str): "raw" / "minute" / "hour"
+        Returns:
+            list: (時刻, 平均使用率, 最小使用率, 最大使用率) のリスト
+        """
+        until = time.time() if until is None else until
+        conn = self._connect()
+        if resolution == "raw":
+            return conn.execute(
+                "SELECT ts, percent, percent, percent FROM samples WHERE ts BETWEEN ? AND ? ORDER BY ts",
+                (since, until)
+            ).fetchall()
+        table, width = _RESOLUTIONS[resolution]
+        # 開始時刻を含むバケットも返すため、開始時刻をバケットの先頭に揃える
+        since = int(since // width) * width
+        return conn.execute(
+            f"SELECT bucket, sum_percent / count, min_percent, max_percent FROM {table} "
+            "WHERE bucket BETWEEN ? AND ? ORDER BY bucket",
+            (since, until)
+        ).fetchall()
+
+    def query_runs(self, since, limit=100):
+        """
+        指定時刻以降の解放結果を新しい順に返す
+        Returns:
+            list: (id, 時刻, 契機, 解放量, ワーキングセット, スタンバイ, 変更済み) のリスト
+        """
+        return self._connect().execute(
+            "SELECT id, ts, trigger, freed_mb, working_set_mb, standby_mb, modified_mb "
+            "FROM runs WHERE ts >= ? ORDER BY ts DESC LIMIT ?",
+            (since, limit)
+        ).fetchall()
+
+    def run_stats(self, since):
+        """
+        指定時刻以降の解放回数と解放量の集計を返す
+        Returns:
+            dict: {"runs": 回数, "total_mb": 合計, "average_mb": 平均, "max_mb": 最大}
+        """
+        row = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(freed_mb), 0), COALESCE(AVG(freed_mb), 0), COALESCE(MAX(freed_mb), 0) "
+            "FROM runs WHERE ts >= ?",
+            (since,)
+        ).fetchone()
+        return {"runs": row[0], "total_mb": row[1], "average_mb": row[2], "max_mb": row[3]}
+
+    def process_outcomes(self, run_id):
+        """
+        1回の解放におけるプロセスごとの結果を返す
+        Returns:
+            list: (pid, プロセス名, 操作, 成功, 詳細) のリスト
+        """
+        return self._connect().execute(
+            "SELECT pid, name, action, success, detail FROM process_outcomes WHERE run_id = ?",
+            (run_id,)
+        ).fetchall()
+
+    # --- エクスポート ---
+
+    def export(self, table, fileobj, fmt="csv", since=None):
+        """
+        テーブルの内容をストリーミングで書き出す (全件をメモリに読み込まない)
+        Args:
+            table (str): EXPORT_TABLES のいずれか
+            fileobj: 書き込み先のテキストファイル
+            fmt (str): "csv" または "jsonl"
+            since (float): この時刻以降の行のみ (時刻を持たないテーブルでは無視)
+        Returns:
+            int: 書き出した行数
+        """
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"unknown table: {table}")
+        time_column = {"samples": "ts", "runs": "ts", "samples_minute": "bucket", "samples_hour": "bucket"}.get(table)
+        sql = f"SELECT * FROM {table}"
+        params = ()
+        if since is not None and time_column:
+            sql += f" WHERE {time_column} >= ? ORDER BY {time_column}"
+            params = (since,)
+        cursor = self._connect().execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+
+        count = 0
+        if fmt == "csv":
+            writer = csv.writer(fileobj)
+            writer.writerow(columns)
+            for row in cursor:
+                writer.writerow(row)
+                count += 1
+        elif fmt == "jsonl":
+            for row in cursor:
+                fileobj.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                fileobj.write("\n")
+                count += 1
+        else:
+            raise ValueError(f"unknown format: {fmt}")
+        return count
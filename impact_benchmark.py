@@ -0,0 +1,397 @@
+"""
+解放処理がシステムに与える影響を測る A/B ベンチマーク (Linux)
+
+ページキャッシュを読み続けるワークロードと匿名メモリに書き続けるワークロードを子プロセスで動かし、
+何もしない (noop)、ファイルキャッシュの破棄 (standby)、全体の解放 (full)、解放量の目安付きの解放 (budget) を
+順番を入れ替えながら繰り返して、操作の前後のスループット、ページフォールト、ディスク読み込み、回復時間を比べる。
+
+    python impact_benchmark.py
+    python impact_benchmark.py --file-mb 1024 --anon-mb 512 --rounds 5 --json result.json
+    python impact_benchmark.py --scope system  # ツール以外のプロセスも含めて解放する (root 推奨)
+
+測定:
+    操作の直前 baseline_sec 秒間のスループットを基準とし、操作の開始から recovery_sec 秒間を interval 秒ごとに測る。
+    lost は基準に対して失われた処理量を秒に換算したもの (基準の半分の速度で2秒動けば 1 秒)。
+    recover は基準の 95% 以上の速度が2区間続くようになるまでの時間 (回復しなかった場合は表示しない)。
+    フォールトと読み込み量はワークロードのプロセスの増分、pgpgin はシステム全体のページインの増分。
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import multiprocessing
+from fast_readers import list_pids
+from refault_tracker import read_faults
+
+ACTIONS = ("noop", "standby", "full", "budget")
+
+_PAGE = 4096
+_BLOCK = 64 * 1024 # ファイルを読むワークロードの1回の読み込みサイズ
+
+
+def _file_worker(path, counter, stop):
+    """ファイルの任意の位置を読み続ける (ページキャッシュに載っていれば CPU のみで動く)"""
+    fd = os.open(path, os.O_RDONLY)
+    blocks = os.fstat(fd).st_size // _BLOCK
+    rng = random.Random(1)
+    while not stop.is_set():
+        for _ in range(64):
+            os.pread(fd, _BLOCK, rng.randrange(blocks) * _BLOCK)
+        counter.value += 64
+
+
+def _anon_worker(size, counter, stop):
+    """確保した匿名メモリのページに書き続ける (ページアウトされると書き込み時にフォールトする)"""
+    buffer = bytearray(size)
+    pages = size // _PAGE
+    for offset in range(0, size, _PAGE):
+        buffer[offset] = 1
+    rng = random.Random(2)
+    while not stop.is_set():
+        for _ in range(1024):
+            offset = rng.randrange(pages) * _PAGE
+            buffer[offset] = (buffer[offset] + 1) & 0xFF
+        counter.value += 1024
+
+
+def read_io_bytes(pid, proc_root="/proc"):
+    """プロセスがストレージから読み込んだバイト数 (/proc/<pid>/io の read_bytes) を返す"""
+    try:
+        with open(f"{proc_root}/{pid}/io", "r") as f:
+            for line in f:
+                if line.startswith("read_bytes:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def read_vmstat(fields, path="/proc/vmstat"):
+    """/proc/vmstat から指定した項目を読み取る"""
+    values = dict.fromkeys(fields, 0)
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                name, _, value = line.partition(" ")
+                if name in values:
+                    values[name] = int(value)
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+class Workload:
+    """子プロセスで動く合成ワークロード (処理した単位数を共有メモリのカウンタで返す)"""
+    def __init__(self, name, target, args, context):
+        self.name = name
+        self.counter = context.RawValue("Q", 0)
+        self.stop_event = context.Event()
+        self.process = context.Process(target=target, args=(*args, self.counter, self.stop_event), daemon=True)
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def start(self):
+        self.process.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+
+    def faults(self):
+        return read_faults(self.pid) or (0, 0)
+
+    def io_bytes(self):
+        return read_io_bytes(self.pid)
+
+
+class ImpactBenchmark:
+    """
+    合成ワークロードを動かしたまま解放の各操作を実行し、ワークロードへの影響を測るクラス
+    解放は MemoryCleanerLogic.execute を通して行い、実際の解放処理 (除外、スワップの判定などを含む) のコストを測る
+    """
+    def __init__(self, file_mb=512, anon_mb=256, baseline_sec=5.0, recovery_sec=20.0, interval=0.25,
+                 rounds=3, budget_mb=256, scope="workload", workdir=None, actions=ACTIONS):
+        """
+        Args:
+            file_mb (int): ファイルを読むワークロードのファイルサイズ (MB)
+            anon_mb (int): 匿名メモリのワークロードの確保量 (MB)
+            baseline_sec (float): 操作の前に基準のスループットを測る時間 (秒)
+            recovery_sec (float): 操作の開始から測定を続ける時間 (秒)
+            interval (float): 操作後のスループットを測る区間の長さ (秒)
+            rounds (int): 各操作を繰り返す回数 (回ごとに操作の順番をずらす)
+            budget_mb (float): budget の操作で指定する解放量の目安 (MB)
+            scope (str): "workload" (ワークロードのプロセスとファイルのみ) / "system" (システム全体)
+            workdir (str): ファイルを作成するディレクトリ (省略時はカレントディレクトリ)
+            actions (tuple): 実行する操作
+        """
+        from memory_cleaner_logic import MemoryCleanerLogic
+
+        self.file_mb = file_mb
+        self.anon_mb = anon_mb
+        self.baseline_sec = baseline_sec
+        self.recovery_sec = recovery_sec
+        self.interval = interval
+        self.rounds = rounds
+        self.budget_mb = budget_mb
+        self.scope = scope
+        self.actions = tuple(actions)
+        self.path = os.path.join(workdir or os.getcwd(), f".impact_benchmark_{os.getpid()}.dat")
+        self.logic = MemoryCleanerLogic()
+        self.workloads = []
+
+    # --- 準備と後片付け ---
+
+    def start(self, warmup_sec=5.0):
+        """ファイルを作成してワークロードを起動し、ページキャッシュと匿名メモリが載るまで待つ"""
+        chunk = os.urandom(1024 * 1024)
+        with open(self.path, "wb") as f:
+            for _ in range(self.file_mb):
+                f.write(chunk)
+        context = multiprocessing.get_context("fork")
+        self.workloads = [
+            Workload("file", _file_worker, (self.path,), context),
+            Workload("anon", _anon_worker, (self.anon_mb * 1024 * 1024,), context),
+        ]
+        for workload in self.workloads:
+            workload.start()
+        time.sleep(warmup_sec)
+
+    def close(self):
+        for workload in self.workloads:
+            workload.stop()
+        self.workloads = []
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    # --- 操作 ---
+
+    def _purge_file_cache(self):
+        """ファイルキャッシュを破棄する (Windows のスタンバイリストの解放に相当)"""
+        if self.scope == "system":
+            os.sync()
+            try:
+                with open("/proc/sys/vm/drop_caches", "w") as f:
+                    f.write("1")
+                return "drop_caches"
+            except OSError:
+                pass
+        # ワークロードのファイルのみ、または root でない場合
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+        return "fadvise"
+
+    def _excluded_pids(self):
+        """scope が workload の場合は、ワークロード以外のすべてのプロセスを除外する"""
+        if self.scope == "system":
+            return {os.getpid()}
+        workload_pids = {workload.pid for workload in self.workloads}
+        return set(list_pids()) - workload_pids
+
+    def _run_action(self, action):
+        """
+        操作を1回実行する
+        Returns:
+            str: 実行した方法の補足
+        """
+        if action == "noop":
+            return ""
+        if action == "standby":
+            return self._purge_file_cache()
+        import psutil
+        budget_mb = psutil.virtual_memory().total / (1024 * 1024) if action == "full" else self.budget_mb
+        freed_mb = self.logic.execute(trigger="benchmark", budget_mb=budget_mb, exclude_pids=self._excluded_pids())
+        report = self.logic.last_report or {}
+        swap = report.get("swap")
+        return f"freed {freed_mb:.1f} MB" + (f", swap {swap['mode']}" if swap else "")
+
+    # --- 測定 ---
+
+    def _counts(self):
+        return [workload.counter.value for workload in self.workloads]
+
+    def _trial(self, action):
+        """1回の操作の前後を測定する"""
+        start_counts = self._counts()
+        time.sleep(self.baseline_sec)
+        baseline = [(c - s) / self.baseline_sec for c, s in zip(self._counts(), start_counts)]
+
+        faults_before = [workload.faults() for workload in self.workloads]
+        io_before = [workload.io_bytes() for workload in self.workloads]
+        vmstat_before = read_vmstat(("pgpgin", "pgmajfault"))
+
+        started = time.monotonic()
+        counts = self._counts()
+        note = self._run_action(action)
+        action_sec = time.monotonic() - started
+
+        # 操作の実行中を含めて、操作の開始から区間ごとのスループットを測る
+        series = [[] for _ in self.workloads]
+        last_time = started
+        while True:
+            now = time.monotonic()
+            if now - last_time < self.interval:
+                time.sleep(self.interval - (now - last_time))
+                now = time.monotonic()
+            current = self._counts()
+            for i, (c, p) in enumerate(zip(current, counts)):
+                series[i].append((now - started, (c - p) / (now - last_time)))
+            counts, last_time = current, now
+            if now - started >= self.recovery_sec:
+                break
+
+        faults_after = [workload.faults() for workload in self.workloads]
+        io_after = [workload.io_bytes() for workload in self.workloads]
+        vmstat_after = read_vmstat(("pgpgin", "pgmajfault"))
+
+        result = {"action": action, "note": note, "action_sec": action_sec,
+                  "pgpgin_mb": (vmstat_after["pgpgin"] - vmstat_before["pgpgin"]) / 1024,
+                  "system_majflt": vmstat_after["pgmajfault"] - vmstat_before["pgmajfault"],
+                  "workloads": {}}
+        for i, workload in enumerate(self.workloads):
+            result["workloads"][workload.name] = self._evaluate(
+                baseline[i], series[i], faults_before[i], faults_after[i], io_before[i], io_after[i])
+        return result
+
+    def _evaluate(self, baseline, series, faults_before, faults_after, io_before, io_after):
+        """1つのワークロードの落ち込み、失われた処理量、回復時間をまとめる"""
+        lost = 0.0
+        recovered = None
+        streak = None
+        previous = 0.0
+        min_ratio = 1.0
+        for elapsed, rate in series:
+            ratio = rate / baseline if baseline > 0 else 1.0
+            min_ratio = min(min_ratio, ratio)
+            lost += max(0.0, 1.0 - ratio) * (elapsed - previous)
+            # 基準の 95% 以上が2区間続いた最初の区間の開始を回復時刻とする
+            if ratio >= 0.95:
+                if streak is None:
+                    streak = [previous, 0]
+                streak[1] += 1
+                if streak[1] >= 2 and recovered is None:
+                    recovered = streak[0]
+            else:
+                streak = None
+            previous = elapsed
+        return {
+            "baseline": baseline,
+            "min_ratio": min_ratio,
+            "lost_sec": lost,
+            "recover_sec": recovered,
+            "minflt": faults_after[0] - faults_before[0],
+            "majflt": faults_after[1] - faults_before[1],
+            "read_mb": (io_after - io_before) / (1024 * 1024),
+        }
+
+    def run(self, progress=None):
+        """
+        すべての操作を rounds 回繰り返す (回ごとに操作の順番をずらし、時間による変化の影響を均す)
+        Args:
+            progress (callable): 1回の操作ごとに (回, 結果) を受け取る関数
+        Returns:
+            list: 各操作の測定結果
+        """
+        results = []
+        for round_index in range(self.rounds):
+            shift = round_index % len(self.actions)
+            for action in self.actions[shift:] + self.actions[:shift]:
+                result = self._trial(action)
+                result["round"] = round_index
+                results.append(result)
+                if progress is not None:
+                    progress(round_index, result)
+        return results
+
+
+def summarize(results):
+    """
+    操作とワークロードごとに中央値をまとめる
+    Returns:
+        list: (操作, ワークロード, 集計の辞書) のリスト
+    """
+    rows = []
+    actions = []
+    for result in results:
+        if result["action"] not in actions:
+            actions.append(result["action"])
+    for action in actions:
+        trials = [r for r in results if r["action"] == action]
+        for name in trials[0]["workloads"]:
+            values = [t["workloads"][name] for t in trials]
+            recovered = [v["recover_sec"] for v in values if v["recover_sec"] is not None]
+            rows.append((action, name, {
+                "trials": len(trials),
+                "action_sec": statistics.median(t["action_sec"] for t in trials),
+                "min_ratio": statistics.median(v["min_ratio"] for v in values),
+                "lost_sec": statistics.median(v["lost_sec"] for v in values),
+                "recover_sec": statistics.median(recovered) if len(recovered) == len(values) else None,
+                "majflt": statistics.median(v["majflt"] for v in values),
+                "minflt": statistics.median(v["minflt"] for v in values),
+                "read_mb": statistics.median(v["read_mb"] for v in values),
+                "pgpgin_mb": statistics.median(t["pgpgin_mb"] for t in trials),
+            }))
+    return rows
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="解放処理がワークロードに与える影響を測る (Linux)")
+    parser.add_argument("--file-mb", type=int, default=512, help="ページキャッシュを読むワークロードのファイルサイズ (MB)")
+    parser.add_argument("--anon-mb", type=int, default=256, help="匿名メモリのワークロードの確保量 (MB)")
+    parser.add_argument("--rounds", type=int, default=3, help="各操作を繰り返す回数")
+    parser.add_argument("--baseline-sec", type=float, default=5.0, help="操作前の基準の測定時間 (秒)")
+    parser.add_argument("--recovery-sec", type=float, default=20.0, help="操作後の測定時間 (秒)")
+    parser.add_argument("--budget-mb", type=float, default=256, help="budget の操作の解放量の目安 (MB)")
+    parser.add_argument("--scope", choices=("workload", "system"), default="workload", help="解放の対象")
+    parser.add_argument("--actions", default=",".join(ACTIONS), help="実行する操作 (カンマ区切り)")
+    parser.add_argument("--workdir", help="ファイルを作成するディレクトリ")
+    parser.add_argument("--json", help="測定結果をすべて書き出す JSON ファイル")
+    args = parser.parse_args()
+
+    if not sys.platform.startswith("linux"):
+        parser.error("this benchmark runs on Linux only")
+    actions = tuple(a for a in args.actions.split(",") if a)
+    unknown = [a for a in actions if a not in ACTIONS]
+    if unknown:
+        parser.error(f"unknown action: {', '.join(unknown)}")
+
+    import psutil
+    swap = psutil.swap_memory()
+    print(f"workload: file {args.file_mb} MB, anon {args.anon_mb} MB, scope {args.scope}, "
+          f"swap {swap.total / (1024 * 1024):.0f} MB"
+          + (" (anonymous pages cannot be paged out without swap)" if not swap.total else ""))
+
+    bench = ImpactBenchmark(args.file_mb, args.anon_mb, args.baseline_sec, args.recovery_sec,
+                            rounds=args.rounds, budget_mb=args.budget_mb, scope=args.scope,
+                            workdir=args.workdir, actions=actions)
+    try:
+        bench.start()
+        results = bench.run(lambda r, result: print(
+            f"  round {r + 1} {result['action']:<8} {result['action_sec']:.3f} s {result['note']}", flush=True))
+    finally:
+        bench.close()
+
+    print(f"{'action':<9}{'workload':<9}{'act s':>7}{'min tput':>10}{'lost s':>8}{'recover s':>11}"
+          f"{'majflt':>8}{'minflt':>9}{'read MB':>9}{'pgpgin MB':>11}")
+    for action, name, s in summarize(results):
+        recover = f"{s['recover_sec']:.2f}" if s["recover_sec"] is not None else "-"
+        print(f"{action:<9}{name:<9}{s['action_sec']:>7.3f}{s['min_ratio']:>10.0%}{s['lost_sec']:>8.2f}{recover:>11}"
+              f"{s['majflt']:>8.0f}{s['minflt']:>9.0f}{s['read_mb']:>9.1f}{s['pgpgin_mb']:>11.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,270 @@
+"""
+Linux のカーネル同一ページ併合 (KSM) の管理
+
+似たプロセスが多いホスト (ワーカープール、仮想マシン、コンテナ) では、ワーキングセットを空にするより
+同じ内容のページを1つにまとめるほうが多くのメモリを節約できる場合がある。
+KsmController はメモリの逼迫度に応じて /sys/kernel/mm/ksm の走査速度 (run, pages_to_scan, sleep_millisecs) を調整し、
+走査しても併合が増えない場合は走査を抑えて CPU を節約する。
+
+PR_SET_MEMORY_MERGE は呼び出したプロセス自身にしか設定できないため、ルールに一致したプロセスは
+協調解放のクライアントとして登録されている場合に限り、解放要求と同じ接続で併合の有効化を依頼する。
+設定は fork と exec で引き継がれるため、ワーカープールなどは次のように起動すると全体を併合の対象にできる。
+
+    python ksm_manager.py exec -- gunicorn app:app -w 16
+    python ksm_manager.py status
+"""
+import os
+import sys
+import time
+import ctypes
+import threading
+import ctypes.util
+import logging
+import argparse
+
+DEFAULT_KSM_ROOT = "/sys/kernel/mm/ksm"
+
+PR_SET_MEMORY_MERGE = 67 # Linux 6.4 以降
+
+_SETTINGS = ("run", "pages_to_scan", "sleep_millisecs")
+
+# 逼迫度ごとの走査の設定 (run, pages_to_scan, sleep_millisecs)
+LEVELS = {
+    "low": (1, 100, 200),
+    "medium": (1, 1000, 50),
+    "high": (1, 5000, 20),
+}
+_ORDER = ("low", "medium", "high")
+
+
+def set_memory_merge(enable=True):
+    """
+    自プロセス (と以降に fork/exec するプロセス) の匿名メモリを KSM の併合対象にする
+    Raises:
+        OSError: カーネルが対応していない (EINVAL) 、または権限がない場合
+    """
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if libc.prctl(PR_SET_MEMORY_MERGE, 1 if enable else 0, 0, 0, 0) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+
+def read_process_merging(pid, proc_root="/proc"):
+    """
+    プロセスの併合済みページ数 (/proc/<pid>/ksm_stat の ksm_merging_pages) を返す
+    Returns:
+        int or None: 取得できない場合は None
+    """
+    try:
+        with open(f"{proc_root}/{pid}/ksm_stat", "r") as f:
+            for line in f:
+                if line.startswith("ksm_merging_pages"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class KsmStats:
+    """KSM の併合状況"""
+    __slots__ = ("pages_shared", "pages_sharing", "pages_unshared", "pages_volatile", "pages_scanned", "full_scans", "page_size")
+
+    def __init__(self, values, page_size):
+        self.pages_shared = values.get("pages_shared", 0) # 併合後に残っている共有ページ数
+        self.pages_sharing = values.get("pages_sharing", 0) # 共有ページを参照しているページ数 (節約できたページ数)
+        self.pages_unshared = values.get("pages_unshared", 0) # 内容が一致せず併合できなかったページ数
+        self.pages_volatile = values.get("pages_volatile", 0) # 変化が速く併合の対象にならないページ数
+        self.pages_scanned = values.get("pages_scanned") # 累計の走査ページ数 (古いカーネルでは None)
+        self.full_scans = values.get("full_scans", 0)
+        self.page_size = page_size
+
+    @property
+    def shared_mb(self):
+        return self.pages_shared * self.page_size / (1024 * 1024)
+
+    @property
+    def saved_mb(self):
+        return self.pages_sharing * self.page_size / (1024 * 1024)
+
+
+class KsmController:
+    """
+    KSM の走査速度をメモリの逼迫度に応じて調整するクラス
+    変更前の設定を記録し、無効にしたときや終了時に元に戻す
+    adjust は UIスレッド、boost は解放処理のスレッドから呼び出されるため、設定の変更はロックで排他する
+    """
+    def __init__(self, ksm_root=DEFAULT_KSM_ROOT, adjust_interval=30.0, min_gain_per_mpages=64):
+        """
+        Args:
+            ksm_root (str): KSM の sysfs ディレクトリ (テスト時は偽のツリーを指定可能)
+            adjust_interval (float): 走査速度を見直す最短の間隔 (秒)
+            min_gain_per_mpages (float): 走査を続ける価値があると見なす、走査100万ページあたりの節約ページ数の増加
+        """
+        self.ksm_root = ksm_root
+        self.adjust_interval = adjust_interval
+        self.min_gain_per_mpages = min_gain_per_mpages
+        self.enabled = False
+        self.level = None # 現在の走査の段階 (LEVELS のキー、ツールが変更していない場合は None)
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self.logger = logging.getLogger("MemoryCleaner")
+        self._original = None # 変更前の設定
+        self._last_adjust = None
+        self._last_stats = None # 前回見直したときの KsmStats
+        self._idle_rounds = 0 # 走査しても併合が増えなかった回数
+        self._wanted = None # 前回の使用率から決めた段階
+        self._lock = threading.RLock()
+
+    @property
+    def is_available(self):
+        return os.path.exists(os.path.join(self.ksm_root, "run"))
+
+    def _read_value(self, name):
+        with open(os.path.join(self.ksm_root, name), "r") as f:
+            return int(f.read().strip())
+
+    def _write_value(self, name, value):
+        with open(os.path.join(self.ksm_root, name), "w") as f:
+            f.write(str(value))
+
+    def read_settings(self):
+        return {name: self._read_value(name) for name in _SETTINGS}
+
+    def read_stats(self):
+        """
+        併合状況を返す
+        Returns:
+            KsmStats or None: KSM が利用できない場合は None
+        """
+        if not self.is_available:
+            return None
+        values = {}
+        for name in ("pages_shared", "pages_sharing", "pages_unshared", "pages_volatile", "pages_scanned", "full_scans"):
+            try:
+                values[name] = self._read_value(name)
+            except (OSError, ValueError):
+                pass
+        return KsmStats(values, self.page_size)
+
+    def set_enabled(self, enabled):
+        """管理を有効/無効にする (無効にした場合は元の設定に戻す)"""
+        with self._lock:
+            self.enabled = enabled and self.is_available
+            if not self.enabled:
+                self.restore()
+
+    def _apply(self, level):
+        """走査の段階を設定する"""
+        if level == self.level:
+            return
+        if self._original is None:
+            self._original = self.read_settings()
+        run, pages, sleep = LEVELS[level]
+        self._write_value("pages_to_scan", pages)
+        self._write_value("sleep_millisecs", sleep)
+        self._write_value("run", run)
+        self.logger.info(f"KSM: scan level {self.level or 'default'} -> {level} (pages_to_scan {pages}, sleep {sleep} ms)")
+        self.level = level
+
+    def restore(self):
+        """変更前の設定に戻す"""
+        with self._lock:
+            if self._original is None:
+                return
+            try:
+                for name in ("pages_to_scan", "sleep_millisecs", "run"):
+                    self._write_value(name, self._original[name])
+                self.logger.info(f"KSM: settings restored ({self._original})")
+            except OSError as e:
+                self.logger.info(f"KSM: failed to restore settings: {e}")
+            self._original = None
+            self.level = None
+
+    def adjust(self, percent, warning, now=None):
+        """
+        使用率に応じて走査の段階を見直す (adjust_interval 秒に1回)
+        注意閾値 (警告閾値の75%) 未満は低速、警告閾値までは中速、警告閾値以上は高速で走査する
+        走査しても節約ページ数が増えない状態が続いた場合は1段階ずつ下げる
+        Args:
+            percent (float): 使用率 (%)
+            warning (int): 警告閾値 (%、不正な場合は None)
+        """
+        if not self.enabled or warning is None:
+            return
+        with self._lock:
+            self._adjust(percent, warning, time.monotonic() if now is None else now)
+
+    def _adjust(self, percent, warning, now):
+        if self._last_adjust is not None and now - self._last_adjust < self.adjust_interval:
+            return
+        self._last_adjust = now
+        try:
+            stats = self.read_stats()
+            if percent >= warning:
+                wanted = "high"
+            elif percent >= warning * 0.75:
+                wanted = "medium"
+            else:
+                wanted = "low"
+            # 逼迫度が上がった場合は、併合が増えなかった記録を捨てて走査し直す
+            if self._wanted is not None and _ORDER.index(wanted) > _ORDER.index(self._wanted):
+                self._idle_rounds = 0
+            self._wanted = wanted
+            previous, self._last_stats = self._last_stats, stats
+            if previous is not None and stats.pages_scanned is not None and previous.pages_scanned is not None:
+                scanned = stats.pages_scanned - previous.pages_scanned
+                gained = stats.pages_sharing - previous.pages_sharing
+                if scanned > 0 and gained * 1_000_000 / scanned < self.min_gain_per_mpages:
+                    self._idle_rounds += 1
+                else:
+                    self._idle_rounds = 0
+            # 併合が増えない回数に応じて段階を下げる (低速より下げると新しいページを併合できないため低速で止める)
+            index = max(0, _ORDER.index(wanted) - self._idle_rounds // 2)
+            self._apply(_ORDER[index])
+        except (OSError, ValueError) as e:
+            self.logger.info(f"KSM: adjust failed: {e}")
+
+    def boost(self):
+        """解放の実行時に呼び出し、1回の見直し間隔だけ高速で走査する"""
+        if not self.enabled:
+            return
+        with self._lock:
+            try:
+                self._apply("high")
+                self._last_adjust = time.monotonic()
+            except OSError as e:
+                self.logger.info(f"KSM: boost failed: {e}")
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="KSM (カーネル同一ページ併合) の状態表示と併合対象での起動")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="併合状況を表示する")
+    exec_parser = subparsers.add_parser("exec", help="併合を有効にしてコマンドを実行する (子プロセスにも引き継がれる)")
+    exec_parser.add_argument("argv", nargs=argparse.REMAINDER, help="実行するコマンド (-- の後に指定)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        controller = KsmController()
+        stats = controller.read_stats()
+        if stats is None:
+            print("KSM is not available on this kernel", file=sys.stderr)
+            sys.exit(1)
+        settings = controller.read_settings()
+        print(f"run {settings['run']}, pages_to_scan {settings['pages_to_scan']}, sleep {settings['sleep_millisecs']} ms")
+        print(f"shared {stats.shared_mb:.1f} MB, saved {stats.saved_mb:.1f} MB "
+              f"(unshared {stats.pages_unshared}, volatile {stats.pages_volatile}, full scans {stats.full_scans})")
+        return
+
+    argv = args.argv[1:] if args.argv[:1] == ["--"] else args.argv
+    if not argv:
+        exec_parser.error("command is required")
+    try:
+        set_memory_merge(True)
+    except OSError as e:
+        print(f"PR_SET_MEMORY_MERGE failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    os.execvp(argv[0], argv)
+
+
+if __name__ == "__main__":
+    _main()
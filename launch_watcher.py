@@ -0,0 +1,296 @@
+"""
+プロセスの起動を監視し、監視ルールに一致するプロセスが起動したら通知する
+
+Linux ではプロセスコネクタ (netlink) の exec イベントを受け取る (CAP_NET_ADMIN が必要)。
+使用できない環境では、プロセスIDの一覧を短い間隔で取得し、前回との差分から新しいプロセスを検出する。
+"""
+import os
+import time
+import socket
+import struct
+import logging
+import threading
+import psutil
+from collections import deque
+from fast_readers import list_pids
+
+# プロセスコネクタの定数 (linux/connector.h, linux/cn_proc.h)
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+NLMSG_DONE = 3
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+PROC_EVENT_EXEC = 0x00000002
+
+_NLMSGHDR = struct.Struct("=IHHII") # len, type, flags, seq, pid
+_CN_MSG = struct.Struct("=IIIIHH") # idx, val, seq, ack, len, flags
+_PROC_EVENT = struct.Struct("=IIQ") # what, cpu, timestamp_ns
+_EXEC_EVENT = struct.Struct("=II") # process_pid, process_tgid
+
+
+class LaunchRule:
+    """
+    1つのプロセス名に対する起動時の解放ルール
+    """
+    __slots__ = ("name", "budget_mb", "cooldown_sec")
+
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): ルールの設定
+                {"name": "game.exe", "budget_mb": 4096, "cooldown_sec": 60}
+        Raises:
+            ValueError: 設定が不正な場合
+        """
+        name = config.get("name")
+        if not name:
+            raise ValueError("name is required")
+        self.name = name
+        # 解放するワーキングセットの目安 (0 は上限なし)
+        self.budget_mb = float(config.get("budget_mb", 0))
+        # 同じプロセス名で続けて起動した場合に解放を見送る時間 (ビルドで多数起動する場合など)
+        self.cooldown_sec = float(config.get("cooldown_sec", 60))
+        if self.budget_mb < 0 or self.cooldown_sec < 0:
+            raise ValueError("budget_mb and cooldown_sec must not be negative")
+
+
+class LaunchEvent:
+    """監視対象のプロセスの起動"""
+    __slots__ = ("pid", "name", "rule", "started", "detected")
+
+    def __init__(self, pid, name, rule, started, detected):
+        self.pid = pid
+        self.name = name
+        self.rule = rule
+        self.started = started # 起動した時刻 (time.monotonic() 基準)
+        self.detected = detected # 検出した時刻 (time.monotonic() 基準)
+
+
+class ProcConnector:
+    """
+    プロセスコネクタから exec イベントを受け取る (Linux専用)
+    """
+    def __init__(self):
+        """
+        Raises:
+            OSError: netlink ソケットを開けない場合 (権限不足、非対応のカーネルなど)
+        """
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            self.sock.bind((0, CN_IDX_PROC))
+            self._control(PROC_CN_MCAST_LISTEN)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def _control(self, op):
+        payload = struct.pack("=I", op)
+        cn_msg = _CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0) + payload
+        header = _NLMSGHDR.pack(_NLMSGHDR.size + len(cn_msg), NLMSG_DONE, 0, 0, os.getpid())
+        self.sock.send(header + cn_msg)
+
+    def receive(self):
+        """
+        イベントを受け取るまで待ち、exec したプロセスを返す
+        Returns:
+            list: (pid, 起動した時刻 time.monotonic() 基準) のリスト
+        """
+        data = self.sock.recv(65536)
+        execs = []
+        offset = 0
+        while offset + _NLMSGHDR.size <= len(data):
+            length = _NLMSGHDR.unpack_from(data, offset)[0]
+            if length < _NLMSGHDR.size:
+                break
+            event = offset + _NLMSGHDR.size + _CN_MSG.size
+            if event + _PROC_EVENT.size + _EXEC_EVENT.size <= offset + length:
+                what, _, timestamp_ns = _PROC_EVENT.unpack_from(data, event)
+                if what == PROC_EVENT_EXEC:
+                    _, tgid = _EXEC_EVENT.unpack_from(data, event + _PROC_EVENT.size)
+                    # イベントの時刻はカーネルの単調時計 (CLOCK_MONOTONIC と同じ基準)
+                    execs.append((tgid, timestamp_ns / 1e9))
+            offset += (length + 3) & ~3
+        return execs
+
+    def close(self):
+        try:
+            self._control(PROC_CN_MCAST_IGNORE)
+        except OSError:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class LaunchWatcher:
+    """
+    監視ルールに一致するプロセスの起動を検出し、callback(LaunchEvent) を呼び出すクラス
+    callback は監視スレッドから呼び出される
+    """
+    def __init__(self, callback, poll_interval=0.5, proc_root="/proc"):
+        """
+        Args:
+            callback (callable): 起動を検出したときに呼び出す関数 (LaunchEvent)
+            poll_interval (float): 差分検出で使う、プロセス一覧の取得間隔 (秒)
+            proc_root (str): procfs のルート (Linux)
+        """
+        self.logger = logging.getLogger("MemoryCleaner")
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.proc_root = proc_root
+        self.rules = [] # 検証済みのルールの辞書 (設定ファイルに保存する)
+        self.index = {} # プロセス名 -> LaunchRule
+        self.mode = None # "netlink" / "poll" (停止中は None)
+        self._last_fired = {} # プロセス名 -> 最後に通知した時刻
+        self.latencies = deque(maxlen=50) # 直近の (プロセス名, 起動から解放完了まで ms, 起動から検出まで ms)
+        self._connector = None
+        self._stopped = threading.Event() # 監視スレッドごとに作り直す (停止した古いスレッドが新しい監視の状態を見ない)
+        self._stopped.set()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return not self._stopped.is_set()
+
+    def set_rules(self, rules):
+        """
+        ルールを検証して索引を作り直す
+        Args:
+            rules (list): ルールの辞書のリスト
+        """
+        compiled = []
+        index = {}
+        for config in rules or []:
+            try:
+                rule = LaunchRule(config)
+            except (ValueError, TypeError, AttributeError) as e:
+                self.logger.info(f"Launch Rule: invalid rule ignored: {config!r} ({e})")
+                continue
+            compiled.append(config)
+            index[rule.name] = rule
+        self.rules = compiled
+        self.index = index
+        self._last_fired.clear()
+
+    def start(self):
+        """監視を開始する (ルールがない場合は何もしない)"""
+        if self.is_running or not self.index:
+            return
+        stopped = threading.Event()
+        self._stopped = stopped
+        self._connector = None
+        if hasattr(socket, "AF_NETLINK"):
+            try:
+                self._connector = ProcConnector()
+            except OSError as e:
+                self.logger.info(f"Launch Watch: proc connector unavailable ({e}), falling back to polling")
+        self.mode = "netlink" if self._connector is not None else "poll"
+        if self._connector is not None:
+            self._thread = threading.Thread(target=self._run_connector, args=(self._connector, stopped), daemon=True)
+        else:
+            self._thread = threading.Thread(target=self._run_poll, args=(stopped,), daemon=True)
+        self._thread.start()
+        self.logger.info(f"Launch Watch: started ({self.mode}, {len(self.index)} rules)")
+
+    def stop(self):
+        """監視を停止する"""
+        if not self.is_running:
+            return
+        self._stopped.set()
+        if self._connector is not None:
+            # 受信待ちのスレッドを起こす
+            self._connector.close()
+            self._connector = None
+        self.mode = None
+
+    def record_latency(self, event, finished, freed_mb):
+        """
+        起動から解放完了までの時間を記録してログに出力する
+        Args:
+            event (LaunchEvent): 起動イベント
+            finished (float): 解放が完了した時刻 (time.monotonic() 基準)
+            freed_mb (float): 解放量 (MB)
+        Returns:
+            float: 起動から解放完了までの時間 (ms)
+        """
+        total_ms = (finished - event.started) * 1000
+        detect_ms = (event.detected - event.started) * 1000
+        self.latencies.append((event.name, total_ms, detect_ms))
+        budget = f"{event.rule.budget_mb:.0f} MB" if event.rule.budget_mb else "unlimited"
+        self.logger.info(
+            f"Launch Reclaim: {event.name} (PID {event.pid}) freed {freed_mb:.2f} MB (budget {budget}), "
+            f"start to freed {total_ms:.0f} ms (detect {detect_ms:.0f} ms via {self.mode}, reclaim {total_ms - detect_ms:.0f} ms)"
+        )
+        return total_ms
+
+    def latency_stats(self):
+        """
+        記録した時間の集計を返す
+        Returns:
+            dict: {"count": 回数, "average_ms": 平均, "max_ms": 最大, "detect_ms": 検出までの平均} (記録がなければ None)
+        """
+        if not self.latencies:
+            return None
+        totals = [total for _, total, _ in self.latencies]
+        return {
+            "count": len(totals),
+            "average_ms": sum(totals) / len(totals),
+            "max_ms": max(totals),
+            "detect_ms": sum(detect for _, _, detect in self.latencies) / len(totals),
+        }
+
+    def _run_connector(self, connector, stopped):
+        while not stopped.is_set():
+            try:
+                execs = connector.receive()
+            except OSError:
+                if stopped.is_set():
+                    return
+                # 受信バッファのあふれ (ENOBUFS) などは読み飛ばして続ける
+                continue
+            detected = time.monotonic()
+            for pid, started in execs:
+                self._check(pid, started, detected)
+
+    def _run_poll(self, stopped):
+        known = self._list_pids()
+        while not stopped.wait(self.poll_interval):
+            try:
+                current = self._list_pids()
+            except Exception:
+                continue
+            detected = time.monotonic()
+            for pid in current - known:
+                self._check(pid, None, detected)
+            known = current
+
+    def _list_pids(self):
+        if os.name != 'nt':
+            return set(list_pids(self.proc_root))
+        return set(psutil.pids())
+
+    def _check(self, pid, started, detected):
+        """新しいプロセスがルールに一致すれば通知する"""
+        try:
+            proc = psutil.Process(pid)
+            name = proc.name()
+            rule = self.index.get(name)
+            if rule is None:
+                return
+            if started is None:
+                # 起動時刻 (実時間) を単調時計の基準に直す
+                started = detected - max(0.0, time.time() - proc.create_time())
+        except psutil.Error:
+            return
+
+        last = self._last_fired.get(name)
+        if last is not None and detected - last < rule.cooldown_sec:
+            return
+        self._last_fired[name] = detected
+        try:
+            self.callback(LaunchEvent(pid, name, rule, started, detected))
+        except Exception:
+            pass
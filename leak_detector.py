@@ -0,0 +1,134 @@
+import time
+from array import array
+
+
+class ProcessHistory:
+    """
+    1つのプロセスの常駐メモリ (RSS) の直近の履歴と回帰の集計値
+    古いサンプルを取り除く際に集計値から差し引くため、傾きの計算はサンプル数に依存しない
+    """
+    __slots__ = ("name", "origin", "times", "values", "count", "pos",
+                 "sum_t", "sum_y", "sum_tt", "sum_ty", "sum_yy")
+
+    def __init__(self, name, origin, window):
+        self.name = name
+        self.origin = origin # 時刻の基準 (桁落ちを防ぐため相対時刻で集計する)
+        self.times = array('d', bytes(8 * window))
+        self.values = array('d', bytes(8 * window))
+        self.count = 0
+        self.pos = 0
+        self.sum_t = self.sum_y = self.sum_tt = self.sum_ty = self.sum_yy = 0.0
+
+    def add(self, timestamp, rss_mb):
+        """サンプルを追加し、枠からあふれた最古のサンプルを集計から除く"""
+        window = len(self.times)
+        if self.count == window:
+            t_old = self.times[self.pos]
+            y_old = self.values[self.pos]
+            self.sum_t -= t_old
+            self.sum_y -= y_old
+            self.sum_tt -= t_old * t_old
+            self.sum_ty -= t_old * y_old
+            self.sum_yy -= y_old * y_old
+        else:
+            self.count += 1
+        t = (timestamp - self.origin) / 60.0 # 分単位
+        self.times[self.pos] = t
+        self.values[self.pos] = rss_mb
+        self.pos = (self.pos + 1) % window
+        self.sum_t += t
+        self.sum_y += rss_mb
+        self.sum_tt += t * t
+        self.sum_ty += t * rss_mb
+        self.sum_yy += rss_mb * rss_mb
+
+    def regression(self):
+        """
+        最小二乗法による傾きと決定係数を返す
+        Returns:
+            tuple: (傾き MB/分, 決定係数 R²)。サンプル不足の場合は (0.0, 0.0)
+        """
+        n = self.count
+        if n < 2:
+            return 0.0, 0.0
+        var_t = n * self.sum_tt - self.sum_t * self.sum_t
+        var_y = n * self.sum_yy - self.sum_y * self.sum_y
+        if var_t <= 0:
+            return 0.0, 0.0
+        cov = n * self.sum_ty - self.sum_t * self.sum_y
+        slope = cov / var_t
+        r2 = (cov * cov) / (var_t * var_y) if var_y > 0 else 0.0
+        return slope, r2
+
+    def latest(self):
+        """最新の RSS (MB) を返す"""
+        return self.values[(self.pos - 1) % len(self.values)] if self.count else 0.0
+
+
+class LeakDetector:
+    """
+    解放処理のたびに取得するプロセスごとの RSS から、継続的に増加しているプロセスを検出するクラス
+    """
+    def __init__(self, window=8, min_samples=4, slope_threshold=1.0, min_r2=0.8):
+        """
+        Args:
+            window (int): プロセスごとに保持するサンプル数
+            min_samples (int): 判定に必要な最小サンプル数
+            slope_threshold (float): リークと見なす増加率 (MB/分)
+            min_r2 (float): 増加が継続的と見なす決定係数の下限
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.slope_threshold = slope_threshold
+        self.min_r2 = min_r2
+        self.histories = {} # pid -> ProcessHistory
+        self._suspects = []
+
+    def update(self, samples, timestamp=None):
+        """
+        プロセス一覧のサンプルを取り込み、リークの疑いがあるプロセスを更新する
+        Args:
+            samples (iterable): (pid, プロセス名, RSS バイト) のタプル
+            timestamp (float): サンプルの時刻 (省略時は現在時刻)
+        Returns:
+            list: リークの疑いがあるプロセス (suspects() と同じ形式)
+        """
+        now = time.time() if timestamp is None else timestamp
+        seen = set()
+        for pid, name, rss in samples:
+            if rss is None:
+                continue
+            history = self.histories.get(pid)
+            if history is None or history.name != name:
+                # PID が再利用された場合は別のプロセスとして履歴を作り直す
+                history = ProcessHistory(name, now, self.window)
+                self.histories[pid] = history
+            history.add(now, rss / (1024 * 1024))
+            seen.add(pid)
+
+        # 終了したプロセスの履歴を破棄する
+        for pid in [pid for pid in self.histories if pid not in seen]:
+            del self.histories[pid]
+
+        suspects = []
+        for pid, history in self.histories.items():
+            if history.count < self.min_samples:
+                continue
+            slope, r2 = history.regression()
+            if slope >= self.slope_threshold and r2 >= self.min_r2:
+                suspects.append((pid, history.name, slope, history.latest()))
+        suspects.sort(key=lambda item: item[2], reverse=True)
+        self._suspects = suspects
+        return suspects
+
+    def suspects(self):
+        """
+        リークの疑いがあるプロセスを増加率の大きい順に返す
+        Returns:
+            list: (pid, プロセス名, 増加率 MB/分, 最新の RSS MB) のリスト
+        """
+        return list(self._suspects)
+
+    def suspect_pids(self):
+        """リークの疑いがあるプロセスIDの集合を返す"""
+        return {pid for pid, _, _, _ in self._suspects}
@@ -0,0 +1,143 @@
+"""
+Linux のプロセス単位のメモリ操作 (pidfd_open / process_madvise) のラッパー
+"""
+import os
+import ctypes
+import ctypes.util
+
+# システムコール番号 (x86_64 / arm64 共通の番号)
+SYS_PIDFD_OPEN = 434
+SYS_PROCESS_MADVISE = 440
+
+MADV_COLD = 20
+MADV_PAGEOUT = 21
+
+# 1回の process_madvise に渡す iovec の上限 (UIO_MAXIOV)
+_IOV_MAX = 1024
+
+# 続けても無駄なエラー (EPERM / ESRCH / ENOSYS)
+_FATAL_ERRNOS = (1, 3, 38)
+
+# madvise の対象にできない特殊な領域
+_SPECIAL_MAPPINGS = ("[vsyscall]", "[vvar]", "[vdso]", "[vvar_vclock]")
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        _libc.syscall.restype = ctypes.c_long
+    return _libc
+
+
+def is_supported():
+    """process_madvise が利用可能なプラットフォームかどうかを返す"""
+    return os.name == 'posix' and os.uname().sysname == "Linux"
+
+
+def pidfd_open(pid):
+    """
+    プロセスを参照する pidfd を開く
+    Raises:
+        OSError: プロセスが存在しない、または権限がない場合
+    """
+    fd = _get_libc().syscall(SYS_PIDFD_OPEN, ctypes.c_int(pid), ctypes.c_uint(0))
+    if fd < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return fd
+
+
+def read_ranges(pid, proc_root="/proc", predicate=None):
+    """
+    /proc/<pid>/maps からアドレス範囲の一覧を返す
+    Args:
+        pid (int): プロセスID
+        predicate (callable): (開始, 終了, 権限, パス) を受け取り、対象とする場合に True を返す関数
+    Returns:
+        list: (開始アドレス, 長さ) のリスト
+    """
+    ranges = []
+    with open(f"{proc_root}/{pid}/maps", "r") as f:
+        for line in f:
+            parts = line.split(None, 5)
+            path = parts[5].strip() if len(parts) > 5 else ""
+            if path in _SPECIAL_MAPPINGS:
+                continue
+            start_text, _, end_text = parts[0].partition("-")
+            start = int(start_text, 16)
+            end = int(end_text, 16)
+            if predicate is not None and not predicate(start, end, parts[1], path):
+                continue
+            ranges.append((start, end - start))
+    return ranges
+
+
+def file_backed_only(start, end, perms, path):
+    """
+    書き込みできないファイルの領域のみを対象にする read_ranges の predicate
+    (ページアウトしても破棄されるだけでスワップに書き出されない。共有メモリと削除済みのファイルは除く)
+    """
+    return (path.startswith("/") and "w" not in perms
+            and not path.startswith(("/dev/", "/memfd:", "/SYSV")) and not path.endswith("(deleted)"))
+
+
+def process_madvise(pidfd, ranges, advice=MADV_PAGEOUT):
+    """
+    他プロセスのアドレス範囲に madvise を適用する
+    Args:
+        pidfd (int): pidfd_open で開いたファイルディスクリプタ
+        ranges (list): (開始アドレス, 長さ) のリスト
+        advice (int): MADV_PAGEOUT (スワップ/破棄) または MADV_COLD (非アクティブ化)
+    Returns:
+        int: 処理されたバイト数
+    """
+    libc = _get_libc()
+    total = 0
+    for offset in range(0, len(ranges), _IOV_MAX):
+        batch = ranges[offset:offset + _IOV_MAX]
+        iov = (_IOVec * len(batch))(*[_IOVec(start, length) for start, length in batch])
+        result = libc.syscall(SYS_PROCESS_MADVISE, ctypes.c_int(pidfd), iov,
+                              ctypes.c_size_t(len(batch)), ctypes.c_int(advice), ctypes.c_uint(0))
+        if result >= 0 and result == sum(length for _, length in batch):
+            total += result
+            continue
+        if result < 0 and ctypes.get_errno() in _FATAL_ERRNOS:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # ロックされた領域などで途中失敗した場合は、範囲ごとに適用し直す
+        for start, length in batch:
+            single = (_IOVec * 1)(_IOVec(start, length))
+            result = libc.syscall(SYS_PROCESS_MADVISE, ctypes.c_int(pidfd), single,
+                                  ctypes.c_size_t(1), ctypes.c_int(advice), ctypes.c_uint(0))
+            if result > 0:
+                total += result
+            elif result < 0 and ctypes.get_errno() in _FATAL_ERRNOS:
+                err = ctypes.get_errno()
+                raise OSError(err, os.strerror(err))
+    return total
+
+
+def page_out(pid, advice=MADV_PAGEOUT, proc_root="/proc", predicate=None):
+    """
+    指定したプロセスのメモリをページアウトする (Windowsの EmptyWorkingSet に相当)
+    Returns:
+        int: 処理されたバイト数
+    Raises:
+        OSError: プロセスが存在しない、または権限 (CAP_SYS_NICE) がない場合
+    """
+    ranges = read_ranges(pid, proc_root, predicate)
+    if not ranges:
+        return 0
+    pidfd = pidfd_open(pid)
+    try:
+        return process_madvise(pidfd, ranges, advice)
+    finally:
+        os.close(pidfd)
@@ -1,13 +1,30 @@
 """
 メモリ開放ツール
 """
+import sys
+import os # OS操作用
+import single_instance # 二重起動の防止とコマンド転送 (標準ライブラリのみに依存)
+
+
+def _config_path():
+    """設定ファイルのパスを返す (EXE化対応: 実行ファイルの場所を基準にする)"""
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, "config.json")
+
+
+# 既に常駐しているインスタンスがあれば、重いモジュールを読み込む前にコマンドを転送して終了する
+if __name__ == "__main__" and single_instance.forward_args(sys.argv[1:], single_instance.read_port(_config_path())):
+    sys.exit(0)
+
 import tkinter as tk
 import psutil # システム情報取得用
 import json
+import time
 import threading # 非同期処理用
 import pystray # トレイアイコン用
-import sys
-import os # OS操作用
 import os_utils # OS固有のユーティリティ関数
 from tkinter import ttk, messagebox
 from PIL import Image, ImageDraw # アイコン画像の生成用
@@ -19,7 +36,18 @@ from startup_manager import StartupManager # スタートアップ管理クラ
 from config_manager import ConfigManager # 設定管理クラス
 from ui_builder import UIBuilder # UI構築クラス
 from auto_free_scheduler import AutoFreeScheduler # 定期解放スケジューラ
-from icon_data import APP_ICON_NORMAL, APP_ICON_WARNING, APP_ICON_CAUTION # アイコンデータ
+from cgroup_reclaimer import CgroupReclaimer # cgroup単位のメモリ回収クラス
+from memory_source import MemoryUsageSource # メモリ使用率の取得元
+from memory_sampler import MemorySampler # メモリ使用状況の履歴
+from history_store import HistoryStore # 履歴データベース
+from self_trim import trim_self, FootprintMeter # ツール自身の常駐メモリ
+from sampling_policy import SamplingPolicy, coalesce_delay # 使用率の取得間隔
+from process_sampler import ProcessSampler # 常駐メモリの上位プロセス
+from launch_watcher import LaunchWatcher # 監視対象のプロセスの起動検出
+from trace_replay import TraceRecorder # ポリシーの再生に使うトレースの記録
+from forecaster import UsageForecaster # メモリ使用率の短期予測
+from fleet_agent import FleetAgent, IDLE_TIMEOUT # フリート管理用の制御・メトリクスインターフェース
+from swap_policy import MODE_ABORT # スワップの逼迫による解放の見送り
 
 APP_VERSION = "1.5.0"
 
@@ -28,7 +56,12 @@ class MemoryCleanerApp:
     """
     メモリ解放を行うデスクトップGUI
     """
-    def __init__(self, root):
+    def __init__(self, root, instance_server=None):
+        """
+        Args:
+            root (tk.Tk): ルートウィンドウ
+            instance_server (InstanceServer): 2つ目の起動からコマンドを受け取るサーバー (取得済みのロック)
+        """
         self.root = root
         self.version = APP_VERSION
         self.root.title("メモリ解放ツール")
@@ -37,7 +70,8 @@ class MemoryCleanerApp:
 
         # アイコン設定
         self.current_icon_type = "NORMAL" # 現在のアイコン状態
-        self.set_app_icon(APP_ICON_NORMAL)
+        self.icon_images = {} # アイコン状態 -> PhotoImage (省メモリ常駐中は破棄する)
+        self.set_app_icon("NORMAL")
 
         # メモリ情報更新用のafterジョブID
         self.update_job_id = None
@@ -45,6 +79,8 @@ class MemoryCleanerApp:
         self.status_clear_job = None
         # 警告状態フラグと閾値
         self.is_warning_state = False
+        self.is_freeing = False # 解放の実行中フラグ (手動・定期・起動時などの重複実行の防止)
+        self.pending_launch = None # 解放の実行中に起動を検出したプロセス (LaunchEvent、終了後に解放する)
         self.settings_win = None # 設定ウィンドウのインスタンス
         self.topmost_var = tk.BooleanVar(value=False) # 最前面表示フラグ
         self.startup_var = tk.BooleanVar(value=False) # スタートアップ登録フラグ
@@ -53,49 +89,182 @@ class MemoryCleanerApp:
         self.interval_var = tk.StringVar(value="1") # 定期解放の間隔
         self.shortcut_var = tk.StringVar(value="") # ショートカットキー
         self.current_shortcut = None # 現在適用されているショートカットキー
-        self.exclusion_list = [] # 除外プロセスリスト
         self.flash_color_var = tk.StringVar(value="lightblue") # 点滅色
         self.warning_color_var = tk.StringVar(value="tomato") # 警告色
+        self.accounting_mode_var = tk.StringVar(value="auto") # 使用率の基準 (auto/host/cgroup)
+        self.fast_clean_var = tk.BooleanVar(value=False) # メモリリストコマンドによる高速解放
+        self.low_priority_standby_var = tk.BooleanVar(value=False) # 低優先度スタンバイのみ解放
+        self.leak_target_only_var = tk.BooleanVar(value=False) # リークの疑いがあるプロセスのみ解放
+        self.group_apps_var = tk.BooleanVar(value=True) # ヘルパープロセスをアプリ単位でまとめて除外・解放
+        self.ksm_mode_var = tk.BooleanVar(value=False) # KSM の走査速度を逼迫度に応じて調整する (Linux)
+        self.low_footprint_var = tk.BooleanVar(value=False) # トレイ格納中はウィジェットを破棄する
+        self.predictive_free_var = tk.BooleanVar(value=False) # 使用率の予測で事前に解放する
+        self.forecast_horizon_var = tk.StringVar(value="120") # 予測範囲 (秒)
+        self.ui_built = False # メインウィンドウのウィジェットが存在するかどうか
+        self.footprint = FootprintMeter() # 表示モードごとのツール自身の常駐メモリ
+        self.sampling_policy = SamplingPolicy() # 使用率の取得間隔 (表示状態・閾値・電源で変える)
+
+        self.control_server = None
 
         self.current_mem_percent = 0 # 現在のメモリ使用率
 
         self.tray_manager = TrayManager(self) # トレイアイコン管理クラス
         self.cleaner_logic = MemoryCleanerLogic() # メモリ解放ロジッククラス
         self.startup_manager = StartupManager() # スタートアップ管理クラス
+        self.cgroup_reclaimer = CgroupReclaimer() # cgroup単位のメモリ回収クラス
+        self.memory_source = MemoryUsageSource() # メモリ使用率の取得元 (ホスト/コンテナ)
+        self.sampler = MemorySampler(self.memory_source, self.cleaner_logic.list_reader) # メモリ使用状況の履歴
+        self.cleaner_logic.snapshot_listeners.append(self.sampler.add_snapshot) # 解放時のスナップショットも記録
+        self.forecaster = UsageForecaster() # メモリ使用率の短期予測
+        self.sampler.listeners.append(self.forecaster.add_sample)
+        self.sampler.listeners.append(self.cleaner_logic.swap_monitor.add_sample) # スワップの入出力の速度
+        self.cleaner_logic.run_listeners.append(self.forecaster.on_run) # 解放後は予測をやり直す
         
         # EXE化対応: 実行ファイルの場所を基準にパスを設定
-        if getattr(sys, 'frozen', False):
-            base_dir = os.path.dirname(sys.executable)
-        else:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
+        config_file = _config_path()
+        base_dir = os.path.dirname(config_file)
             
-        self.config_manager = ConfigManager(self, config_file=os.path.join(base_dir, "config.json")) # 設定管理クラス
+        self.config_manager = ConfigManager(self, config_file=config_file) # 設定管理クラス (Tk 変数と設定の橋渡し)
+        self.config = self.config_manager.config # 検証済みの設定 (コンポーネントはこちらを参照する)
+        self.history_store = HistoryStore(os.path.join(base_dir, "history.db")) # 履歴データベース
+        self.sampler.listeners.append(self.history_store.add_sample) # サンプルを保存
+        self.cleaner_logic.run_listeners.append(self.history_store.add_run) # 解放結果を保存
+        self.process_sampler = ProcessSampler() # 常駐メモリの上位プロセス (設定画面で表示中のみ取得)
+        self.cleaner_logic.run_listeners.append(self.process_sampler.capture_baseline) # 解放直後の RSS を基準にする
+        self.launch_watcher = LaunchWatcher(self.on_process_launch) # 監視対象の起動時に解放する
+        self.trace_file = "" # トレースの記録先 (空の場合は記録しない)
+        self.trace_recorder = None
         self.ui_builder = UIBuilder() # UI構築クラス
         self.auto_free_scheduler = AutoFreeScheduler(self) # 定期解放スケジューラ
+        self.instance_server = instance_server # 2つ目の起動からのコマンド受信
  
         self.config_manager.load() # 設定を読み込む
         self.ui_builder.build(self) # GUIのウィジェットをセットアップ
+        self.ui_built = True
         self.update_flash_style() # 点滅色を適用
         self.update_warning_style() # 警告色を適用
         self.check_startup_status() # スタートアップ状態を確認
         self.update_memory_info() # メモリ情報の定期更新を開始
+        self.launch_watcher.start() # 起動の監視を開始 (監視ルールがある場合のみ)
 
         # 起動引数チェック: 最小化オプションがあればトレイに格納
         if "--minimized" in sys.argv:
             self.minimize_to_tray()
+        else:
+            self.root.after(5000, self.measure_footprint)
+        # 解放オプションがあれば起動直後に解放する
+        if "--free" in sys.argv:
+            self.root.after(0, lambda: self.free_memory(from_tray="--minimized" in sys.argv))
+
+        # 2つ目の起動から転送されたコマンドを受け付ける
+        # 同じサーバーで協調解放のクライアントの登録も受け付ける
+        if self.instance_server is not None:
+            self.instance_server.register("args", self.handle_forwarded_args)
+            self.cleaner_logic.cooperative.attach(self.instance_server)
+            self.instance_server.start()
+        self.start_control_server()
 
         # 最小化イベントをフック
         self.root.bind("<Unmap>", self.check_minimize)
         # ウィンドウを閉じる際のイベントをフック
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-    def set_app_icon(self, icon_data):
-        """アプリケーションのアイコンを変更する"""
+    def handle_forwarded_args(self, message, connection=None):
+        """
+        2つ目の起動から転送された起動引数を処理する (待ち受けスレッドから呼び出される)
+        引数がない場合はウィンドウを表示する
+        """
+        args = message.get("args") or ["--show"]
+        hidden = self.tray_manager.is_running
+        if "--minimized" in args:
+            self.root.after(0, self.minimize_to_tray)
+            hidden = True
+        elif "--show" in args:
+            self.root.after(0, self.restore_window)
+            hidden = False
+        if "--free" in args:
+            self.root.after(0, lambda: self.free_memory(from_tray=hidden))
+        return {"args": args}
+
+    def start_control_server(self):
+        """フリート管理用の制御・メトリクスの待ち受けを開始する (設定で有効な場合のみ)"""
+        port, bind, token = self.config["control_port"], self.config["control_bind"], self.config["control_token"]
+        if not port:
+            return
+        logger = self.cleaner_logic.logger
+        if bind not in ("127.0.0.1", "localhost", "::1") and not token:
+            logger.info("Fleet: control_token is required to listen on a non-loopback address")
+            return
+        server = single_instance.InstanceServer(port, host=bind, token=token, idle_timeout=IDLE_TIMEOUT)
+        if not server.acquire():
+            logger.info(f"Fleet: cannot listen on {bind}:{port}")
+            return
+        FleetAgent(self.version, self.sampler, self.history_store, self.cleaner_logic,
+                   self.request_fleet_free, self.request_policy, self.fleet_status).attach(server)
+        server.start()
+        self.control_server = server
+        logger.info(f"Fleet: listening on {bind}:{port}")
+
+    def request_fleet_free(self):
+        """フリートからの解放要求 (待ち受けスレッドから呼び出される)"""
+        if self.is_freeing:
+            return False
+        self.root.after(0, lambda: self.free_memory(from_tray=not self.ui_built or self.tray_manager.is_running, trigger="fleet"))
+        return True
+
+    def request_policy(self, policy):
+        """フリートからの設定変更 (待ち受けスレッドから呼び出される、検証済み)"""
+        self.root.after(0, self.apply_policy, policy)
+
+    def apply_policy(self, policy):
+        """
+        設定をまとめて変更する (設定画面、スケジューラ、ロジッククラスへは変更通知で反映され、保存も自動で行われる)
+        """
+        try:
+            self.config.update({key: value for key, value in policy.items() if key != "auto_free"})
+        except ValueError as e:
+            self.cleaner_logic.logger.info(f"Fleet: policy rejected: {e}")
+            return
+
+        # 定期解放の開始/停止 (間隔の変更はスケジューラが変更通知で反映する)
+        scheduler = self.auto_free_scheduler
+        run_auto = policy.get("auto_free", scheduler.is_running)
+        if scheduler.is_running and not run_auto:
+            scheduler.stop()
+        if run_auto and not scheduler.is_running:
+            scheduler.start(self.config["auto_free_interval"])
+        self.refresh_memory_info()
+
+    def fleet_status(self):
+        """フリートの metrics に加える状態"""
+        return {
+            "warning": self.is_warning_state,
+            "auto_free": self.auto_free_scheduler.is_running,
+            "mode": "window" if self.ui_built else "tray",
+            "forecast": self.forecaster.stats(),
+        }
+
+    def set_app_icon(self, icon_type):
+        """
+        アプリケーションのアイコンを変更する (画像は状態ごとに1回だけ作る)
+        Args:
+            icon_type (str): "NORMAL" / "CAUTION" / "WARNING"
+        """
         try:
-            icon_img = tk.PhotoImage(data=icon_data)
+            icon_img = self.icon_images.get(icon_type)
+            if icon_img is None:
+                # アイコンデータ (Base64) は省メモリ常駐中に破棄するため、使う時に読み込む
+                import icon_data
+                icon_img = tk.PhotoImage(data=getattr(icon_data, f"APP_ICON_{icon_type}"))
+                self.icon_images[icon_type] = icon_img
             self.root.iconphoto(True, icon_img)
         except Exception:
             pass
+
+    def release_app_icons(self):
+        """作成したアイコン画像とアイコンデータのモジュールを破棄する (次の set_app_icon で作り直す)"""
+        self.icon_images.clear()
+        sys.modules.pop("icon_data", None)
         
     def open_settings_window(self):
         """設定ウィンドウを開く"""
@@ -109,19 +278,24 @@ class MemoryCleanerApp:
         """
         メモリ使用率を定期的に取得し、GUIを更新する
         """
-        mem = psutil.virtual_memory()
+        # コンテナ内ではcgroupのメモリ制限を基準に使用率を計算する
+        mem = self.sampler.sample()
         mem_percent = mem.percent
         self.current_mem_percent = mem_percent
         mem_used_gb = mem.used / (1024 ** 3)
         mem_total_gb = mem.total / (1024 ** 3)
+        source_text = " [コンテナ]" if mem.source == "cgroup" else ""
 
-        self.memory_label.config(text=f"メモリ使用率: {mem_percent}% ({mem_used_gb:.2f} GB / {mem_total_gb:.2f} GB)")
-        self.memory_progress['value'] = mem_percent
+        if self.ui_built:
+            self.memory_label.config(text=f"メモリ使用率: {mem_percent}% ({mem_used_gb:.2f} GB / {mem_total_gb:.2f} GB){source_text}")
+            self.memory_progress['value'] = mem_percent
         
         # 警告状態をチェックしてフラグを更新
         new_icon_type = "NORMAL"
+        was_warning = self.is_warning_state
+        warning_val = caution_val = None
         try:
-            warning_val = int(self.warning_threshold_var.get())
+            warning_val = self.config["warning_threshold"] # 検証済みの値 (入力途中の不正な値は反映されない)
             # 注意閾値は警告閾値の75%とする (例: 80% -> 60%)
             caution_val = int(warning_val * 0.75)
             
@@ -135,44 +309,69 @@ class MemoryCleanerApp:
             # 不正な入力値の場合は警告しない
             self.is_warning_state = False
             
-        # 点滅中でなければ背景スタイルを更新
-        # (点滅エフェクトを優先させるため)
-        if self.main_frame.cget("style") != "Flash.TFrame":
+        # 予測で警告閾値に達しそうな場合は事前に解放する
+        self.auto_free_scheduler.check_forecast(mem, warning_val)
+
+        # NUMA 構成では、ホスト全体に余裕があっても1つのノードが満杯になることがあるため、ノードごとに判定する
+        numa = self.cleaner_logic.numa
+        numa_stats = numa.read() if numa is not None and numa.is_numa else []
+        if self.ui_built and numa_stats:
+            self.numa_label.config(text="  ".join(f"ノード{s.node}: {s.percent}%" for s in numa_stats))
+            if not self.numa_label.winfo_manager():
+                self.numa_label.pack(after=self.memory_progress, anchor="w")
+        self.auto_free_scheduler.check_numa(numa_stats)
+
+        # KSM を管理している場合は逼迫度に応じて走査速度を見直す (見直しの間隔は KsmController 側で制限)
+        self.cleaner_logic.ksm.adjust(mem_percent, warning_val)
+
+        # 警告状態が変わった場合のみ背景スタイルを更新
+        # (点滅中は点滅エフェクトを優先させ、終了時に更新される)
+        if (self.ui_built and self.is_warning_state != was_warning
+                and self.main_frame.cget("style") != "Flash.TFrame"):
             self.update_background_style()
 
-        # 警告状態に応じてアイコンを切り替える
-        if new_icon_type != self.current_icon_type:
-            if new_icon_type == "WARNING":
-                self.set_app_icon(APP_ICON_WARNING)
-            elif new_icon_type == "CAUTION":
-                self.set_app_icon(APP_ICON_CAUTION)
-            else:
-                self.set_app_icon(APP_ICON_NORMAL)
+        # 警告状態に応じてアイコンを切り替える (ウィジェットを破棄している間は復元時に設定する)
+        if self.ui_built and new_icon_type != self.current_icon_type:
+            self.set_app_icon(new_icon_type)
             self.current_icon_type = new_icon_type
 
         # トレイアイコンが表示されている場合、アイコンとツールチップを更新
         if self.tray_manager.is_running:
-            self.tray_manager.update(mem_percent)
+            self.tray_manager.update(mem_percent, mem.source)
  
-        # 1秒後に再度この関数を呼び出す
-        self.update_job_id = self.root.after(1000, self.update_memory_info)
+        # 次の取得間隔を決める (ウィンドウ表示中や閾値付近は短く、トレイ常駐中で余裕がある場合は長く)
+        # 発火時刻は他のタイマーと揃え、アイドル時の起床回数を抑える
+        visible = self.ui_built and self.root.state() == 'normal'
+        delay = self.sampling_policy.next_interval(mem_percent, caution_val, warning_val, visible, self.sampler.history)
+        granularity = self.sampling_policy.granularity(visible)
+        self.update_job_id = self.root.after(coalesce_delay(delay, granularity), self.update_memory_info)
+
+    def refresh_memory_info(self):
+        """予定されている取得を取り消し、メモリ情報を即時に更新する"""
+        if self.update_job_id:
+            self.root.after_cancel(self.update_job_id)
+        self.update_memory_info()
 
-    def free_memory(self, event=None, from_tray=False):
+    def free_memory(self, event=None, from_tray=False, trigger="manual"):
         """
         ガベージコレクションを実行してメモリを解放する（非同期）
         """
         # event引数はショートカットキー(bind)からの呼び出し時に渡されるが使用しない
+        # 実行中の解放がある場合は重複して実行しない
+        if self.is_freeing:
+            return
+        self.is_freeing = True
         self.show_status_message("メモリ解放を実行中...", "#0000ff")
         self.flash_window() # 処理開始をUIに通知
 
         # 重い処理を別スレッドで実行
-        threading.Thread(target=self._free_memory_task, args=(from_tray,), daemon=True).start()
+        threading.Thread(target=self._free_memory_task, args=(from_tray, trigger), daemon=True).start()
 
-    def _free_memory_task(self, from_tray):
+    def _free_memory_task(self, from_tray, trigger="manual"):
         """メモリ解放の重い処理を実行するスレッド関数"""
         try:
-            freed_mb = self.cleaner_logic.execute()
-            msg = f"メモリ解放を実行しました (解放量: {freed_mb:.1f} MB)"
+            freed_mb = self.cleaner_logic.execute(trigger=trigger)
+            msg = self._swap_message(f"メモリ解放を実行しました (解放量: {freed_mb:.1f} MB)")
             success = True
         except Exception as e:
             msg = f"エラー: {e}"
@@ -181,8 +380,19 @@ class MemoryCleanerApp:
         # GUIの更新をメインスレッドに依頼
         self.root.after(0, self._on_free_memory_done, msg, success, from_tray)
 
+    def _swap_message(self, msg):
+        """直近の解放結果にスワップの逼迫による切り替えがあれば、それを伝えるメッセージにする"""
+        swap = (self.cleaner_logic.last_report or {}).get("swap")
+        if swap is None:
+            return msg
+        if swap["mode"] == MODE_ABORT:
+            return "スワップが逼迫しているため解放を見送りました"
+        return msg + " ※スワップが逼迫しているためキャッシュのみ解放"
+
     def _on_free_memory_done(self, msg, success, from_tray):
         """メモリ解放完了後のUI更新"""
+        self.is_freeing = False
+        self.run_pending_launch()
         # 解放後にメモリ情報を即時更新
         self.update_memory_info()
 
@@ -197,8 +407,53 @@ class MemoryCleanerApp:
             else:
                 self.show_status_message(msg, "#ff0000")
 
+    def on_process_launch(self, event):
+        """監視対象のプロセスの起動を受け取る (監視スレッドから呼び出される)"""
+        self.root.after(0, self._start_launch_reclaim, event)
+
+    def _start_launch_reclaim(self, event):
+        """
+        起動したプロセスのためにメモリを解放する
+        実行中の解放がある場合は、起動の監視側のクールダウンを消費しているため見送らず、終了後に解放する
+        (続けて起動した場合は最新の1つのみ)
+        """
+        if self.is_freeing:
+            self.pending_launch = event
+            self.cleaner_logic.logger.info(f"Launch Reclaim: {event.name} (PID {event.pid}) queued, another free is running")
+            return
+        self.is_freeing = True
+        self.flash_window()
+        threading.Thread(target=self._launch_reclaim_task, args=(event,), daemon=True).start()
+
+    def run_pending_launch(self):
+        """解放の実行中に起動したプロセスのための解放を開始する (解放の完了時にUIスレッドから呼び出される)"""
+        event, self.pending_launch = self.pending_launch, None
+        if event is not None:
+            self._start_launch_reclaim(event)
+
+    def _launch_reclaim_task(self, event):
+        """起動したプロセスとその子孫を除いて解放する (スレッド関数)"""
+        exclude = {event.pid}
+        try:
+            exclude.update(child.pid for child in psutil.Process(event.pid).children(recursive=True))
+        except psutil.Error:
+            pass
+        try:
+            freed_mb = self.cleaner_logic.execute(
+                trigger="launch", urgency="high", budget_mb=event.rule.budget_mb, exclude_pids=exclude
+            )
+            latency_ms = self.launch_watcher.record_latency(event, time.monotonic(), freed_mb)
+            msg = self._swap_message(f"{event.name} の起動に合わせて解放しました (解放量: {freed_mb:.1f} MB, 起動から {latency_ms:.0f} ms)")
+            success = True
+        except Exception as e:
+            msg = f"エラー: {e}"
+            success = False
+        self.root.after(0, self._on_free_memory_done, msg, success, not self.ui_built or self.tray_manager.is_running)
+
     def show_status_message(self, message, color, duration=3000):
         """UI上にステータスメッセージを表示し、一定時間後に消去する"""
+        if not self.ui_built:
+            return
         self.status_label.config(text=message, foreground=color)
         # 既存のクリアタイマーがあればキャンセル（連打対策）
         if self.status_clear_job:
@@ -217,7 +472,7 @@ class MemoryCleanerApp:
 
     def toggle_topmost(self):
         """最前面表示を切り替える"""
-        self.root.attributes('-topmost', self.topmost_var.get())
+        self.root.attributes('-topmost', self.config["topmost"])
 
     def check_startup_status(self):
         """レジストリを確認してスタートアップ設定の状態を更新する"""
@@ -241,6 +496,36 @@ class MemoryCleanerApp:
         except Exception as e:
             messagebox.showerror("エラー", str(e))
 
+    def set_trace_file(self, path):
+        """
+        トレースの記録先を設定する (空の場合は記録を停止する)
+        相対パスは設定ファイルと同じディレクトリを基準にする
+        """
+        if self.trace_recorder is not None:
+            self.sampler.listeners.remove(self.trace_recorder.add_sample)
+            self.cleaner_logic.run_listeners.remove(self.trace_recorder.add_run)
+            self.trace_recorder.close()
+            self.trace_recorder = None
+        self.trace_file = path or ""
+        if not self.trace_file:
+            return
+        try:
+            recorder = TraceRecorder(os.path.join(os.path.dirname(_config_path()), self.trace_file))
+        except OSError as e:
+            self.cleaner_logic.logger.info(f"Trace: cannot open {self.trace_file}: {e}")
+            return
+        self.trace_recorder = recorder
+        self.sampler.listeners.append(recorder.add_sample)
+        self.cleaner_logic.run_listeners.append(recorder.add_run)
+
+    def update_clean_options(self):
+        """解放方法の設定をロジッククラスに反映する"""
+        self.cleaner_logic.fast_mode = self.config["fast_clean"]
+        self.cleaner_logic.low_priority_standby_only = self.config["low_priority_standby_only"]
+        self.cleaner_logic.leak_target_only = self.config["leak_target_only"]
+        self.cleaner_logic.app_groups.enabled = self.config["group_apps"]
+        self.cleaner_logic.ksm.set_enabled(self.config["ksm_mode"])
+
     def toggle_auto_free(self):
         """
         定期解放の開始/停止を切り替える
@@ -251,6 +536,8 @@ class MemoryCleanerApp:
         """
         ウィンドウを点滅させ可視化
         """
+        if not self.ui_built:
+            return
         self.main_frame.config(style="Flash.TFrame")
         self.memory_label.config(style="Flash.TLabel")
         self.status_label.config(style="Flash.TLabel")
@@ -261,6 +548,8 @@ class MemoryCleanerApp:
         """
         現在の警告状態に基づいて背景スタイルを更新
         """
+        if not self.ui_built:
+            return
         if self.is_warning_state:
             self.main_frame.config(style="Warning.TFrame")
             self.memory_label.config(style="Warning.TLabel")
@@ -272,7 +561,7 @@ class MemoryCleanerApp:
 
     def update_flash_style(self):
         """点滅時のスタイル（色）を更新する"""
-        color = self.flash_color_var.get()
+        color = self.config["flash_color"]
         s = ttk.Style()
         try:
             s.configure("Flash.TFrame", background=color)
@@ -282,7 +571,7 @@ class MemoryCleanerApp:
 
     def update_warning_style(self):
         """警告時のスタイル（色）を更新する"""
-        color = self.warning_color_var.get()
+        color = self.config["warning_color"]
         s = ttk.Style()
         try:
             s.configure("Warning.TFrame", background=color)
@@ -304,11 +593,54 @@ class MemoryCleanerApp:
         self.root.withdraw()
         if not self.tray_manager.is_running:
             self.tray_manager.run()
+        if self.config["low_footprint_tray"] and self.ui_built:
+            self.teardown_ui()
+
+    def teardown_ui(self):
+        """
+        トレイ常駐中はウィジェットと設定ウィンドウを破棄し、ツール自身のヒープを切り詰める
+        ルートウィンドウ (イベントループ) はサンプラーと定期解放のために残す
+        """
+        if self.settings_win is not None and self.settings_win.winfo_exists():
+            self.settings_win.on_close()
+        if self.status_clear_job:
+            self.root.after_cancel(self.status_clear_job)
+            self.status_clear_job = None
+        self.ui_built = False
+        self.main_frame.destroy()
+        self.main_frame = self.memory_label = self.memory_progress = self.status_label = None
+        # アイコン画像は復元時に設定し直す
+        self.current_icon_type = None
+        self.release_app_icons()
+        self.cleaner_logic.self_trim = True
+        trim_self(empty_working_set=True)
+        self.root.after(2000, self.measure_footprint)
+
+    def rebuild_ui(self):
+        """破棄したウィジェットを作り直す"""
+        self.ui_builder.build(self)
+        self.ui_built = True
+        self.cleaner_logic.self_trim = False
+        self.update_flash_style()
+        self.update_warning_style()
+        # 表示を即時に更新
+        self.refresh_memory_info()
+        self.update_background_style()
+        self.root.after(2000, self.measure_footprint)
+
+    def measure_footprint(self):
+        """現在の表示モードでのツール自身の常駐メモリを記録する"""
+        self.footprint.measure("window" if self.ui_built else "tray")
 
     def restore_window(self):
         """ウィンドウを表示し、前面に移動させる"""
         self.root.deiconify()
         self.root.state('normal')
+        if not self.ui_built:
+            self.rebuild_ui()
+        else:
+            # トレイ常駐中の長い取得間隔から表示中の間隔に戻す
+            self.refresh_memory_info()
         self.root.lift()
         self.root.focus_force()
 
@@ -325,6 +657,9 @@ class MemoryCleanerApp:
         if self.update_job_id:
             self.root.after_cancel(self.update_job_id)
         self.auto_free_scheduler.stop() # 実行中の定期解放を停止
+        self.process_sampler.stop() # 上位プロセスの取得を停止
+        self.launch_watcher.stop() # 起動の監視を停止
+        self.cleaner_logic.ksm.restore() # 変更した KSM の設定を元に戻す
 
         # トレイアイコンが実行中なら停止
         if self.tray_manager.is_running:
@@ -332,6 +667,15 @@ class MemoryCleanerApp:
 
         # 設定を保存
         self.config_manager.save()
+        # 履歴とトレースの書き込みを完了させる
+        self.history_store.close()
+        if self.trace_recorder is not None:
+            self.trace_recorder.close()
+        # ロックを解放する
+        if self.instance_server is not None:
+            self.instance_server.close()
+        if self.control_server is not None:
+            self.control_server.close()
         # ウィンドウを破棄
         self.root.destroy()
 
@@ -344,19 +688,30 @@ class MemoryCleanerApp:
             except Exception:
                 pass
         
-        new_key = self.shortcut_var.get()
+        new_key = self.config["shortcut_key"]
         if new_key:
             try:
                 self.root.bind(new_key, self.free_memory)
                 self.current_shortcut = new_key
             except Exception:
                 # 無効なキーシーケンスの場合はクリア
-                self.shortcut_var.set("")
                 self.current_shortcut = None
+                self.config.set("shortcut_key", "")
         else:
             self.current_shortcut = None
 
 if __name__ == "__main__":
+    server = single_instance.InstanceServer(single_instance.read_port(_config_path()))
+    if server.acquire():
+        # 初期化中に起動された場合も転送元を待たせないよう、すぐに待ち受けを始めて画面の準備ができるまで保留する
+        server.defer("args")
+        server.start()
+    else:
+        # 同時に起動したもう一方がロックを取得した場合はそちらに転送する
+        if single_instance.forward_args(sys.argv[1:], server.port):
+            sys.exit(0)
+        # 他のアプリケーションがポートを使用中の場合は単独で起動する
+        server = None
     root = tk.Tk()
-    app = MemoryCleanerApp(root)
+    app = MemoryCleanerApp(root, instance_server=server)
     root.mainloop()
\ No newline at end of file
@@ -3,8 +3,23 @@ import gc
 import sys
 import psutil
 import ctypes
+import time
 import logging
+import threading
+import linux_mm
 from logging.handlers import RotatingFileHandler
+from win_memory_api import MemoryListApi
+from memory_lists import MemoryListReader, listed_total
+from process_rules import ProcessRule, ProcessRuleEngine
+from leak_detector import LeakDetector
+from refault_tracker import RefaultTracker
+from cooperative_reclaim import CooperativeReclaimer
+from app_groups import AppGrouper
+from numa import NumaMonitor
+from swap_policy import SwapMonitor, SwapPolicy, MODE_NORMAL, MODE_CACHE_ONLY, MODE_ABORT
+from ksm_manager import KsmController
+from fast_readers import StatmReader
+from self_trim import trim_self
 
 # Windows固有のライブラリを条件付きでインポート
 if os.name == 'nt':
@@ -14,9 +29,46 @@ class MemoryCleanerLogic:
     """
     メモリ解放処理のロジックを担当するクラス
     """
-    def __init__(self):
+    def __init__(self, memory_api=None):
+        """
+        Args:
+            memory_api (MemoryListApi): メモリリスト操作の実装 (テスト時に差し替え可能)
+        """
         self._setup_logger()
         self.exclusion_list = []
+        self.memory_api = memory_api or MemoryListApi()
+        self.fast_mode = False # メモリリストコマンドによる一括解放
+        self.low_priority_standby_only = False # 低優先度のスタンバイリストのみ解放
+        self.list_reader = MemoryListReader(self.memory_api) # メモリリストの取得
+        self.snapshot_listeners = [] # スナップショットの通知先 (phase, snapshot)
+        self.run_listeners = [] # 解放結果の通知先 (report)
+        self.last_report = None # 直近の解放結果
+        self.rule_engine = ProcessRuleEngine() # プロセスごとのルール
+        self.leak_detector = LeakDetector() # メモリリークの疑いがあるプロセスの検出
+        self.leak_target_only = False # リークの疑いがあるプロセスのみ解放
+        self.leak_cap_mb = 0 # リークの疑いがあるプロセスに設定する上限 (0 は無効)
+        self.refault_tracker = RefaultTracker() # 解放後すぐに戻るプロセスの検出と自動除外
+        self.cooperative = CooperativeReclaimer() # 強制解放の前に登録プロセスへ解放を要求する
+        self.cooperative_released = set() # 自発的に解放したため今回の強制解放を見送るプロセスID
+        self.processes = [] # 直近の解放時に取得したプロセス一覧 (pid, 名前, RSS)
+        self.app_groups = AppGrouper() # アプリ単位のグループ (プロセス一覧の取得ごとに作り直す)
+        self.trimmed_pids = set() # 今回の解放でワーキングセットを解放したプロセスID
+        self.group_excluded = {} # 今回の解放でグループごと除外したアプリ名 -> プロセス数
+        self.budget_bytes = None # 今回の解放で解放するワーキングセットの目安 (None は上限なし)
+        self.excluded_pids = set() # 今回の解放に限り対象外とするプロセスID (起動したプロセスとその子孫など)
+        self.self_trim = False # 解放後にツール自身のワーキングセットも空にする (トレイ常駐中)
+        # Linux では /proc/<pid>/statm を直接読んで RSS を取得する
+        self.statm_reader = StatmReader() if linux_mm.is_supported() else None
+        self.numa = NumaMonitor() if linux_mm.is_supported() else None # NUMA ノードごとの使用状況と回収
+        self.numa_node = None # 今回の解放で回収する NUMA ノード (None はノードを指定しない)
+        self.numa_candidates = 32 # ノードの常駐量を調べるプロセス数の上限 (RSS の大きい順)
+        self.swap_monitor = SwapMonitor() # スワップの使用率と入出力の速度
+        self.swap_policy = SwapPolicy() # スワップの逼迫度による解放方法の選択
+        self.swap_mode = MODE_NORMAL # 今回の解放方法
+        self.ksm = KsmController() # KSM (同一ページ併合) の走査速度の管理 (Linux)
+        self.ksm_requested = set() # KSM の併合を依頼したプロセスID
+        self.ksm_unreachable = set() # 併合を依頼できないことをログに出力したプロセス名 (毎回出力しない)
+        self._run_lock = threading.Lock() # 解放処理の排他 (今回の解放の状態をインスタンスに保持するため)
 
     def _setup_logger(self):
         """ログ出力の設定を行う"""
@@ -44,50 +96,366 @@ class MemoryCleanerLogic:
             except Exception:
                 pass
 
-    def execute(self):
+    def execute(self, trigger="manual", urgency=None, budget_mb=None, exclude_pids=(), numa_node=None):
         """
         ガベージコレクションとシステムメモリ解放を実行し、解放されたメモリ量(MB)を返す
+        Args:
+            trigger (str): 実行の契機 ("manual" / "auto" / "launch" など、履歴に記録される)
+            urgency (str): 登録プロセスへの解放要求の緊急度 (省略時は契機から決める)
+            budget_mb (float): 解放するワーキングセットの目安 (MB)。指定した場合は RSS の大きい順に
+                解放し、解放前の RSS の合計が目安に達した時点で打ち切る (None または 0 は上限なし)
+            exclude_pids (iterable): 今回の解放に限り対象外とするプロセスID
+            numa_node (int): 回収する NUMA ノード (Linux のみ)。指定した場合は、そのノードに常駐するページのみをページアウトする
         """
+        # 定期解放・起動時の解放・フリートからの要求などが別々のスレッドから重なった場合は順に実行する
+        with self._run_lock:
+            return self._execute(trigger, urgency, budget_mb, exclude_pids, numa_node)
+
+    def _execute(self, trigger, urgency, budget_mb, exclude_pids, numa_node):
+        self.budget_bytes = budget_mb * 1024 * 1024 if budget_mb else None
+        self.excluded_pids = set(exclude_pids)
+        self.numa_node = numa_node
+        self.trimmed_pids = set()
+        self.group_excluded = {}
         try:
+            # スワップが逼迫している場合は匿名ページを書き出さない方法に切り替える (または見送る)
+            swap_state = self.swap_monitor.read()
+            self.swap_mode, swap_reason = self.swap_policy.decide(swap_state, trigger)
+            if self.swap_mode == MODE_ABORT:
+                self.logger.info(f"Swap Policy: {trigger} run skipped, trimming would push anonymous pages to swap ({swap_reason}; {swap_state.describe()})")
+                # 前回の解放結果が残らないよう、見送ったことを記録する (履歴などの通知先には送らない)
+                self.last_report = {
+                    "timestamp": time.time(),
+                    "trigger": trigger,
+                    "freed_mb": 0.0,
+                    "swap": {"mode": self.swap_mode, "reason": swap_reason},
+                }
+                return 0.0
+            if self.swap_mode == MODE_CACHE_ONLY:
+                self.logger.info(f"Swap Policy: file cache only, anonymous working-set trim skipped ({swap_reason}; {swap_state.describe()})")
+
             # 初期状態
-            vm_start = psutil.virtual_memory()
+            snap_start = self._snapshot("start")
             
             # Pythonのガベージコレクション
             gc.collect()
+
+            # プロセス一覧を1回だけ取得し、リーク検出とプロセスごとの解放で共有する
+            self.processes = self._sweep_processes()
+            suspects = self.leak_detector.update(self.processes)
+            for pid, name, slope, rss_mb in suspects:
+                self.logger.info(f"Leak Suspect: {name} (PID {pid}) +{slope:.2f} MB/min, RSS {rss_mb:.2f} MB")
+
+            if urgency is None:
+                urgency = "high" if trigger == "manual" else "medium"
+
+            # KSM を管理している場合は、ルールで指定されたプロセスに併合を依頼し、逼迫時は走査を速める
+            if self.ksm.enabled:
+                try:
+                    self._manage_ksm(urgency)
+                except Exception:
+                    pass
+
+            # 強制解放の前に、登録されたプロセスへ自発的な解放を要求する
+            self.cooperative_released = set()
+            if self.cooperative.has_clients:
+                try:
+                    self.cooperative_released = self.cooperative.notify(urgency)
+                except Exception:
+                    pass
             
-            # Windows APIによるシステムファイルキャッシュの解放
-            # キャッシュ解放の効果は Free メモリの増加で測定
-            vm_before_cache = psutil.virtual_memory()
-            self._clean_file_cache()
-            vm_after_cache = psutil.virtual_memory()
-            
-            # Windows APIによるワーキングセットの解放
-            # ワーキングセット解放の効果は Used メモリの減少で測定
-            self._clean_system_memory()
-            vm_after_ws = psutil.virtual_memory()
-            
+            if self.fast_mode:
+                # 高速モード: ワーキングセット → 変更済みリスト → スタンバイリストの順に
+                # それぞれ1回のコマンドで解放し、追い出されたページまで回収する
+                phases = [
+                    ("working_set", self._clean_system_memory),
+                    ("modified", self._flush_modified_list),
+                    ("standby", self._clean_file_cache),
+                ]
+            else:
+                phases = [
+                    ("standby", self._clean_file_cache),
+                    ("working_set", self._clean_system_memory),
+                ]
+            if self.swap_mode == MODE_CACHE_ONLY:
+                # 変更済みリストの書き出しとワーキングセットの一括解放はページファイルへの書き込みを増やすため行わない
+                # (Linux ではワーキングセットの解放をファイルの領域のみのページアウトに切り替える)
+                phases = [(name, func) for name, func in phases
+                          if name != "modified" and (name != "working_set" or os.name != 'nt')]
+                if os.name == 'nt':
+                    self.rule_engine.begin_run()
+                    self.refault_tracker.begin_run()
+
+            # 各フェーズの前後でメモリリストのスナップショットを取り、リストごとに解放量を測定する
+            results = {}
+            snap_before = snap_start
+            for name, func in phases:
+                func()
+                snap_after = self._snapshot(name)
+                results[name] = (snap_before, snap_after)
+                snap_before = snap_after
+            snap_end = snap_before
+
             # 集計 (MB単位)
-            # スタンバイリスト解放量 = Freeの増加分
-            freed_standby = max(0, (vm_after_cache.free - vm_before_cache.free) / (1024 * 1024))
-            
-            # ワーキングセット解放量 = Usedの減少分 (キャッシュ解放後のUsed - 最終的なUsed)
-            freed_ws = max(0, (vm_after_cache.used - vm_after_ws.used) / (1024 * 1024))
+            # ワーキングセット解放量 = ワーキングセットから各リストへ移ったページ量
+            freed_ws = 0
+            if "working_set" in results:
+                ws_before, ws_after = results["working_set"]
+                freed_ws = max(0, listed_total(ws_after) - listed_total(ws_before)) / (1024 * 1024)
+
+            # スタンバイリスト解放量 = スタンバイリストの減少分
+            sb_before, sb_after = results["standby"]
+            freed_standby = max(0, sb_before.standby - sb_after.standby) / (1024 * 1024)
+
+            # 変更済みリスト書き出し量 = 変更済みリストの減少分
+            freed_modified = 0
+            if "modified" in results:
+                mod_before, mod_after = results["modified"]
+                freed_modified = max(0, mod_before.modified - mod_after.modified) / (1024 * 1024)
             
-            # 全体のUsed減少量（ユーザーへの戻り値）
-            freed_mb = max(0, (vm_start.used - vm_after_ws.used) / (1024 * 1024))
+            # 全体の使用中メモリの減少量（ユーザーへの戻り値）
+            freed_mb = max(0, listed_total(snap_end) - listed_total(snap_start)) / (1024 * 1024)
 
             # ログ出力
-            log_msg = f"Total Freed: {freed_mb:.2f} MB (Working Set: {freed_ws:.2f} MB, Standby List: {freed_standby:.2f} MB)"
+            log_msg = f"Total Freed: {freed_mb:.2f} MB (Working Set: {freed_ws:.2f} MB, Standby List: {freed_standby:.2f} MB, Modified List: {freed_modified:.2f} MB)"
             self.logger.info(log_msg)
+            self.logger.info(
+                f"Memory Lists: Free {snap_start.free / (1024 * 1024):.2f} -> {snap_end.free / (1024 * 1024):.2f} MB, "
+                f"Standby {snap_start.standby / (1024 * 1024):.2f} -> {snap_end.standby / (1024 * 1024):.2f} MB, "
+                f"Modified {snap_start.modified / (1024 * 1024):.2f} -> {snap_end.modified / (1024 * 1024):.2f} MB"
+            )
+
+            # 解放結果を通知 (履歴の保存など)
+            outcomes = [
+                (o.pid, o.rule.name, o.action, o.success, o.detail) for o in self.rule_engine.outcomes
+            ] + [
+                (pid, name, "leak_suspect", True, f"+{slope:.2f} MB/min") for pid, name, slope, _ in suspects
+            ] + [
+                (pid, name, reason, True, "refault") for pid, name, reason in self.refault_tracker.skipped
+            ] + [
+                (pid, name, "cooperative", acked, f"{measured / (1024 * 1024):.2f} MB")
+                for pid, name, _, measured, acked in self.cooperative.results
+            ] + self._report_groups()
+            self.last_report = {
+                "timestamp": time.time(),
+                "trigger": trigger,
+                "freed_mb": freed_mb,
+                "working_set_mb": freed_ws,
+                "standby_mb": freed_standby,
+                "modified_mb": freed_modified,
+                "outcomes": outcomes,
+            }
+            if self.budget_bytes is not None:
+                self.last_report["budget_mb"] = budget_mb
+            if numa_node is not None:
+                self.last_report["numa_node"] = numa_node
+            if self.swap_mode != MODE_NORMAL:
+                self.last_report["swap"] = {"mode": self.swap_mode, "reason": swap_reason}
+            ksm_stats = self.ksm.read_stats() if self.ksm.enabled else None
+            if ksm_stats is not None:
+                self.last_report["ksm_shared_mb"] = ksm_stats.shared_mb
+                self.last_report["ksm_saved_mb"] = ksm_stats.saved_mb
+                self.logger.info(f"KSM: {ksm_stats.shared_mb:.2f} MB shared, {ksm_stats.saved_mb:.2f} MB saved ({ksm_stats.pages_sharing} pages sharing, scan level {self.ksm.level})")
+            for listener in self.run_listeners:
+                try:
+                    listener(self.last_report)
+                except Exception:
+                    pass
+
+            # ツール自身のヒープを切り詰める (解放処理で確保した一時オブジェクトを OS に返す)
+            try:
+                trim_self(empty_working_set=self.self_trim)
+            except Exception:
+                pass
 
             return freed_mb
         except Exception:
             # エラー時は例外を再送出して呼び出し元で処理させる
             raise
+        finally:
+            self.budget_bytes = None
+            self.excluded_pids = set()
+            self.numa_node = None
+            self.swap_mode = MODE_NORMAL
+
+    def _snapshot(self, phase):
+        """メモリリストのスナップショットを取得し、登録されたリスナー (サンプラー) に通知する"""
+        snapshot = self.list_reader.read()
+        for listener in self.snapshot_listeners:
+            try:
+                listener(phase, snapshot)
+            except Exception:
+                pass
+        return snapshot
+
+    def _sweep_processes(self):
+        """
+        プロセス一覧と各プロセスの常駐メモリを取得する
+        Returns:
+            list: (pid, プロセス名, RSS バイト) のリスト (RSS を取得できない場合は None)
+        """
+        processes = []
+        parents = {}
+        use_statm = self.statm_reader is not None
+        attrs = ['pid', 'name', 'ppid'] if use_statm else ['pid', 'name', 'ppid', 'memory_info']
+        try:
+            for proc in psutil.process_iter(attrs):
+                pid = proc.info['pid']
+                parents[pid] = proc.info.get('ppid')
+                if use_statm:
+                    rss = self.statm_reader.rss(pid)
+                else:
+                    memory_info = proc.info.get('memory_info')
+                    rss = memory_info.rss if memory_info else None
+                processes.append((pid, proc.info['name'], rss))
+        except Exception:
+            pass
+        if use_statm:
+            self.statm_reader.prune({pid for pid, _, _ in processes})
+        # アプリ単位のグループは一覧の取得ごとに1回だけ作り、解放対象の選択では pid から引くだけにする
+        try:
+            self.app_groups.update(processes, parents)
+        except Exception:
+            pass
+        return processes
+
+    def _manage_ksm(self, urgency):
+        """
+        KSM を指定したルールに一致するプロセスに併合を依頼する (協調解放のクライアントとして登録されたプロセスのみ)
+        緊急度が高い場合は走査を一時的に速める
+        """
+        if urgency == "high":
+            self.ksm.boost()
+        live = {pid for pid, _, _ in self.processes}
+        self.ksm_requested &= live
+        registered = self.cooperative.registered_pids()
+        wanted = {}
+        for pid, name, _ in self.processes:
+            rule = self.rule_engine.match(name)
+            if rule is not None and rule.ksm and pid not in self.ksm_requested:
+                wanted[pid] = name
+        if not wanted:
+            return
+        # 依頼を送れたプロセスのみ記録する (後からクライアントとして登録された場合は次回に依頼する)
+        sent = self.cooperative.request_merge([pid for pid in wanted if pid in registered])
+        self.ksm_requested |= set(sent)
+        unreachable = sorted({name for pid, name in wanted.items() if pid not in sent} - self.ksm_unreachable)
+        self.ksm_unreachable.update(unreachable)
+        if unreachable:
+            # 他のプロセスの併合を外から有効にする方法はないため、ksm_manager.py exec での起動を案内する
+            self.logger.info(f"KSM: cannot opt in {', '.join(unreachable)} (not cooperative clients; start them with ksm_manager.py exec)")
+
+    def _leak_cap_rule(self, name):
+        """リークの疑いがあるプロセスに適用する上限ルールを返す (無効なら None)"""
+        if self.leak_cap_mb <= 0:
+            return None
+        try:
+            return ProcessRule({"name": f"{name} (leak)", "max_ws_mb": self.leak_cap_mb})
+        except ValueError:
+            return None
+
+    def _select_targets(self, trim_by_default):
+        """
+        除外リスト、ルール、リーク検出の結果から解放対象のプロセスを選ぶ
+        Args:
+            trim_by_default (bool): ルールのないプロセスも解放対象とするかどうか
+        Returns:
+            list: (pid, プロセス名) のリスト
+        """
+        suspects = self.leak_detector.suspect_pids()
+        exclusion = set(self.exclusion_list)
+        targets = []
+        live_keys = set()
+        for pid, name, _ in self.processes:
+            # 除外リストに含まれるプロセス名と、解放要求に応じて自発的に解放したプロセス、
+            # 今回の解放に限り対象外とするプロセスはスキップ
+            if name in exclusion or pid in self.cooperative_released or pid in self.excluded_pids:
+                continue
+            # 除外リストにアプリの本体の名前がある場合は、ヘルパープロセスもまとめて除外する
+            app_name = self.app_groups.group_name(pid, name)
+            if app_name in exclusion:
+                self.group_excluded[app_name] = self.group_excluded.get(app_name, 0) + 1
+                continue
+
+            is_suspect = pid in suspects
+            # 解放してもすぐに戻るアプリは自動的に見送る (リークの疑いがあるプロセスは除く)
+            if not is_suspect and self.refault_tracker.should_skip(pid, app_name):
+                continue
+            if is_suspect:
+                cap_rule = self._leak_cap_rule(name)
+                if cap_rule is not None:
+                    live_keys.add((cap_rule.name, pid))
+                    self.rule_engine.apply_cap(pid, cap_rule.name, cap_rule)
+
+            # リークの疑いがあるプロセスのみを対象にする設定
+            default = (trim_by_default and not self.leak_target_only) or is_suspect
+
+            # ルールに一致するプロセスは上限設定と解放間隔を評価する
+            rule = self.rule_engine.match(name)
+            if rule is not None:
+                live_keys.add((name, pid))
+                if not self.rule_engine.evaluate(pid, name, rule, trim_by_default=default):
+                    continue
+            elif not default:
+                continue
+            targets.append((pid, name))
+        self.rule_engine.prune(live_keys)
+        if self.budget_bytes is not None:
+            targets = self._apply_budget(targets)
+        return targets
+
+    def _apply_budget(self, targets):
+        """
+        RSS の大きいアプリから順に、解放前の RSS の合計が目安に達するまでの対象を返す
+        (少ないシステムコールで目安の量を空け、解放にかかる時間を短くする)
+        同じアプリのプロセスはまとめて選び、アプリの一部のヘルパーだけを解放しないようにする
+        """
+        rss = {pid: size or 0 for pid, _, size in self.processes}
+        units = {}
+        for pid, name in targets:
+            group = self.app_groups.group_of(pid)
+            units.setdefault(group.key if group is not None else ("pid", pid), []).append((pid, name))
+        ranked = sorted(
+            ((sum(rss.get(pid, 0) for pid, _ in unit), unit) for unit in units.values()),
+            key=lambda item: item[0], reverse=True,
+        )
+        selected = []
+        apps = 0
+        total = 0
+        for size, unit in ranked:
+            if total >= self.budget_bytes:
+                break
+            selected.extend(unit)
+            apps += 1
+            total += size
+        self.logger.info(
+            f"Budget: {len(selected)}/{len(targets)} processes in {apps}/{len(units)} apps selected, "
+            f"{total / (1024 * 1024):.2f} MB of {self.budget_bytes / (1024 * 1024):.2f} MB"
+        )
+        return selected
 
     def _clean_system_memory(self):
         """Windows APIを使用して全プロセスのワーキングセットを解放する"""
+        self.rule_engine.begin_run()
+        self.refault_tracker.begin_run()
+        # 除外対象やルールがなければ1回のコマンドで全プロセスのワーキングセットを空にする
+        if (self.fast_mode and not self.exclusion_list and self.rule_engine.is_empty
+                and not self.leak_target_only and not self.refault_tracker.has_skips
+                and not self.cooperative_released
+                and not self.excluded_pids and self.budget_bytes is None
+                and self.memory_api.available):
+            self._enable_privilege("SeProfileSingleProcessPrivilege")
+            try:
+                if self.memory_api.empty_working_sets():
+                    self._observe_refaults(self.processes)
+                    return
+            except Exception:
+                pass
+
         if os.name != 'nt':
+            self._clean_linux_processes()
+            self._report_refaults()
+            self.rule_engine.report()
             return
 
         try:
@@ -109,44 +477,204 @@ class MemoryCleanerLogic:
             PROCESS_SET_QUOTA = 0x0100
             PROCESS_QUERY_INFORMATION = 0x0400
             
-            for proc in psutil.process_iter(['pid', 'name']):
+            trimmed = []
+            for pid, name in self._select_targets(trim_by_default=True):
                 try:
-                    # 除外リストに含まれるプロセス名はスキップ
-                    if proc.info['name'] in self.exclusion_list:
-                        continue
-
-                    pid = proc.info['pid']
                     handle = OpenProcess(PROCESS_SET_QUOTA | PROCESS_QUERY_INFORMATION, False, pid)
                     if handle:
-                        EmptyWorkingSet(handle)
+                        if EmptyWorkingSet(handle):
+                            trimmed.append(pid)
+                        else:
+                            self.rule_engine.mark_trim_failed(pid, "EmptyWorkingSet failed")
                         CloseHandle(handle)
+                    else:
+                        self.rule_engine.mark_trim_failed(pid, "OpenProcess failed")
                 except Exception:
                     pass
+            self._observe_refaults(self._trimmed_processes(trimmed))
+        except Exception:
+            pass
+        self._report_refaults()
+        self.rule_engine.report()
+
+    def _trimmed_processes(self, pids):
+        """解放したプロセスの (pid, 名前, 解放前の RSS) を返す"""
+        pids = set(pids)
+        return [proc for proc in self.processes if proc[0] in pids]
+
+    def _observe_refaults(self, trimmed):
+        """解放したプロセスの再フォールトの観測を開始する (統計はアプリ単位で集計する)"""
+        self.trimmed_pids = {pid for pid, _, _ in trimmed}
+        try:
+            self.refault_tracker.observe([
+                (pid, self.app_groups.group_name(pid, name), rss) for pid, name, rss in trimmed
+            ])
         except Exception:
             pass
 
+    def _report_groups(self):
+        """
+        複数のプロセスからなるアプリごとの解放と除外の結果をログに出力する
+        Returns:
+            list: 解放結果に加える (代表の pid, アプリ名, "app_group", True, 詳細) のリスト
+        """
+        counts = {}
+        for pid in self.trimmed_pids:
+            group = self.app_groups.group_of(pid)
+            if group is not None and len(group.pids) > 1:
+                counts[group] = counts.get(group, 0) + 1
+        outcomes = []
+        for group, count in sorted(counts.items(), key=lambda item: item[0].rss, reverse=True):
+            detail = f"{count}/{len(group.pids)} processes, {group.rss / (1024 * 1024):.2f} MB"
+            self.logger.info(f"App Group: {group.name} trimmed ({detail})")
+            outcomes.append((group.root_pid, group.name, "app_group", True, detail))
+        for name, count in sorted(self.group_excluded.items()):
+            self.logger.info(f"App Group: {name} excluded ({count} helper processes)")
+        return outcomes
+
+    def _report_refaults(self):
+        """再フォールトにより見送ったプロセスをユーザーの除外リストとは別にログに出力する"""
+        counts = {}
+        for _, name, reason in self.refault_tracker.skipped:
+            counts[(name, reason)] = counts.get((name, reason), 0) + 1
+        for (name, reason), count in sorted(counts.items()):
+            self.logger.info(f"Refault Skip: {name} ({reason}: {count})")
+
+    def trim_process(self, pid):
+        """
+        1つのプロセスのワーキングセットを解放する (一覧からの手動解放)
+        Raises:
+            OSError: プロセスが存在しない、または権限がない場合
+        """
+        if os.name != 'nt':
+            linux_mm.page_out(pid)
+            return
+        psapi = ctypes.WinDLL('psapi.dll')
+        kernel32 = ctypes.WinDLL('kernel32.dll', use_last_error=True)
+        OpenProcess = kernel32.OpenProcess
+        OpenProcess.restype = wintypes.HANDLE
+        OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+        EmptyWorkingSet = psapi.EmptyWorkingSet
+        EmptyWorkingSet.restype = wintypes.BOOL
+        EmptyWorkingSet.argtypes = (wintypes.HANDLE,)
+
+        PROCESS_SET_QUOTA = 0x0100
+        PROCESS_QUERY_INFORMATION = 0x0400
+        handle = OpenProcess(PROCESS_SET_QUOTA | PROCESS_QUERY_INFORMATION, False, pid)
+        if not handle:
+            raise OSError(ctypes.get_last_error(), "OpenProcess failed")
+        try:
+            if not EmptyWorkingSet(handle):
+                raise OSError(ctypes.get_last_error(), "EmptyWorkingSet failed")
+        finally:
+            kernel32.CloseHandle(handle)
+
+    def _clean_linux_processes(self):
+        """
+        Linux ではルールに一致するプロセスに上限を設定し、解放間隔を持つルールの対象と
+        リークの疑いがあるプロセス (設定時) のみをページアウトする
+        解放量の目安が指定された場合 (起動前の解放) は、目安に達するまで RSS の大きい順にページアウトする
+        """
+        if self.numa_node is not None and self.numa is not None:
+            self._clean_numa_node()
+            return
+        budgeted = self.budget_bytes is not None
+        if self.rule_engine.is_empty and not self.leak_target_only and self.leak_cap_mb <= 0 and not budgeted:
+            return
+        try:
+            trimmed = []
+            # スワップが逼迫している場合はファイルの領域のみをページアウトする (破棄されるだけで書き出されない)
+            predicate = linux_mm.file_backed_only if self.swap_mode == MODE_CACHE_ONLY else None
+            for pid, name in self._select_targets(trim_by_default=budgeted):
+                try:
+                    linux_mm.page_out(pid, predicate=predicate)
+                    trimmed.append(pid)
+                except OSError as e:
+                    self.rule_engine.mark_trim_failed(pid, e)
+            self._observe_refaults(self._trimmed_processes(trimmed))
+        except Exception:
+            pass
+
+    def _clean_numa_node(self):
+        """
+        指定された NUMA ノードのメモリを回収する
+        ノード単位の回収インターフェースがあれば先に使い、目安に足りない分はノードに常駐するページの多いプロセスから
+        そのノードの領域だけをページアウトする。最後にノードをコンパクションして連続した空きを作る
+        """
+        node = self.numa_node
+        budget = self.budget_bytes
+        remaining = budget
+        reclaimed = None
+        try:
+            swappiness = 0 if self.swap_mode == MODE_CACHE_ONLY else None
+            reclaimed = self.numa.reclaim(node, budget, swappiness) if budget else None
+        except OSError as e:
+            self.logger.info(f"NUMA: node{node} reclaim failed: {e}")
+        if reclaimed is not None:
+            remaining = max(0, budget - reclaimed)
+
+        paged = 0
+        trimmed = []
+        if remaining is None or remaining > 0:
+            # 除外やルールの判定は通常どおり行い、RSS の大きい候補だけ numa_maps を読む (ページテーブルの走査は重い)
+            self.budget_bytes = None
+            try:
+                targets = self._select_targets(trim_by_default=True)
+            finally:
+                self.budget_bytes = budget
+            rss = {pid: size or 0 for pid, _, size in self.processes}
+            targets = sorted(targets, key=lambda target: rss.get(target[0], 0), reverse=True)[:self.numa_candidates]
+            resident = []
+            for pid, name in targets:
+                try:
+                    on_node = self.numa.process_node_usage(pid).get(node, 0)
+                except OSError:
+                    continue
+                if on_node > 0:
+                    resident.append((on_node, pid))
+            resident.sort(reverse=True)
+            for on_node, pid in resident:
+                if remaining is not None and paged >= remaining:
+                    break
+                try:
+                    starts = self.numa.node_ranges(pid, node)
+                    file_only = self.swap_mode == MODE_CACHE_ONLY
+                    linux_mm.page_out(pid, predicate=lambda start, end, perms, path: start in starts and (
+                        not file_only or linux_mm.file_backed_only(start, end, perms, path)))
+                except OSError as e:
+                    self.rule_engine.mark_trim_failed(pid, e)
+                    continue
+                trimmed.append(pid)
+                paged += on_node
+            self._observe_refaults(self._trimmed_processes(trimmed))
+
+        compacted = self.numa.compact(node)
+        node_reclaim = f"{reclaimed / (1024 * 1024):.2f} MB" if reclaimed is not None else "unavailable"
+        self.logger.info(
+            f"NUMA: node{node} node reclaim {node_reclaim}, paged out {len(trimmed)} processes "
+            f"({paged / (1024 * 1024):.2f} MB resident on node), compaction {'done' if compacted else 'unavailable'}"
+        )
+
     def _clean_file_cache(self):
         """Windowsのシステムファイルキャッシュ（スタンバイリスト）を解放する"""
-        if os.name != 'nt':
+        if not self.memory_api.available:
             return
 
         try:
             # 特権を有効化 (SeProfileSingleProcessPrivilege)
             self._enable_privilege("SeProfileSingleProcessPrivilege")
+            self.memory_api.purge_standby_list(self.low_priority_standby_only)
+        except Exception:
+            pass
 
-            ntdll = ctypes.WinDLL('ntdll.dll')
-            NtSetSystemInformation = ntdll.NtSetSystemInformation
-            NtSetSystemInformation.restype = wintypes.LONG
-            
-            SYSTEM_MEMORY_LIST_INFORMATION = 80
-            # MemoryPurgeStandbyList = 4
-            command = wintypes.DWORD(4)
-            
-            NtSetSystemInformation(
-                SYSTEM_MEMORY_LIST_INFORMATION,
-                ctypes.byref(command),
-                ctypes.sizeof(command)
-            )
+    def _flush_modified_list(self):
+        """変更済みページリストを書き出し、スタンバイリストへ移す"""
+        if not self.memory_api.available:
+            return
+
+        try:
+            self._enable_privilege("SeProfileSingleProcessPrivilege")
+            self.memory_api.flush_modified_list()
         except Exception:
             pass
 
@@ -0,0 +1,107 @@
+import os
+import mmap
+import time
+import psutil
+from collections import namedtuple
+from fast_readers import MeminfoReader
+
+# メモリリストのスナップショット (単位はバイト)
+#   free:     すぐに使用できるページ (Windows: Free + Zeroed / Linux: MemFree)
+#   standby:  キャッシュとして保持されているページ (Windows: スタンバイリスト / Linux: ファイルキャッシュ)
+#   modified: ディスクへの書き出し待ちのページ (Windows: 変更済みリスト / Linux: Dirty + Writeback)
+#   detail:   OS固有のリストごとの値 (辞書)
+MemoryListSnapshot = namedtuple("MemoryListSnapshot", ["timestamp", "free", "standby", "modified", "detail"])
+
+# /proc/meminfo から読み取る項目
+MEMINFO_FIELDS = (
+    "MemTotal", "MemFree", "MemAvailable",
+    "Active(anon)", "Inactive(anon)", "Active(file)", "Inactive(file)",
+    "Dirty", "Writeback",
+)
+
+
+def listed_total(snapshot):
+    """いずれかのメモリリストにある (どのワーキングセットにも属さない) ページ量を返す"""
+    return snapshot.free + snapshot.standby + snapshot.modified
+
+
+class MemoryListReader:
+    """
+    OSのメモリリスト (スタンバイ/変更済み/空き) の状態を取得するクラス
+    """
+    def __init__(self, memory_api=None, meminfo_path="/proc/meminfo"):
+        """
+        Args:
+            memory_api (MemoryListApi): Windowsのメモリリスト操作 (省略時は使用しない)
+            meminfo_path (str): Linux の /proc/meminfo のパス
+        """
+        self.memory_api = memory_api
+        self.meminfo_path = meminfo_path
+        self._meminfo = None # 開いたままにする /proc/meminfo のリーダー
+
+    def read(self):
+        """
+        現在のメモリリストのスナップショットを返す
+        Returns:
+            MemoryListSnapshot: スナップショット
+        """
+        snapshot = None
+        try:
+            if self.memory_api is not None and self.memory_api.available:
+                snapshot = self._read_windows()
+            elif os.path.exists(self.meminfo_path):
+                snapshot = self._read_linux()
+        except Exception:
+            snapshot = None
+        if snapshot is None:
+            snapshot = self._read_psutil()
+        return snapshot
+
+    def _read_windows(self):
+        info = self.memory_api.query()
+        if info is None:
+            return None
+        page = mmap.PAGESIZE
+        standby_by_priority = [count * page for count in info.PageCountByPriority]
+        detail = {
+            "zeroed": info.ZeroPageCount * page,
+            "free": info.FreePageCount * page,
+            "modified": info.ModifiedPageCount * page,
+            "modified_no_write": info.ModifiedNoWritePageCount * page,
+        }
+        for priority, value in enumerate(standby_by_priority):
+            detail[f"standby_{priority}"] = value
+        return MemoryListSnapshot(
+            time.time(),
+            detail["zeroed"] + detail["free"],
+            sum(standby_by_priority),
+            detail["modified"] + detail["modified_no_write"],
+            detail,
+        )
+
+    def _read_linux(self):
+        if self._meminfo is None:
+            self._meminfo = MeminfoReader(MEMINFO_FIELDS, self.meminfo_path)
+        self._meminfo.read()
+        return snapshot_from_meminfo(self._meminfo.as_dict())
+
+    def _read_psutil(self):
+        # メモリリストを取得できない環境では Available と Free の差をキャッシュと見なす
+        vm = psutil.virtual_memory()
+        return MemoryListSnapshot(time.time(), vm.free, max(0, vm.available - vm.free), 0, {})
+
+
+def snapshot_from_meminfo(info):
+    """/proc/meminfo の項目からスナップショットを作成する"""
+    detail = {
+        "active_file": info.get("Active(file)", 0),
+        "inactive_file": info.get("Inactive(file)", 0),
+        "active_anon": info.get("Active(anon)", 0),
+        "inactive_anon": info.get("Inactive(anon)", 0),
+        "dirty": info.get("Dirty", 0),
+        "writeback": info.get("Writeback", 0),
+    }
+    modified = detail["dirty"] + detail["writeback"]
+    # Dirty/Writeback はファイルキャッシュにも含まれるため二重に数えない
+    standby = max(0, detail["active_file"] + detail["inactive_file"] - modified)
+    return MemoryListSnapshot(time.time(), info.get("MemFree", 0), standby, modified, detail)
@@ -0,0 +1,48 @@
+from collections import deque, namedtuple
+
+# 1回分のサンプル (lists は MemoryListSnapshot)
+Sample = namedtuple("Sample", ["timestamp", "total", "used", "percent", "source", "lists"])
+
+
+class MemorySampler:
+    """
+    メモリ使用状況とメモリリストのスナップショットを履歴として保持するクラス
+    """
+    def __init__(self, memory_source, list_reader, max_samples=3600):
+        """
+        Args:
+            memory_source (MemoryUsageSource): メモリ使用率の取得元
+            list_reader (MemoryListReader): メモリリストの取得元
+            max_samples (int): 保持するサンプル数の上限
+        """
+        self.memory_source = memory_source
+        self.list_reader = list_reader
+        self.history = deque(maxlen=max_samples)
+        # 解放処理の各フェーズ前後のスナップショット (フェーズ名, MemoryListSnapshot)
+        self.phase_history = deque(maxlen=max_samples)
+        self.listeners = []
+
+    def sample(self):
+        """
+        現在のメモリ使用状況を取得して履歴に追加する
+        Returns:
+            Sample: 取得したサンプル
+        """
+        usage = self.memory_source.read()
+        lists = self.list_reader.read()
+        sample = Sample(lists.timestamp, usage.total, usage.used, usage.percent, usage.source, lists)
+        self.history.append(sample)
+        for listener in self.listeners:
+            try:
+                listener(sample)
+            except Exception:
+                pass
+        return sample
+
+    def add_snapshot(self, phase, snapshot):
+        """解放処理で取得したスナップショットを履歴に追加する (ワーカースレッドから呼び出される)"""
+        self.phase_history.append((phase, snapshot))
+
+    def latest(self):
+        """最新のサンプルを返す (まだなければ None)"""
+        return self.history[-1] if self.history else None
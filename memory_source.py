@@ -0,0 +1,190 @@
+import os
+import psutil
+from collections import namedtuple
+from cgroup_reclaimer import DEFAULT_CGROUP_ROOT, read_stat_file
+from fast_readers import MeminfoReader
+
+# メモリ使用状況 (total/used はバイト、percent は % 、source は "host" または "cgroup")
+MemoryUsage = namedtuple("MemoryUsage", ["total", "used", "percent", "source"])
+
+# cgroup v1 で制限なしを表す値 (ページサイズに丸められた LONG_MAX 付近)
+_V1_UNLIMITED = 1 << 62
+
+
+class MemoryUsageSource:
+    """
+    メモリ使用率の取得元 (ホスト全体 / cgroup の制限) を切り替えるクラス
+    """
+    MODES = ("auto", "host", "cgroup")
+
+    def __init__(self, mode="auto", cgroup_root=DEFAULT_CGROUP_ROOT, proc_root="/proc"):
+        """
+        Args:
+            mode (str): "auto" (制限があれば cgroup)、"host" (ホスト全体)、
+                "cgroup" (制限がなくても自身の cgroup の使用量を、ホストのメモリ量に対する割合で表示する)
+            cgroup_root (str): cgroupfs のルートディレクトリ
+            proc_root (str): procfs のルートディレクトリ
+        """
+        self.mode = mode if mode in self.MODES else "auto"
+        self.cgroup_root = cgroup_root
+        self.proc_root = proc_root
+        self._cgroup = None
+        self._detected = False
+        self._meminfo = None # Linux のホスト全体の使用率に使う /proc/meminfo のリーダー
+
+    def set_mode(self, mode):
+        """取得元のモードを変更する"""
+        self.mode = mode if mode in self.MODES else "auto"
+
+    def set_cgroup_root(self, cgroup_root):
+        """cgroupfs のルートを変更し、検出結果を破棄する"""
+        self.cgroup_root = cgroup_root
+        self._cgroup = None
+        self._detected = False
+
+    def read(self):
+        """
+        現在のモードに従ってメモリ使用状況を返す
+        Returns:
+            MemoryUsage: メモリ使用状況
+        """
+        if self.mode != "host":
+            usage = self._read_cgroup(require_limit=self.mode == "auto")
+            if usage is not None:
+                return usage
+        usage = self._read_host_meminfo()
+        if usage is not None:
+            return usage
+        vm = psutil.virtual_memory()
+        return MemoryUsage(vm.total, vm.used, vm.percent, "host")
+
+    def _read_host_meminfo(self):
+        """Linux では /proc/meminfo を直接読み取ってホスト全体の使用状況を返す"""
+        meminfo_path = os.path.join(self.proc_root, "meminfo")
+        if os.name == 'nt' or not os.path.exists(meminfo_path):
+            return None
+        try:
+            if self._meminfo is None:
+                self._meminfo = MeminfoReader(("MemTotal", "MemAvailable"), meminfo_path)
+            total, available = self._meminfo.read()
+        except (OSError, ValueError):
+            return None
+        if total <= 0:
+            return None
+        used = total - available
+        return MemoryUsage(total, used, round(used * 100.0 / total, 1), "host")
+
+    def _read_cgroup(self, require_limit=True):
+        """
+        cgroup のメモリ制限に対する使用状況を返す
+        Args:
+            require_limit (bool): True の場合は制限がなければ None、False の場合はホストのメモリ量を上限とする
+        """
+        if os.name == 'nt':
+            return None
+        if not self._detected:
+            self._cgroup = self._detect()
+            self._detected = True
+        if self._cgroup is None:
+            return None
+
+        version, limit_dir, usage_dir = self._cgroup
+        limit = None
+        try:
+            if version == 2:
+                if limit_dir is not None:
+                    limit = _read_int(os.path.join(limit_dir, "memory.max"))
+                current = _read_int(os.path.join(usage_dir, "memory.current"))
+                inactive = read_stat_file(os.path.join(usage_dir, "memory.stat")).get("inactive_file", 0)
+            else:
+                if limit_dir is not None:
+                    limit = _read_int(os.path.join(limit_dir, "memory.limit_in_bytes"))
+                current = _read_int(os.path.join(usage_dir, "memory.usage_in_bytes"))
+                inactive = read_stat_file(os.path.join(usage_dir, "memory.stat")).get("total_inactive_file", 0)
+        except (OSError, ValueError):
+            return None
+
+        if current is None:
+            return None
+        host_total = psutil.virtual_memory().total
+        if limit is None or limit <= 0 or limit >= host_total:
+            # ホストより大きい制限は実質無制限として扱う
+            if require_limit:
+                return None
+            limit = host_total
+
+        # 解放可能なファイルキャッシュ (inactive_file) を除いたワーキングセットを使用量とする
+        used = max(0, current - inactive)
+        percent = round(used * 100.0 / limit, 1)
+        return MemoryUsage(limit, used, percent, "cgroup")
+
+    def _detect(self):
+        """
+        自プロセスが属する cgroup を調べ、最も厳しいメモリ制限を持つディレクトリを返す
+        Returns:
+            tuple or None: (バージョン, 制限ファイルのディレクトリ (制限がなければ None), 使用量ファイルのディレクトリ)
+        """
+        try:
+            with open(os.path.join(self.proc_root, "self", "cgroup"), "r") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+
+        v1_path = None
+        v2_path = None
+        for line in lines:
+            parts = line.split(":", 2)
+            if len(parts) != 3:
+                continue
+            hierarchy_id, controllers, path = parts
+            if hierarchy_id == "0" and controllers == "":
+                v2_path = path
+            elif "memory" in controllers.split(","):
+                v1_path = path
+
+        # ハイブリッド構成では memory コントローラは v1 側にある
+        if v1_path is not None:
+            base = os.path.join(self.cgroup_root, "memory")
+            return self._find_limit(1, base, v1_path, "memory.limit_in_bytes")
+        if v2_path is not None and os.path.exists(os.path.join(self.cgroup_root, "cgroup.controllers")):
+            return self._find_limit(2, self.cgroup_root, v2_path, "memory.max")
+        return None
+
+    def _find_limit(self, version, base, cgroup_path, limit_file):
+        """自身から祖先に向かって cgroup を辿り、最小の制限を持つディレクトリを探す"""
+        own_dir = os.path.join(base, cgroup_path.strip("/"))
+        if not os.path.isdir(own_dir):
+            # cgroup 名前空間内ではパスがルートとして見える
+            own_dir = base
+        usage_file = "memory.current" if version == 2 else "memory.usage_in_bytes"
+        if not os.path.exists(os.path.join(own_dir, usage_file)):
+            return None
+
+        best_dir = None
+        best_limit = None
+        current_dir = own_dir
+        while True:
+            try:
+                limit = _read_int(os.path.join(current_dir, limit_file))
+            except (OSError, ValueError):
+                limit = None
+            if limit is not None and (best_limit is None or limit < best_limit):
+                best_dir, best_limit = current_dir, limit
+            if os.path.normpath(current_dir) == os.path.normpath(base):
+                break
+            current_dir = os.path.dirname(current_dir)
+
+        return (version, best_dir, own_dir)
+
+
+def _read_int(path):
+    """数値を1つだけ含むファイルを読み取る ("max" や制限なしは None)"""
+    with open(path, "r") as f:
+        value = f.read().strip()
+    if value == "max":
+        return None
+    number = int(value)
+    if number >= _V1_UNLIMITED:
+        return None
+    return number
+
@@ -0,0 +1,213 @@
+import os
+import re
+import errno
+import logging
+
+# NUMA ノードの sysfs ディレクトリ
+DEFAULT_NODE_ROOT = "/sys/devices/system/node"
+
+_NODE_DIR = re.compile(r"node(\d+)$")
+_NODE_PAGES = re.compile(r"N(\d+)=(\d+)")
+
+
+class NodeStats:
+    """1つの NUMA ノードのメモリ使用状況"""
+    __slots__ = ("node", "total", "free", "available", "file", "anon", "numa_miss", "numa_foreign")
+
+    def __init__(self, node, meminfo, numastat):
+        self.node = node
+        self.total = meminfo.get("MemTotal", 0)
+        self.free = meminfo.get("MemFree", 0)
+        self.file = meminfo.get("Active(file)", 0) + meminfo.get("Inactive(file)", 0)
+        self.anon = meminfo.get("AnonPages", 0)
+        # ノードごとの MemAvailable はないため、空きにページキャッシュと回収可能なスラブの半分を加えて見積もる
+        self.available = min(self.total, self.free + self.file // 2 + meminfo.get("SReclaimable", 0) // 2)
+        self.numa_miss = numastat.get("numa_miss", 0) # 他ノードから割り当てられたページ数 (このノードが満杯)
+        self.numa_foreign = numastat.get("numa_foreign", 0) # このノードを希望したが他ノードに割り当てられたページ数
+
+    @property
+    def used(self):
+        return self.total - self.available
+
+    @property
+    def percent(self):
+        return round(self.used / self.total * 100, 1) if self.total else 0.0
+
+
+def read_node_meminfo(path):
+    """
+    ノードの meminfo ("Node 0 MemTotal:  16384 kB" の行) を読み取る
+    Returns:
+        dict: 項目名 -> バイト数 (HugePages_* は件数)
+    """
+    meminfo = {}
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 4:
+                continue
+            try:
+                value = int(parts[3])
+            except ValueError:
+                continue
+            meminfo[parts[2].rstrip(":")] = value * 1024 if len(parts) > 4 and parts[4] == "kB" else value
+    return meminfo
+
+
+def read_numastat(path):
+    """ノードの numastat ("numa_hit 123" の行) を読み取る"""
+    stat = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    stat[parts[0]] = int(parts[1])
+    except (OSError, ValueError):
+        pass
+    return stat
+
+
+class NumaMonitor:
+    """
+    NUMA ノードごとのメモリ使用状況の取得と、ノードを指定した回収を行うクラス (Linux のみ)
+    ホスト全体の使用率では、一方のノードだけが満杯になっている状態が見えないため、ノードごとに判定する
+    """
+    def __init__(self, node_root=DEFAULT_NODE_ROOT, proc_root="/proc"):
+        """
+        Args:
+            node_root (str): ノードの sysfs ディレクトリ (テスト時は偽のツリーを指定可能)
+            proc_root (str): procfs のルート
+        """
+        self.logger = logging.getLogger("MemoryCleaner")
+        self.proc_root = proc_root
+        self.set_root(node_root)
+
+    def set_root(self, node_root):
+        """ノードの sysfs ディレクトリを変更し、ノードの一覧を読み直す"""
+        self.node_root = node_root
+        self.nodes = []
+        try:
+            for entry in os.listdir(node_root):
+                match = _NODE_DIR.match(entry)
+                if match and os.path.exists(os.path.join(node_root, entry, "meminfo")):
+                    self.nodes.append(int(match.group(1)))
+        except OSError:
+            pass
+        self.nodes.sort()
+
+    @property
+    def is_numa(self):
+        """メモリを持つノードが複数あるかどうか"""
+        return len(self.nodes) > 1
+
+    def _path(self, node, filename):
+        return os.path.join(self.node_root, f"node{node}", filename)
+
+    def read(self):
+        """
+        ノードごとの使用状況を返す
+        Returns:
+            list: NodeStats のリスト (メモリを持たないノードは除く)
+        """
+        stats = []
+        for node in self.nodes:
+            try:
+                meminfo = read_node_meminfo(self._path(node, "meminfo"))
+            except OSError:
+                continue
+            if meminfo.get("MemTotal"):
+                stats.append(NodeStats(node, meminfo, read_numastat(self._path(node, "numastat"))))
+        return stats
+
+    def process_node_usage(self, pid):
+        """
+        プロセスの常駐ページがどのノードにあるかを /proc/<pid>/numa_maps から集計する
+        Returns:
+            dict: ノード番号 -> バイト数
+        """
+        usage = {}
+        with open(f"{self.proc_root}/{pid}/numa_maps", "r") as f:
+            for line in f:
+                page_size = _page_size(line)
+                for node, pages in _NODE_PAGES.findall(line):
+                    node = int(node)
+                    usage[node] = usage.get(node, 0) + int(pages) * page_size
+        return usage
+
+    def node_ranges(self, pid, node):
+        """
+        指定したノードに常駐ページを持つ領域の開始アドレスを返す
+        (linux_mm.page_out の predicate で、そのノードの領域だけをページアウトするために使う)
+        Returns:
+            set: 領域の開始アドレス
+        """
+        marker = f" N{node}="
+        starts = set()
+        with open(f"{self.proc_root}/{pid}/numa_maps", "r") as f:
+            for line in f:
+                if marker in line:
+                    starts.add(int(line.split(None, 1)[0], 16))
+        return starts
+
+    def reclaim(self, node, amount_bytes, swappiness=None):
+        """
+        ノード単位の回収 (nodeN/reclaim、新しいカーネルのみ) に回収量を書き込み、空きの増加量を返す
+        Args:
+            swappiness (int): 指定した場合は回収時の swappiness (0 でファイルキャッシュのみ回収)
+        Returns:
+            int or None: 空きの増加量 (バイト)。インターフェースがない場合は None
+        """
+        path = self._path(node, "reclaim")
+        if not os.path.exists(path):
+            return None
+        before = read_node_meminfo(self._path(node, "meminfo")).get("MemFree", 0)
+        try:
+            with open(path, "w") as f:
+                f.write(str(int(amount_bytes)) if swappiness is None else f"{int(amount_bytes)} swappiness={swappiness}")
+        except OSError as e:
+            # 要求量を回収しきれなかった場合は EAGAIN が返るが、一部は回収されている
+            if e.errno != errno.EAGAIN:
+                raise
+        after = read_node_meminfo(self._path(node, "meminfo")).get("MemFree", 0)
+        return max(0, after - before)
+
+    def compact(self, node):
+        """
+        ノードのメモリを断片化解消 (コンパクション) する
+        Returns:
+            bool: 実行できた場合 True (CONFIG_COMPACTION が無効、または権限がない場合は False)
+        """
+        try:
+            with open(self._path(node, "compact"), "w") as f:
+                f.write("1")
+            return True
+        except OSError:
+            return False
+
+
+def pressured_node(stats, threshold):
+    """
+    使用率が閾値以上のノードのうち、最も使用率の高いノードを返す
+    Args:
+        stats (list): NodeStats のリスト
+        threshold (float): ノードごとの閾値 (%)
+    Returns:
+        NodeStats or None: 閾値以上のノードがない場合は None
+    """
+    over = [node for node in stats if node.percent >= threshold]
+    return max(over, key=lambda node: node.percent) if over else None
+
+
+def reclaim_budget(node, threshold, margin=5, minimum=256 * 1024 * 1024):
+    """ノードの使用率を (閾値 - 余裕) まで下げるのに必要な回収量 (バイト) を返す"""
+    target = node.total * (threshold - margin) / 100
+    return int(max(minimum, node.used - target))
+
+
+def _page_size(line):
+    """numa_maps の行のページサイズ (バイト) を返す (ヒュージページの領域は kernelpagesize_kB が大きい)"""
+    index = line.find("kernelpagesize_kB=")
+    if index < 0:
+        return 4096
+    return int(line[index + 18:].split(None, 1)[0]) * 1024
@@ -0,0 +1,58 @@
+import bisect
+
+
+class ProcessCatalog:
+    """
+    プロセス名ごとのインスタンス数と常駐メモリの合計を集計し、前方一致で検索できるようにするクラス
+    プロセス名 (小文字) の整列済みリストを索引とし、二分探索で一致範囲を求める
+    """
+    def __init__(self):
+        self.entries = {} # プロセス名 -> [インスタンス数, 常駐メモリの合計 (バイト)]
+        self._keys = [] # (小文字のプロセス名, プロセス名) の整列済みリスト
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, name, rss):
+        """
+        プロセスを1つ追加する
+        Args:
+            name (str): プロセス名
+            rss (int): 常駐メモリ (バイト、取得できない場合は None)
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            entry = self.entries[name] = [0, 0]
+            bisect.insort(self._keys, (name.lower(), name))
+        entry[0] += 1
+        entry[1] += rss or 0
+
+    def match(self, prefix):
+        """
+        前方一致するプロセス名を返す (大文字と小文字を区別しない)
+        Returns:
+            list: プロセス名のリスト (名前順)
+        """
+        if not prefix:
+            return [name for _, name in self._keys]
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._keys, (prefix,))
+        # 前方一致する範囲の終端 (prefix の直後の文字列) を二分探索で求める
+        end = bisect.bisect_left(self._keys, (prefix + "\U0010ffff",), start)
+        return [name for _, name in self._keys[start:end]]
+
+    def rows(self, prefix="", sort="memory"):
+        """
+        表示用の行を返す
+        Args:
+            prefix (str): 絞り込みに使う前方一致の文字列
+            sort (str): "memory" (常駐メモリの多い順) / "count" (インスタンス数の多い順) / "name" (名前順)
+        Returns:
+            list: (プロセス名, インスタンス数, 常駐メモリの合計 バイト) のリスト
+        """
+        rows = [(name, *self.entries[name]) for name in self.match(prefix)]
+        if sort == "memory":
+            rows.sort(key=lambda row: row[2], reverse=True)
+        elif sort == "count":
+            rows.sort(key=lambda row: row[1], reverse=True)
+        return rows
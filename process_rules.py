@@ -0,0 +1,264 @@
+import os
+import re
+import time
+import ctypes
+import logging
+
+# Windows固有のライブラリを条件付きでインポート
+if os.name == 'nt':
+    from ctypes import wintypes
+
+# SetProcessWorkingSetSizeEx のフラグ
+QUOTA_LIMITS_HARDWS_MIN_DISABLE = 0x00000002
+QUOTA_LIMITS_HARDWS_MAX_ENABLE = 0x00000004
+QUOTA_LIMITS_HARDWS_MAX_DISABLE = 0x00000008
+
+
+class ProcessRule:
+    """
+    1つのプロセス名に対するルール
+    """
+    __slots__ = ("name", "exclude", "max_ws_mb", "min_ws_mb", "hard", "trim_interval_min", "ksm")
+
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): ルールの設定
+                {"name": "chrome.exe", "max_ws_mb": 1024, "hard": false, "trim_interval_min": 10}
+                (max_ws_mb は一致するプロセスそれぞれの上限で、Linux ではプロセスごとの cgroup に設定する)
+                {"name": "game.exe", "exclude": true}
+                {"name": "worker", "ksm": true} (Linux: 協調解放のクライアントに KSM の併合を依頼する)
+        Raises:
+            ValueError: 設定が不正な場合
+        """
+        name = config.get("name")
+        if not name:
+            raise ValueError("name is required")
+        self.name = name
+        self.exclude = bool(config.get("exclude", False))
+        self.max_ws_mb = float(config["max_ws_mb"]) if config.get("max_ws_mb") else None
+        self.min_ws_mb = float(config.get("min_ws_mb", 1))
+        self.hard = bool(config.get("hard", False))
+        interval = config.get("trim_interval_min")
+        self.trim_interval_min = float(interval) if interval is not None else None
+        self.ksm = bool(config.get("ksm", False))
+        if self.max_ws_mb is not None and self.max_ws_mb <= self.min_ws_mb:
+            raise ValueError("max_ws_mb must be greater than min_ws_mb")
+
+
+class RuleOutcome:
+    """ルールを1つのプロセスに適用した結果"""
+    __slots__ = ("rule", "pid", "action", "success", "detail")
+
+    def __init__(self, rule, pid, action, success=True, detail=""):
+        self.rule = rule
+        self.pid = pid
+        self.action = action # "excluded" / "limit" / "trim" / "wait"
+        self.success = success
+        self.detail = detail
+
+
+class ProcessRuleEngine:
+    """
+    プロセスごとのルール (ワーキングセット上限、解放間隔、除外) を評価するクラス
+    ルールはプロセス名をキーとする索引に事前にまとめ、1回の解放あたり O(プロセス数) で評価する
+    """
+    def __init__(self, cgroup_root="/sys/fs/cgroup", cgroup_parent="memory_cleaner"):
+        """
+        Args:
+            cgroup_root (str): cgroupfs のルート (Linux の上限設定に使用)
+            cgroup_parent (str): プロセスごとの cgroup を作成する親 cgroup
+                (cgroup_root からの相対パス。root 以外で動かす場合は systemd が委譲した cgroup を指定する)
+        """
+        self.logger = logging.getLogger("MemoryCleaner")
+        self.rules = []
+        self.index = {}
+        self.cgroup_root = cgroup_root
+        self.cgroup_parent = cgroup_parent
+        self.outcomes = []
+        self._last_trim = {} # (プロセス名, pid) -> 最後に解放した時刻
+        self._limited = set() # 上限を設定済みの (プロセス名, pid)
+        self._cgroups = {} # pid -> 上限を設定するために作成した cgroup のパス (Linux)
+
+    @property
+    def is_empty(self):
+        return not self.index
+
+    def set_rules(self, rules):
+        """
+        ルールを検証して索引を作り直す
+        Args:
+            rules (list): ルールの辞書のリスト
+        """
+        compiled = []
+        index = {}
+        for config in rules or []:
+            try:
+                rule = ProcessRule(config)
+            except (ValueError, TypeError, AttributeError) as e:
+                self.logger.info(f"Process Rule: invalid rule ignored: {config!r} ({e})")
+                continue
+            compiled.append(config)
+            index[rule.name] = rule
+        self.rules = compiled
+        self.index = index
+        self._last_trim.clear()
+        self._limited.clear()
+
+    def match(self, name):
+        """プロセス名に一致するルールを返す (なければ None)"""
+        return self.index.get(name)
+
+    def begin_run(self):
+        """解放処理の開始時に呼び出し、前回の結果を破棄する"""
+        self.outcomes = []
+
+    def evaluate(self, pid, name, rule, trim_by_default=True, now=None):
+        """
+        ルールを1つのプロセスに適用し、ワーキングセットを解放してよいかを返す
+        Args:
+            trim_by_default (bool): 解放間隔を持たないルールのプロセスも解放するかどうか
+                (Windows は全プロセスを解放するため True、Linux は解放間隔を持つルールのみ)
+        Returns:
+            bool: 解放してよい場合 True
+        """
+        if rule.exclude:
+            self.outcomes.append(RuleOutcome(rule, pid, "excluded"))
+            return False
+
+        key = (name, pid)
+        if rule.max_ws_mb is not None:
+            self.apply_cap(pid, name, rule)
+
+        if rule.trim_interval_min is None:
+            if not trim_by_default:
+                return False
+        else:
+            now = time.time() if now is None else now
+            last = self._last_trim.get(key)
+            if last is not None and now - last < rule.trim_interval_min * 60:
+                self.outcomes.append(RuleOutcome(rule, pid, "wait"))
+                return False
+            self._last_trim[key] = now
+        self.outcomes.append(RuleOutcome(rule, pid, "trim"))
+        return True
+
+    def apply_cap(self, pid, name, rule):
+        """ルールのワーキングセット上限をプロセスに1度だけ設定する"""
+        key = (name, pid)
+        if key in self._limited:
+            return
+        try:
+            self._apply_limit(pid, rule)
+            self._limited.add(key)
+            kind = "hard" if rule.hard else "soft"
+            self.outcomes.append(RuleOutcome(rule, pid, "limit", True, f"{kind} {rule.max_ws_mb:.0f} MB"))
+        except Exception as e:
+            self.outcomes.append(RuleOutcome(rule, pid, "limit", False, str(e)))
+
+    def mark_trim_failed(self, pid, error):
+        """直前の "trim" の結果を失敗として記録する"""
+        for outcome in reversed(self.outcomes):
+            if outcome.pid == pid and outcome.action == "trim":
+                outcome.success = False
+                outcome.detail = str(error)
+                break
+
+    def prune(self, live_keys):
+        """終了したプロセスの記録を削除する"""
+        self._limited &= live_keys
+        self._remove_cgroups({pid for _, pid in live_keys})
+        for key in [key for key in self._last_trim if key not in live_keys]:
+            del self._last_trim[key]
+
+    def report(self):
+        """ルールごとの適用結果をログに出力する"""
+        summary = {}
+        for outcome in self.outcomes:
+            counts = summary.setdefault(outcome.rule.name, {})
+            label = outcome.action if outcome.success else f"{outcome.action} failed"
+            counts[label] = counts.get(label, 0) + 1
+        for name, counts in summary.items():
+            detail = ", ".join(f"{label}: {count}" for label, count in sorted(counts.items()))
+            self.logger.info(f"Process Rule: {name} ({detail})")
+        for outcome in self.outcomes:
+            if not outcome.success:
+                self.logger.info(f"Process Rule: {outcome.rule.name} (PID {outcome.pid}) {outcome.action} failed: {outcome.detail}")
+        return summary
+
+    # --- 上限設定 ---
+
+    def _apply_limit(self, pid, rule):
+        if os.name == 'nt':
+            self._apply_limit_windows(pid, rule)
+        else:
+            self._apply_limit_cgroup(pid, rule)
+
+    def _apply_limit_windows(self, pid, rule):
+        """SetProcessWorkingSetSizeEx でワーキングセットの上限を設定する"""
+        kernel32 = ctypes.WinDLL('kernel32.dll', use_last_error=True)
+        OpenProcess = kernel32.OpenProcess
+        OpenProcess.restype = wintypes.HANDLE
+        OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+        SetProcessWorkingSetSizeEx = kernel32.SetProcessWorkingSetSizeEx
+        SetProcessWorkingSetSizeEx.restype = wintypes.BOOL
+        SetProcessWorkingSetSizeEx.argtypes = (wintypes.HANDLE, ctypes.c_size_t, ctypes.c_size_t, wintypes.DWORD)
+
+        PROCESS_SET_QUOTA = 0x0100
+        PROCESS_QUERY_INFORMATION = 0x0400
+        handle = OpenProcess(PROCESS_SET_QUOTA | PROCESS_QUERY_INFORMATION, False, pid)
+        if not handle:
+            raise OSError(ctypes.get_last_error(), "OpenProcess failed")
+        try:
+            flags = QUOTA_LIMITS_HARDWS_MIN_DISABLE
+            flags |= QUOTA_LIMITS_HARDWS_MAX_ENABLE if rule.hard else QUOTA_LIMITS_HARDWS_MAX_DISABLE
+            minimum = int(rule.min_ws_mb * 1024 * 1024)
+            maximum = int(rule.max_ws_mb * 1024 * 1024)
+            if not SetProcessWorkingSetSizeEx(handle, minimum, maximum, flags):
+                raise OSError(ctypes.get_last_error(), "SetProcessWorkingSetSizeEx failed")
+        finally:
+            kernel32.CloseHandle(handle)
+
+    def _apply_limit_cgroup(self, pid, rule):
+        """
+        プロセスごとの cgroup v2 (<親>/<ルール名>-<pid>) に移動し、memory.high (ソフト) または memory.max (ハード) を設定する
+        上限は Windows と同じくプロセスごとに掛かり、同じルールに一致する複数のプロセスで合算しない
+        """
+        parent = os.path.join(self.cgroup_root, self.cgroup_parent)
+        os.makedirs(parent, exist_ok=True)
+        # 子 cgroup で memory コントローラを使えるようにする (親が既にある場合も確認する)
+        self._enable_memory_controller(parent)
+        group = re.sub(r"[^A-Za-z0-9_.-]", "_", rule.name)
+        path = os.path.join(parent, f"{group}-{pid}")
+        os.makedirs(path, exist_ok=True)
+        self._cgroups[pid] = path
+        limit_file = "memory.max" if rule.hard else "memory.high"
+        with open(os.path.join(path, limit_file), "w") as f:
+            f.write(str(int(rule.max_ws_mb * 1024 * 1024)))
+        with open(os.path.join(path, "cgroup.procs"), "w") as f:
+            f.write(str(pid))
+
+    @staticmethod
+    def _enable_memory_controller(path):
+        """cgroup.subtree_control に memory が含まれていなければ "+memory" を書き込む"""
+        control = os.path.join(path, "cgroup.subtree_control")
+        try:
+            with open(control) as f:
+                enabled = f.read().split()
+        except FileNotFoundError:
+            enabled = []
+        if "memory" not in enabled:
+            with open(control, "w") as f:
+                f.write("+memory")
+
+    def _remove_cgroups(self, live_pids):
+        """終了したプロセスの cgroup を削除する (プロセスが残っている場合は削除できないため次回に回す)"""
+        for pid in [pid for pid in self._cgroups if pid not in live_pids]:
+            try:
+                os.rmdir(self._cgroups[pid])
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.debug(f"Process Rule: failed to remove cgroup {self._cgroups[pid]}: {e}")
+                continue
+            del self._cgroups[pid]
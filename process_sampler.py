@@ -0,0 +1,121 @@
+import os
+import heapq
+import threading
+import psutil
+from fast_readers import StatmReader, list_pids
+
+
+class ProcessSampler:
+    """
+    プロセス一覧を低頻度で取得し、常駐メモリの上位 N 件を保持するクラス
+    全プロセスを並べ替えず、大きさ N のヒープで上位のみを残す (O(プロセス数 × log N))
+    取得はバックグラウンドスレッドで行い、UIスレッドは結果 (top) を読むだけにする
+    """
+    def __init__(self, top_n=15, interval=3.0, proc_root="/proc"):
+        """
+        Args:
+            top_n (int): 保持する上位のプロセス数
+            interval (float): 取得間隔 (秒)
+            proc_root (str): procfs のルート (Linux)
+        """
+        self.top_n = top_n
+        self.interval = interval
+        self.proc_root = proc_root
+        self.top = () # (pid, プロセス名, RSS バイト, 前回の解放からの増減 バイト or None) のタプル (RSS の多い順)
+        self.version = 0 # top の内容が変わるたびに増える (UIは変化したときだけ描き直す)
+        self.baseline = {} # 前回の解放直後の pid -> RSS
+        self._use_statm = os.name != 'nt'
+        self._statm = StatmReader(proc_root) if self._use_statm else None
+        self._names = {} # Windows: 直近の列挙で取得した pid -> プロセス名
+        self._lock = threading.Lock() # 取得処理の排他 (サンプラースレッドと解放処理のスレッド)
+        self._stopped = threading.Event() # 取得スレッドごとに作り直す (停止した古いスレッドが再開後も動き続けない)
+        self._stopped.set()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return not self._stopped.is_set()
+
+    def start(self):
+        """取得を開始する (一覧を表示している間のみ動かす)"""
+        if self.is_running:
+            return
+        stopped = threading.Event()
+        self._stopped = stopped
+        self._thread = threading.Thread(target=self._run, args=(stopped,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        # 停止中の解放は記録しないため、古い基準との増減を表示しないよう破棄する
+        self.baseline = {}
+
+    def _run(self, stopped):
+        while not stopped.is_set():
+            try:
+                self.sample()
+            except Exception:
+                pass
+            stopped.wait(self.interval)
+
+    def _iter_rss(self):
+        """(RSS, pid) を列挙する"""
+        if self._use_statm:
+            pids = list_pids(self.proc_root)
+            for pid in pids:
+                rss = self._statm.rss(pid)
+                if rss:
+                    yield rss, pid
+            self._statm.prune(set(pids))
+        else:
+            self._names = {}
+            for proc in psutil.process_iter(['name', 'memory_info']):
+                memory_info = proc.info.get('memory_info')
+                if memory_info:
+                    self._names[proc.info['pid']] = proc.info['name']
+                    yield memory_info.rss, proc.info['pid']
+
+    def _name(self, pid):
+        """
+        プロセス名を返す (Linux では上位に残ったプロセスのみ取得する)
+        除外リストと一致させるため、解放処理と同じく psutil の名前を使う
+        """
+        if not self._use_statm:
+            return self._names.get(pid, "")
+        try:
+            return psutil.Process(pid).name()
+        except psutil.Error:
+            return ""
+
+    def sample(self):
+        """
+        プロセス一覧を1回取得して上位 N 件を更新する
+        Returns:
+            tuple: self.top
+        """
+        with self._lock:
+            heap = []
+            for item in self._iter_rss():
+                if len(heap) < self.top_n:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+            top = []
+            for rss, pid in sorted(heap, reverse=True):
+                base = self.baseline.get(pid)
+                top.append((pid, self._name(pid), rss, rss - base if base is not None else None))
+            top = tuple(top)
+            if top != self.top:
+                self.top = top
+                self.version += 1
+            return self.top
+
+    def capture_baseline(self, report=None):
+        """
+        解放直後の RSS を記録する (解放結果の通知先として登録し、解放処理のスレッドから呼び出される)
+        一覧を表示していない間は増減を表示しないため、全プロセスの走査を省く
+        """
+        if not self.is_running:
+            return
+        with self._lock:
+            self.baseline = {pid: rss for rss, pid in self._iter_rss()}
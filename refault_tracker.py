@@ -0,0 +1,235 @@
+import os
+import logging
+import threading
+import psutil
+from fast_readers import StatmReader
+
+
+def read_faults(pid, proc_root="/proc"):
+    """
+    プロセスのページフォールト回数を返す
+    Returns:
+        tuple or None: (マイナーフォールト, メジャーフォールト)。取得できない場合は None
+    """
+    if os.name == 'nt':
+        try:
+            # Windows ではソフト/ハードの区別がないため、すべてマイナーとして扱う
+            return (psutil.Process(pid).memory_info().num_page_faults, 0)
+        except (psutil.Error, AttributeError):
+            return None
+    try:
+        with open(f"{proc_root}/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # comm に空白や括弧が含まれる場合があるため、最後の ')' 以降を解析する
+    fields = data[data.rfind(b")") + 2:].split()
+    # fields[0] は state (stat の3番目の項目)。minflt は10番目、majflt は12番目
+    return (int(fields[7]), int(fields[9]))
+
+
+class RefaultStats:
+    """プロセス名 (アプリ単位でまとめた場合はアプリ名) ごとの再フォールトの統計"""
+    __slots__ = ("name", "observations", "ratio", "fault_rate", "skipped_runs")
+
+    def __init__(self, name):
+        self.name = name
+        self.observations = 0
+        self.ratio = 0.0 # 解放した量のうち観測期間内に戻った割合 (指数移動平均)
+        self.fault_rate = 0.0 # 観測期間内のページフォールト数/秒 (指数移動平均)
+        self.skipped_runs = 0 # 優先度を下げたことで解放を見送った回数
+
+
+class RefaultTracker:
+    """
+    ワーキングセットを解放した直後の再フォールトと再増加を観測し、
+    解放しても即座に戻るプロセスを見送り・自動除外するクラス
+    """
+    def __init__(self, window=10.0, max_tracked=50, min_trim_mb=1.0, min_observations=3,
+                 downrank_ratio=0.5, exclude_ratio=0.9, exclude_fault_rate=10.0, downrank_every=4, alpha=0.5,
+                 proc_root="/proc"):
+        """
+        Args:
+            window (float): 解放後に観測する時間 (秒)
+            max_tracked (int): 1回の解放で観測するプロセス数の上限 (RSS の大きい順)
+            min_trim_mb (float): 観測対象とする最小の解放量 (MB)
+            min_observations (int): 判定に必要な観測回数
+            downrank_ratio (float): この割合以上戻るプロセスは解放の頻度を下げる
+            exclude_ratio (float): この割合以上戻るプロセスは自動的に除外する
+            exclude_fault_rate (float): 自動除外に必要な観測期間内のページフォールト数/秒
+                (ゆっくり戻るだけでフォールトの少ないプロセスは、解放の頻度を下げるだけにする)
+            downrank_every (int): 優先度を下げたプロセスを何回に1回解放するか
+            alpha (float): 指数移動平均の重み
+        """
+        self.window = window
+        self.max_tracked = max_tracked
+        self.min_trim_mb = min_trim_mb
+        self.min_observations = min_observations
+        self.downrank_ratio = downrank_ratio
+        self.exclude_ratio = exclude_ratio
+        self.exclude_fault_rate = exclude_fault_rate
+        self.downrank_every = downrank_every
+        self.alpha = alpha
+        self.proc_root = proc_root
+        self.logger = logging.getLogger("MemoryCleaner")
+        self.stats = {} # プロセス名 -> RefaultStats
+        self.auto_excluded = set() # 自動的に除外したプロセス名 (ユーザーの除外リストとは別に管理)
+        self.skipped = [] # 今回の解放で見送ったプロセス (pid, プロセス名, 理由)
+        self._decisions = {} # 今回の解放でのプロセス名ごとの判定
+        self._lock = threading.Lock()
+
+    def set_auto_exclusions(self, names):
+        """保存されていた自動除外リストを復元する"""
+        with self._lock:
+            self.auto_excluded = set(names or [])
+
+    def remove_auto_exclusion(self, name):
+        """自動除外を解除し、統計を初期化して観測をやり直す"""
+        with self._lock:
+            self.auto_excluded.discard(name)
+            self.stats.pop(name, None)
+
+    def clear_auto_exclusions(self):
+        """自動除外と統計をすべて解除する"""
+        with self._lock:
+            self.auto_excluded.clear()
+            self.stats.clear()
+
+    @property
+    def has_skips(self):
+        """解放を見送る可能性のあるプロセスがあるかどうか (高速モードの一括解放を使えない)"""
+        with self._lock:
+            return bool(self.auto_excluded) or any(
+                s.ratio >= self.downrank_ratio and s.observations >= self.min_observations
+                for s in self.stats.values()
+            )
+
+    def begin_run(self):
+        """解放処理の開始時に呼び出し、プロセス名ごとの判定をリセットする"""
+        self._decisions = {}
+        self.skipped = []
+
+    def should_skip(self, pid, name):
+        """
+        このプロセスの解放を見送るべきかどうかを返す (同じ名前のプロセスは1回の解放で同じ判定)
+        Returns:
+            str or None: 見送る場合はその理由 ("auto_excluded" / "downranked")
+        """
+        if name in self._decisions:
+            decision = self._decisions[name]
+            if decision is not None:
+                self.skipped.append((pid, name, decision))
+            return decision
+        decision = None
+        with self._lock:
+            if name in self.auto_excluded:
+                decision = "auto_excluded"
+            else:
+                stats = self.stats.get(name)
+                if (stats is not None and stats.observations >= self.min_observations
+                        and stats.ratio >= self.downrank_ratio):
+                    stats.skipped_runs += 1
+                    if stats.skipped_runs % self.downrank_every != 0:
+                        decision = "downranked"
+        self._decisions[name] = decision
+        if decision is not None:
+            self.skipped.append((pid, name, decision))
+        return decision
+
+    def observe(self, trimmed):
+        """
+        解放したプロセスの観測を開始する
+        Args:
+            trimmed (list): (pid, プロセス名, 解放前の RSS バイト) のリスト
+        """
+        candidates = sorted((t for t in trimmed if t[2]), key=lambda t: t[2], reverse=True)[:self.max_tracked]
+        # 観測期間の終了時も同じファイルディスクリプタから読み直せるよう、観測ごとにリーダーを作る
+        statm = StatmReader(self.proc_root, max_open=self.max_tracked) if os.name != 'nt' else None
+        observations = []
+        for pid, name, rss_before in candidates:
+            rss_after = self._read_rss(statm, pid)
+            faults = read_faults(pid, self.proc_root)
+            if rss_after is None or faults is None:
+                continue
+            if (rss_before - rss_after) / (1024 * 1024) < self.min_trim_mb:
+                continue
+            observations.append((pid, name, rss_before, rss_after, faults))
+        if not observations:
+            if statm is not None:
+                statm.close()
+            return
+        timer = threading.Timer(self.window, self._finish, args=(statm, observations))
+        timer.daemon = True
+        timer.start()
+
+    def _read_rss(self, statm, pid):
+        if statm is not None:
+            return statm.rss(pid)
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+
+    def _finish(self, statm, observations):
+        """
+        観測期間の終了時に再増加量とページフォールトを集計する
+        同じ名前 (アプリ) の複数のプロセスは、解放量と再増加量を合計して1回の観測として記録する
+        """
+        totals = {} # 名前 -> [解放量, 再増加量, ページフォールト数]
+        for pid, name, rss_before, rss_after, faults_before in observations:
+            rss_end = self._read_rss(statm, pid)
+            faults_end = read_faults(pid, self.proc_root)
+            if rss_end is None or faults_end is None:
+                continue
+            trimmed = rss_before - rss_after
+            total = totals.setdefault(name, [0, 0, 0])
+            total[0] += trimmed
+            total[1] += min(trimmed, max(0, rss_end - rss_after))
+            total[2] += (faults_end[0] - faults_before[0]) + (faults_end[1] - faults_before[1])
+        for name, (trimmed, regained, faults) in totals.items():
+            self._record(name, regained / trimmed, faults / self.window)
+        if statm is not None:
+            statm.close()
+
+    def _record(self, name, ratio, fault_rate):
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = RefaultStats(name)
+                stats.ratio = ratio
+                stats.fault_rate = fault_rate
+                self.stats[name] = stats
+            else:
+                stats.ratio += self.alpha * (ratio - stats.ratio)
+                stats.fault_rate += self.alpha * (fault_rate - stats.fault_rate)
+            stats.observations += 1
+
+            if (stats.observations >= self.min_observations and stats.ratio >= self.exclude_ratio
+                    and stats.fault_rate >= self.exclude_fault_rate and name not in self.auto_excluded):
+                self.auto_excluded.add(name)
+                self.logger.info(
+                    f"Refault: {name} auto-excluded (refault ratio {stats.ratio:.2f}, "
+                    f"{stats.fault_rate:.0f} faults/s over {stats.observations} trims)"
+                )
+
+    def report(self):
+        """
+        プロセス名ごとの再フォールトの統計を返す
+        Returns:
+            list: (プロセス名, 再フォールト率, フォールト数/秒, 観測回数, 状態) のリスト
+        """
+        rows = []
+        with self._lock:
+            # 設定ファイルから復元した自動除外は統計を持たない
+            for name in self.auto_excluded - self.stats.keys():
+                rows.append((name, 1.0, 0.0, 0, "auto_excluded"))
+            for stats in self.stats.values():
+                if stats.name in self.auto_excluded:
+                    status = "auto_excluded"
+                elif stats.observations >= self.min_observations and stats.ratio >= self.downrank_ratio:
+                    status = "downranked"
+                else:
+                    status = "normal"
+                rows.append((stats.name, stats.ratio, stats.fault_rate, stats.observations, status))
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows
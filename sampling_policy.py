@@ -0,0 +1,102 @@
+import time
+import psutil
+
+
+class SamplingPolicy:
+    """
+    メモリ使用率の取得間隔を状況に応じて決めるクラス
+    ウィンドウ表示中や閾値に近い場合は短く、トレイ常駐中で使用率が低い場合は長く、
+    バッテリー駆動中はさらに長くする
+    """
+    def __init__(self, visible_ms=1000, near_ms=2000, idle_min_ms=10000, idle_max_ms=60000,
+                 margin=10, battery_factor=2.0, battery_check_sec=60):
+        """
+        Args:
+            visible_ms (int): ウィンドウ表示中、または警告閾値を超えている場合の間隔
+            near_ms (int): トレイ常駐中に注意閾値まで margin 以内の場合の間隔
+            idle_min_ms (int): トレイ常駐中の間隔の下限
+            idle_max_ms (int): トレイ常駐中の間隔の上限 (AC電源時)
+            margin (float): 閾値に「近い」と見なす使用率の差 (ポイント)
+            battery_factor (float): バッテリー駆動中に間隔に掛ける倍率
+            battery_check_sec (float): 電源状態を確認する間隔 (秒)
+        """
+        self.visible_ms = visible_ms
+        self.near_ms = near_ms
+        self.idle_min_ms = idle_min_ms
+        self.idle_max_ms = idle_max_ms
+        self.margin = margin
+        self.battery_factor = battery_factor
+        self.battery_check_sec = battery_check_sec
+        self._battery = False
+        self._battery_checked = 0.0
+
+    def on_battery(self):
+        """バッテリー駆動中かどうかを返す (電源状態の取得は一定間隔でのみ行う)"""
+        now = time.monotonic()
+        if now - self._battery_checked >= self.battery_check_sec:
+            self._battery_checked = now
+            try:
+                battery = psutil.sensors_battery()
+                self._battery = battery is not None and not battery.power_plugged
+            except Exception:
+                self._battery = False
+        return self._battery
+
+    def next_interval(self, percent, caution, warning, visible, history=None):
+        """
+        次にメモリ使用率を取得するまでの間隔を返す
+        Args:
+            percent (float): 現在の使用率
+            caution (float): 注意閾値 (None の場合は閾値を考慮しない)
+            warning (float): 警告閾値
+            visible (bool): ウィンドウが表示されているかどうか
+            history (sequence): 直近のサンプル (Sample) の履歴 (増加傾向の推定に使用)
+        Returns:
+            int: 間隔 (ミリ秒)
+        """
+        if visible or (warning is not None and percent >= warning):
+            return self.visible_ms
+
+        distance = (caution - percent) if caution is not None else 100 - percent
+        if distance <= self.margin:
+            interval = self.near_ms
+        else:
+            # 閾値から遠いほど長くする (margin の2倍離れていれば下限の2倍)
+            interval = self.idle_min_ms * distance / self.margin
+            # 使用率が増加している場合は、閾値に届くまでの推定時間の半分以内に次の取得を行う
+            rate = self._rise_rate(history)
+            if rate > 0:
+                interval = min(interval, distance / rate * 1000 / 2)
+            interval = max(self.near_ms, min(self.idle_max_ms, interval))
+
+        if self.on_battery():
+            interval *= self.battery_factor
+        return int(interval)
+
+    def granularity(self, visible):
+        """タイマーをまとめる単位 (ミリ秒)。表示中は1秒、トレイ常駐中は5秒"""
+        return 1000 if visible else 5000
+
+    @staticmethod
+    def _rise_rate(history, window=5):
+        """直近のサンプルから使用率の増加速度 (ポイント/秒) を返す"""
+        if not history or len(history) < 2:
+            return 0.0
+        first = history[-min(window, len(history))]
+        last = history[-1]
+        elapsed = last.timestamp - first.timestamp
+        if elapsed <= 0:
+            return 0.0
+        return (last.percent - first.percent) / elapsed
+
+
+def coalesce_delay(delay_ms, granularity_ms, now=None):
+    """
+    タイマーの発火時刻を granularity_ms の倍数のうち最も近い時刻に合わせた遅延を返す
+    複数のタイマー (使用率の取得、定期解放など) が同じ時刻に発火し、起床回数がまとまる
+    単位は遅延より大きくしない (短い遅延が丸めで 0 になるのを防ぐ)
+    """
+    granularity_ms = max(1, min(granularity_ms, delay_ms))
+    now_ms = (time.time() if now is None else now) * 1000
+    target = round((now_ms + delay_ms) / granularity_ms) * granularity_ms
+    return max(1, int(target - now_ms))
@@ -0,0 +1,62 @@
+"""
+ツール自身の常駐メモリの測定と切り詰め
+"""
+import os
+import ctypes
+import logging
+from cooperative_client import current_rss, release_memory
+
+
+def trim_self(empty_working_set=False):
+    """
+    自プロセスのヒープを切り詰める (ガベージコレクション、malloc_trim / _heapmin)
+    Args:
+        empty_working_set (bool): Windows で自プロセスのワーキングセットも空にするかどうか
+            (トレイ常駐中のみ。ウィンドウ表示中は再描画でページが戻るだけのため行わない)
+    Returns:
+        tuple: (切り詰め前の RSS, 切り詰め後の RSS) バイト。取得できない場合は None
+    """
+    before = current_rss()
+    release_memory("high")
+    if empty_working_set and os.name == 'nt':
+        try:
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+            kernel32.SetProcessWorkingSetSize.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t)
+            # 最小/最大に -1 を指定するとワーキングセットを空にする
+            kernel32.SetProcessWorkingSetSize(kernel32.GetCurrentProcess(), ctypes.c_size_t(-1), ctypes.c_size_t(-1))
+        except (OSError, AttributeError):
+            pass
+    return before, current_rss()
+
+
+class FootprintMeter:
+    """
+    表示モード (ウィンドウ / トレイ) ごとにツール自身の常駐メモリを記録するクラス
+    """
+    MODES = ("window", "tray")
+
+    def __init__(self):
+        self.logger = logging.getLogger("MemoryCleaner")
+        self.rss = {} # モード -> 直近の RSS (バイト)
+
+    def measure(self, mode):
+        """現在の RSS をモードの値として記録する"""
+        rss = current_rss()
+        if rss is None:
+            return None
+        self.rss[mode] = rss
+        others = ", ".join(
+            f"{other} {self.rss[other] / (1024 * 1024):.1f} MB" for other in self.MODES if other != mode and other in self.rss
+        )
+        suffix = f" ({others})" if others else ""
+        self.logger.info(f"Footprint: {mode} mode RSS {rss / (1024 * 1024):.1f} MB{suffix}")
+        return rss
+
+    def summary(self):
+        """
+        モードごとの RSS (MB) を返す
+        Returns:
+            dict: {"window": MB, "tray": MB} (未測定のモードは含まない)
+        """
+        return {mode: rss / (1024 * 1024) for mode, rss in self.rss.items()}
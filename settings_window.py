@@ -1,5 +1,8 @@
 import os
 import sys
+import time
+import queue
+import threading
 import webbrowser
 import psutil
 import tkinter as tk
@@ -7,6 +10,9 @@ from tkinter import ttk
 from tkinter import scrolledtext
 from tkinter import messagebox
 from tkinter import colorchooser
+from tkinter import filedialog
+from history_store import EXPORT_TABLES
+from process_catalog import ProcessCatalog
 
 
 class SettingsWindow(tk.Toplevel):
@@ -16,7 +22,7 @@ class SettingsWindow(tk.Toplevel):
         self.parent = parent
 
         self.title("設定")
-        self.geometry("320x350")
+        self.geometry("420x470")
         self.resizable(False, False)
         self.transient(parent.root) # 親ウィンドウの上に表示
 
@@ -29,7 +35,9 @@ class SettingsWindow(tk.Toplevel):
         notebook.add(tab_general, text="一般")
         
         # 最前面表示
-        ttk.Checkbutton(tab_general, text="常に最前面で表示", variable=self.parent.topmost_var, command=self.parent.toggle_topmost).pack(anchor="w", padx=10, pady=10)
+        ttk.Checkbutton(tab_general, text="常に最前面で表示", variable=self.parent.topmost_var, command=self.parent.toggle_topmost).pack(anchor="w", padx=10, pady=(10, 0))
+        # 省メモリのトレイ常駐
+        ttk.Checkbutton(tab_general, text="トレイ格納中はウィンドウを破棄して省メモリで常駐", variable=self.parent.low_footprint_var).pack(anchor="w", padx=10, pady=(2, 5))
 
         # 起動設定
         startup_frame = ttk.LabelFrame(tab_general, text="起動設定")
@@ -89,6 +97,14 @@ class SettingsWindow(tk.Toplevel):
         ttk.Label(warning_row, text="警告閾値(%):").pack(side=tk.LEFT)
         ttk.Entry(warning_row, textvariable=self.parent.warning_threshold_var, width=5).pack(side=tk.LEFT, padx=5)
 
+        accounting_row = ttk.Frame(warning_frame)
+        accounting_row.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(accounting_row, text="使用率の基準:").pack(side=tk.LEFT)
+        accounting_combo = ttk.Combobox(accounting_row, textvariable=self.parent.accounting_mode_var,
+                                        values=("auto", "host", "cgroup"), state="readonly", width=8)
+        accounting_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Label(accounting_row, text="(cgroup: コンテナの制限)", font=("", 8), foreground="gray").pack(side=tk.LEFT)
+
         # 定期解放設定
         auto_free_frame = ttk.LabelFrame(tab_auto, text="定期解放設定")
         auto_free_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -107,6 +123,19 @@ class SettingsWindow(tk.Toplevel):
         if is_running:
             self.interval_entry.config(state="disabled")
 
+        # 予測による事前の解放
+        predictive_frame = ttk.LabelFrame(tab_auto, text="予測による解放")
+        predictive_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Checkbutton(predictive_frame, text="警告閾値に達する前に解放する", variable=self.parent.predictive_free_var).pack(anchor="w", padx=5, pady=2)
+        horizon_row = ttk.Frame(predictive_frame)
+        horizon_row.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(horizon_row, text="予測範囲(秒):").pack(side=tk.LEFT)
+        ttk.Entry(horizon_row, textvariable=self.parent.forecast_horizon_var, width=5).pack(side=tk.LEFT, padx=5)
+        self.forecast_label = ttk.Label(predictive_frame, text="", font=("", 8), foreground="gray")
+        self.forecast_label.pack(anchor="w", padx=5, pady=(0, 5))
+        self._forecast_job = None
+        self.refresh_forecast_stats()
+
         # --- タブ3: 除外リスト ---
         tab_exclude = ttk.Frame(notebook)
         notebook.add(tab_exclude, text="除外リスト")
@@ -120,7 +149,7 @@ class SettingsWindow(tk.Toplevel):
         list_frame = ttk.Frame(exclude_frame)
         list_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         
-        self.exclude_listbox = tk.Listbox(list_frame, height=6)
+        self.exclude_listbox = tk.Listbox(list_frame, height=4)
         self.exclude_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.exclude_listbox.yview)
@@ -128,7 +157,7 @@ class SettingsWindow(tk.Toplevel):
         self.exclude_listbox.config(yscrollcommand=scrollbar.set)
 
         # 既存のリストを読み込み
-        for item in self.parent.exclusion_list:
+        for item in self.parent.config["exclusion_list"]:
             self.exclude_listbox.insert(tk.END, item)
 
         # 追加・削除コントロール
@@ -141,8 +170,84 @@ class SettingsWindow(tk.Toplevel):
         ttk.Button(ctrl_frame, text="追加", command=self.add_exclusion).pack(side=tk.LEFT, padx=2)
         ttk.Button(ctrl_frame, text="削除", command=self.remove_exclusion).pack(side=tk.LEFT, padx=2)
         ttk.Button(exclude_frame, text="実行中のプロセスから選択...", command=self.open_process_selector).pack(anchor="e", pady=(5, 0))
+
+        # 自動除外 (解放してもすぐに戻るプロセス、ユーザーの除外リストとは別に管理)
+        auto_frame = ttk.LabelFrame(exclude_frame, text="自動除外 (解放後すぐに再読み込みされるプロセス)")
+        auto_frame.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
+
+        self.auto_exclude_listbox = tk.Listbox(auto_frame, height=3)
+        self.auto_exclude_listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=2)
+        auto_ctrl = ttk.Frame(auto_frame)
+        auto_ctrl.pack(anchor="e", padx=5, pady=(0, 5))
+        ttk.Button(auto_ctrl, text="更新", command=self.refresh_auto_exclusions).pack(side=tk.LEFT, padx=2)
+        ttk.Button(auto_ctrl, text="解除", command=self.remove_auto_exclusion).pack(side=tk.LEFT, padx=2)
+        self.refresh_auto_exclusions()
         
-        # --- タブ3: その他 ---
+        # --- タブ4: 詳細 ---
+        tab_advanced = ttk.Frame(notebook)
+        notebook.add(tab_advanced, text="詳細")
+
+        # 解放方法
+        method_frame = ttk.LabelFrame(tab_advanced, text="解放方法")
+        method_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        fast_chk = ttk.Checkbutton(method_frame, text="高速モード (一括コマンドで解放)", variable=self.parent.fast_clean_var, command=self.parent.update_clean_options)
+        fast_chk.pack(anchor="w", padx=5, pady=2)
+        low_priority_chk = ttk.Checkbutton(method_frame, text="低優先度のスタンバイリストのみ解放", variable=self.parent.low_priority_standby_var, command=self.parent.update_clean_options)
+        low_priority_chk.pack(anchor="w", padx=5, pady=2)
+        ttk.Checkbutton(method_frame, text="ヘルパープロセスをアプリ単位でまとめる", variable=self.parent.group_apps_var, command=self.parent.update_clean_options).pack(anchor="w", padx=5, pady=2)
+        ksm_chk = ttk.Checkbutton(method_frame, text="KSM (同一ページの併合) を管理する", variable=self.parent.ksm_mode_var, command=self.parent.update_clean_options)
+        ksm_chk.pack(anchor="w", padx=5, pady=2)
+        ttk.Label(method_frame, text="※除外リストがある場合はプロセスごとに解放します", font=("", 8), foreground="gray").pack(anchor="w", padx=5, pady=(0, 5))
+        if os.name != 'nt':
+            fast_chk.state(['disabled'])
+            low_priority_chk.state(['disabled'])
+        if not self.parent.cleaner_logic.ksm.is_available:
+            ksm_chk.state(['disabled'])
+
+        # メモリリークの検出
+        leak_frame = ttk.LabelFrame(tab_advanced, text="メモリリークの疑い")
+        leak_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        ttk.Checkbutton(leak_frame, text="疑いのあるプロセスのみ解放", variable=self.parent.leak_target_only_var, command=self.parent.update_clean_options).pack(anchor="w", padx=5, pady=2)
+        self.leak_listbox = tk.Listbox(leak_frame, height=4)
+        self.leak_listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=2)
+        ttk.Button(leak_frame, text="更新", command=self.refresh_leak_suspects).pack(anchor="e", padx=5, pady=(0, 5))
+        self.refresh_leak_suspects()
+
+        # --- タブ5: メモリ上位 ---
+        tab_top = ttk.Frame(notebook)
+        notebook.add(tab_top, text="メモリ上位")
+
+        top_frame = ttk.Frame(tab_top)
+        top_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        ttk.Label(top_frame, text="常駐メモリの多いプロセス (増減は前回の解放後から)").pack(anchor="w")
+
+        self.top_tree = ttk.Treeview(top_frame, columns=("pid", "rss", "delta"), selectmode="browse", height=12)
+        self.top_tree.heading("#0", text="プロセス名")
+        self.top_tree.heading("pid", text="PID")
+        self.top_tree.heading("rss", text="MB")
+        self.top_tree.heading("delta", text="増減")
+        self.top_tree.column("#0", width=140)
+        self.top_tree.column("pid", width=55, anchor="e")
+        self.top_tree.column("rss", width=60, anchor="e")
+        self.top_tree.column("delta", width=60, anchor="e")
+        self.top_tree.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        top_ctrl = ttk.Frame(top_frame)
+        top_ctrl.pack(fill=tk.X)
+        self.top_status_label = ttk.Label(top_ctrl, text="", font=("", 8), foreground="gray")
+        self.top_status_label.pack(side=tk.LEFT)
+        ttk.Button(top_ctrl, text="除外", command=self.exclude_top_process).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(top_ctrl, text="解放", command=self.trim_top_process).pack(side=tk.RIGHT, padx=2)
+
+        # 一覧を表示している間だけサンプラーを動かし、結果が更新されたときのみ描き直す
+        self._top_version = -1
+        self._top_job = None
+        self.parent.process_sampler.start()
+        self.refresh_top_processes()
+
+        # --- タブ6: その他 ---
         tab_misc = ttk.Frame(notebook)
         notebook.add(tab_misc, text="その他")
         
@@ -152,6 +257,25 @@ class SettingsWindow(tk.Toplevel):
         
         ttk.Button(log_frame, text="解放ログを表示", command=self.open_log_viewer).pack(fill=tk.X, padx=5, pady=5)
 
+        # 統計 (履歴データベースから集計)
+        stats_frame = ttk.LabelFrame(tab_misc, text="統計 (過去24時間)")
+        stats_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        self.stats_label = ttk.Label(stats_frame, text="")
+        self.stats_label.pack(anchor="w", padx=5, pady=(5, 2))
+        self.footprint_label = ttk.Label(stats_frame, text="", font=("", 8), foreground="gray")
+        self.footprint_label.pack(anchor="w", padx=5)
+        self.launch_label = ttk.Label(stats_frame, text="", font=("", 8), foreground="gray")
+        self.launch_label.pack(anchor="w", padx=5)
+        self.ksm_label = ttk.Label(stats_frame, text="", font=("", 8), foreground="gray")
+        self.ksm_label.pack(anchor="w", padx=5)
+        export_row = ttk.Frame(stats_frame)
+        export_row.pack(fill=tk.X, padx=5, pady=(2, 5))
+        self.export_table_var = tk.StringVar(value="runs")
+        ttk.Combobox(export_row, textvariable=self.export_table_var, values=EXPORT_TABLES, state="readonly", width=16).pack(side=tk.LEFT)
+        ttk.Button(export_row, text="書き出し...", command=self.export_history).pack(side=tk.LEFT, padx=5)
+        self.refresh_stats()
+
         # 設定リセット
         reset_frame = ttk.LabelFrame(tab_misc, text="設定管理")
         reset_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -188,13 +312,43 @@ class SettingsWindow(tk.Toplevel):
             self.warning_color_preview.config(bg=color)
             self.parent.update_warning_style()
 
+    def refresh_leak_suspects(self):
+        """リークの疑いがあるプロセスの一覧を更新する"""
+        self.leak_listbox.delete(0, tk.END)
+        suspects = self.parent.cleaner_logic.leak_detector.suspects()
+        if not suspects:
+            self.leak_listbox.insert(tk.END, "(検出されていません)")
+        for pid, name, slope, rss_mb in suspects:
+            self.leak_listbox.insert(tk.END, f"{name} (PID {pid}): +{slope:.1f} MB/分, {rss_mb:.0f} MB")
+
+    def refresh_auto_exclusions(self):
+        """再フォールトの統計と自動除外の一覧を更新する"""
+        self.auto_exclude_listbox.delete(0, tk.END)
+        self.auto_exclude_names = []
+        labels = {"auto_excluded": "除外", "downranked": "頻度低下", "normal": "通常"}
+        rows = self.parent.cleaner_logic.refault_tracker.report()
+        if not rows:
+            self.auto_exclude_listbox.insert(tk.END, "(観測データがありません)")
+        for name, ratio, fault_rate, observations, status in rows:
+            self.auto_exclude_names.append(name)
+            self.auto_exclude_listbox.insert(
+                tk.END, f"[{labels[status]}] {name}: 再読込率 {ratio * 100:.0f}%, {fault_rate:.0f} フォールト/秒 ({observations}回)"
+            )
+
+    def remove_auto_exclusion(self):
+        """選択したプロセスの自動除外を解除する"""
+        selection = self.auto_exclude_listbox.curselection()
+        if selection and selection[0] < len(self.auto_exclude_names):
+            self.parent.cleaner_logic.refault_tracker.remove_auto_exclusion(self.auto_exclude_names[selection[0]])
+            self.refresh_auto_exclusions()
+
     def add_exclusion(self):
         """除外リストにプロセスを追加"""
         name = self.exclude_entry.get().strip()
         if name:
-            if name not in self.parent.exclusion_list:
-                self.parent.exclusion_list.append(name)
-                self.parent.cleaner_logic.exclusion_list = self.parent.exclusion_list # ロジックに即時反映
+            exclusion_list = self.parent.config["exclusion_list"]
+            if name not in exclusion_list:
+                self.parent.config.set("exclusion_list", exclusion_list + [name]) # ロジックには変更通知で反映される
                 self.exclude_listbox.insert(tk.END, name)
                 self.exclude_entry.delete(0, tk.END)
             else:
@@ -206,21 +360,83 @@ class SettingsWindow(tk.Toplevel):
         if sel:
             index = sel[0]
             name = self.exclude_listbox.get(index)
-            self.parent.exclusion_list.remove(name)
-            self.parent.cleaner_logic.exclusion_list = self.parent.exclusion_list # ロジックに即時反映
+            self.parent.config.set("exclusion_list", [item for item in self.parent.config["exclusion_list"] if item != name])
             self.exclude_listbox.delete(index)
 
     def open_process_selector(self):
         """プロセス選択ウィンドウを開く"""
-        ProcessSelectorWindow(self, self._add_from_selector)
+        ProcessSelectorWindow(self, self._add_from_selector, excluded=self.parent.config["exclusion_list"])
 
     def _add_from_selector(self, process_names):
         """セレクターから選択されたプロセスを追加"""
+        exclusion_list = list(self.parent.config["exclusion_list"])
         for name in process_names:
-            if name not in self.parent.exclusion_list:
-                self.parent.exclusion_list.append(name)
+            if name not in exclusion_list:
+                exclusion_list.append(name)
                 self.exclude_listbox.insert(tk.END, name)
-        self.parent.cleaner_logic.exclusion_list = self.parent.exclusion_list
+        self.parent.config.set("exclusion_list", exclusion_list)
+
+    def refresh_forecast_stats(self):
+        """予測の誤差と、変化しないと見なす単純な予測との比較を表示する (5秒ごと)"""
+        stats = self.parent.forecaster.stats()
+        affected = f"、解放の影響で除外 {stats['affected']} 件" if stats["affected"] else ""
+        if not stats["count"]:
+            self.forecast_label.config(text=f"予測による解放: {stats['triggers']} 回 (誤差の記録なし{affected})")
+        else:
+            self.forecast_label.config(
+                text=f"予測による解放: {stats['triggers']} 回 / 誤差 {stats['mae']:.2f} pt "
+                     f"(単純な予測 {stats['naive_mae']:.2f} pt、改善率 {stats['skill']:.0%}{affected})"
+            )
+        self._forecast_job = self.after(5000, self.refresh_forecast_stats)
+
+    def refresh_stats(self):
+        """過去24時間の解放回数と解放量を表示する"""
+        try:
+            stats = self.parent.history_store.run_stats(time.time() - 86400)
+            self.stats_label.config(text=f"解放 {stats['runs']} 回 / 合計 {stats['total_mb']:.0f} MB (平均 {stats['average_mb']:.1f} MB)")
+        except Exception as e:
+            self.stats_label.config(text=f"統計の取得に失敗しました: {e}")
+
+        # ツール自身の常駐メモリ (表示モードごと)
+        footprint = self.parent.footprint.summary()
+        labels = {"window": "ウィンドウ", "tray": "トレイ"}
+        text = " / ".join(f"{labels[mode]} {mb:.1f} MB" for mode, mb in footprint.items())
+        self.footprint_label.config(text=f"本ツールの常駐メモリ: {text}" if text else "")
+
+        # 起動時の解放 (起動から解放完了までの時間)
+        launch = self.parent.launch_watcher.latency_stats()
+        if launch:
+            self.launch_label.config(
+                text=f"起動時の解放: {launch['count']} 回 / 完了まで平均 {launch['average_ms']:.0f} ms "
+                     f"(最大 {launch['max_ms']:.0f} ms、検出 {launch['detect_ms']:.0f} ms)"
+            )
+        else:
+            self.launch_label.config(text="")
+
+        # KSM の併合状況 (管理している場合のみ)
+        ksm = self.parent.cleaner_logic.ksm
+        ksm_stats = ksm.read_stats() if ksm.enabled else None
+        if ksm_stats is not None:
+            self.ksm_label.config(text=f"KSM: 共有 {ksm_stats.shared_mb:.1f} MB / 節約 {ksm_stats.saved_mb:.1f} MB (走査 {ksm.level or '既定'})")
+        else:
+            self.ksm_label.config(text="")
+
+    def export_history(self):
+        """選択したテーブルを CSV または JSONL で書き出す"""
+        table = self.export_table_var.get()
+        path = filedialog.asksaveasfilename(
+            parent=self, title="履歴を書き出し", initialfile=f"{table}.csv", defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+        )
+        if not path:
+            return
+        fmt = "jsonl" if path.lower().endswith(".jsonl") else "csv"
+        try:
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                count = self.parent.history_store.export(table, f, fmt)
+            messagebox.showinfo("完了", f"{count} 件を書き出しました。", parent=self)
+        except Exception as e:
+            messagebox.showerror("エラー", f"書き出しに失敗しました: {e}", parent=self)
 
     def reset_settings(self):
         """設定を初期化する"""
@@ -239,7 +455,63 @@ class SettingsWindow(tk.Toplevel):
         log_path = os.path.join(base_dir, "memory_cleaner.log")
         LogViewerWindow(self, log_file=log_path)
 
+    def refresh_top_processes(self):
+        """サンプラーの上位プロセスを一覧に反映する (2秒ごと)"""
+        sampler = self.parent.process_sampler
+        if sampler.version != self._top_version:
+            self._top_version = sampler.version
+            selected = self.top_tree.selection()
+            self.top_tree.delete(*self.top_tree.get_children())
+            for pid, name, rss, delta in sampler.top:
+                delta_text = f"{delta / (1024 * 1024):+.1f}" if delta is not None else "-"
+                self.top_tree.insert("", tk.END, iid=str(pid), text=name, values=(pid, f"{rss / (1024 * 1024):.1f}", delta_text))
+            if selected and self.top_tree.exists(selected[0]):
+                self.top_tree.selection_set(selected[0])
+        self._top_job = self.after(2000, self.refresh_top_processes)
+
+    def _selected_top_process(self):
+        selection = self.top_tree.selection()
+        if not selection:
+            return None, None
+        return int(selection[0]), self.top_tree.item(selection[0], "text")
+
+    def trim_top_process(self):
+        """選択したプロセスのワーキングセットを解放する (ページアウトは時間がかかるため別スレッドで行う)"""
+        pid, name = self._selected_top_process()
+        if pid is None:
+            return
+        self.top_status_label.config(text=f"{name} (PID {pid}) を解放しています...")
+        threading.Thread(target=self._trim_top_process_task, args=(pid, name), daemon=True).start()
+
+    def _trim_top_process_task(self, pid, name):
+        """プロセスを解放し、結果をUIスレッドで表示する (ワーカースレッド)"""
+        try:
+            self.parent.cleaner_logic.trim_process(pid)
+            text = f"{name} (PID {pid}) を解放しました"
+        except OSError as e:
+            text = f"解放に失敗しました: {e}"
+        self.parent.root.after(0, self._show_top_status, text)
+
+    def _show_top_status(self, text):
+        # 解放中に設定ウィンドウが閉じられた場合は表示しない
+        if self.winfo_exists():
+            self.top_status_label.config(text=text)
+
+    def exclude_top_process(self):
+        """選択したプロセス名を除外リストに追加する"""
+        pid, name = self._selected_top_process()
+        if name:
+            self._add_from_selector([name])
+            self.top_status_label.config(text=f"{name} を除外リストに追加しました")
+
     def on_close(self):
+        self.parent.process_sampler.stop()
+        if self._top_job is not None:
+            self.after_cancel(self._top_job)
+            self._top_job = None
+        if self._forecast_job is not None:
+            self.after_cancel(self._forecast_job)
+            self._forecast_job = None
         self.parent.settings_win = None
         self.destroy()
 
@@ -275,29 +547,63 @@ class SettingsWindow(tk.Toplevel):
 
 class ProcessSelectorWindow(tk.Toplevel):
     """実行中のプロセス一覧を表示して選択させるウィンドウ"""
-    def __init__(self, parent, callback):
+    # 列ごとの並べ替えの種類 (ProcessCatalog.rows の sort)
+    SORT_KEYS = {"name": "name", "count": "count", "memory": "memory"}
+
+    def __init__(self, parent, callback, excluded=()):
+        """
+        Args:
+            callback (callable): 選択されたプロセス名のリストを受け取る関数
+            excluded (iterable): 既に除外リストにあるプロセス名 (灰色で表示)
+        """
         super().__init__(parent)
         self.callback = callback
+        self.excluded = set(excluded)
         self.title("プロセス選択")
-        self.geometry("300x400")
+        self.geometry("360x440")
         self.transient(parent)
+
+        self.catalog = ProcessCatalog()
+        self.sort_key = "memory"
+        self._queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._loading = True
+        self._dirty = False
+        self._poll_job = None
         
         # 説明
         ttk.Label(self, text="除外するプロセスを選択してください(複数可):").pack(padx=10, pady=5, anchor="w")
 
-        # リストボックス
+        # 絞り込み (入力するたびに前方一致で絞り込む)
+        filter_row = ttk.Frame(self)
+        filter_row.pack(fill=tk.X, padx=10)
+        ttk.Label(filter_row, text="検索:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self._render())
+        filter_entry = ttk.Entry(filter_row, textvariable=self.filter_var)
+        filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+        filter_entry.focus_set()
+
+        # プロセス一覧 (名前、インスタンス数、ワーキングセットの合計)
         frame = ttk.Frame(self)
         frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
-        self.listbox = tk.Listbox(frame, selectmode=tk.EXTENDED)
-        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(frame, columns=("count", "memory"), selectmode="extended")
+        self.tree.heading("#0", text="プロセス名", command=lambda: self._set_sort("name"))
+        self.tree.heading("count", text="数", command=lambda: self._set_sort("count"))
+        self.tree.heading("memory", text="メモリ (MB)", command=lambda: self._set_sort("memory"))
+        self.tree.column("#0", width=180)
+        self.tree.column("count", width=40, anchor="e")
+        self.tree.column("memory", width=80, anchor="e")
+        self.tree.tag_configure("excluded", foreground="gray")
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.listbox.yview)
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.listbox.config(yscrollcommand=scrollbar.set)
-        
-        # プロセス読み込み
-        self._load_processes()
+        self.tree.config(yscrollcommand=scrollbar.set)
+
+        self.status_label = ttk.Label(self, text="読み込み中...", font=("", 8), foreground="gray")
+        self.status_label.pack(padx=10, anchor="w")
         
         # ボタン
         btn_frame = ttk.Frame(self)
@@ -305,27 +611,81 @@ class ProcessSelectorWindow(tk.Toplevel):
         ttk.Button(btn_frame, text="追加", command=self._on_add).pack(side=tk.RIGHT)
         ttk.Button(btn_frame, text="キャンセル", command=self.destroy).pack(side=tk.RIGHT, padx=5)
 
-    def _load_processes(self):
-        procs = set()
+        # プロセス読み込み (別スレッドで列挙し、届いた分から一覧に反映する)
+        threading.Thread(target=self._load_processes, daemon=True).start()
+        self._poll_job = self.after(50, self._poll)
+
+    def _load_processes(self, batch_size=64):
+        """プロセスを列挙し、一定数ごとにキューへ送る (ワーカースレッド)"""
+        batch = []
         try:
-            for p in psutil.process_iter(['name']):
-                try:
-                    if p.info['name']:
-                        procs.add(p.info['name'])
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
+            for p in psutil.process_iter(['name', 'memory_info']):
+                if self._cancelled.is_set():
+                    return
+                name = p.info.get('name')
+                if not name:
+                    continue
+                memory_info = p.info.get('memory_info')
+                batch.append((name, memory_info.rss if memory_info else None))
+                if len(batch) >= batch_size:
+                    self._queue.put(batch)
+                    batch = []
         except Exception:
             pass
-        
-        for name in sorted(procs, key=str.lower):
-            self.listbox.insert(tk.END, name)
+        self._queue.put(batch)
+        self._queue.put(None) # 列挙の完了
+
+    def _poll(self):
+        """キューに届いたプロセスを集計に取り込み、一覧を更新する"""
+        self._poll_job = None
+        try:
+            while True:
+                batch = self._queue.get_nowait()
+                if batch is None:
+                    self._loading = False
+                    break
+                for name, rss in batch:
+                    self.catalog.add(name, rss)
+                self._dirty = True
+        except queue.Empty:
+            pass
+        if self._dirty:
+            self._dirty = False
+            self._render()
+        if self._loading:
+            self._poll_job = self.after(100, self._poll)
+
+    def _set_sort(self, key):
+        self.sort_key = self.SORT_KEYS[key]
+        self._render()
+
+    def _render(self):
+        """絞り込みと並べ替えを適用して一覧を描き直す (選択状態は維持する)"""
+        selected = set(self.tree.selection())
+        rows = self.catalog.rows(self.filter_var.get().strip(), self.sort_key)
+        self.tree.delete(*self.tree.get_children())
+        for name, count, rss in rows:
+            tags = ("excluded",) if name in self.excluded else ()
+            self.tree.insert("", tk.END, iid=name, text=name, values=(count, f"{rss / (1024 * 1024):.1f}"), tags=tags)
+        keep = [name for name in selected if self.tree.exists(name)]
+        if keep:
+            self.tree.selection_set(keep)
+        state = "読み込み中... " if self._loading else ""
+        self.status_label.config(text=f"{state}{len(rows)} / {len(self.catalog)} 件")
 
     def _on_add(self):
-        selection = self.listbox.curselection()
-        names = [self.listbox.get(i) for i in selection]
+        names = list(self.tree.selection())
         if names:
             self.callback(names)
         self.destroy()
+
+    def destroy(self):
+        # 列挙スレッドと定期取り込みを止める
+        self._cancelled.set()
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+            self._poll_job = None
+        super().destroy()
     
     
 class LogViewerWindow(tk.Toplevel):
@@ -0,0 +1,262 @@
+"""
+二重起動の防止と、常駐中のインスタンスへのコマンド転送
+
+ローカルホストの TCP ポートを待ち受けることをロックとして扱う。
+2つ目の起動は Tk や psutil を読み込む前にコマンドを転送して終了するため、
+このモジュールは標準ライブラリだけに依存する。
+通信は改行区切りの JSON で、1つの接続で複数のメッセージをやり取りできる。
+"""
+import os
+import hmac
+import json
+import socket
+import logging
+import threading
+
+DEFAULT_PORT = 47651
+APP_ID = "memory_cleaner"
+
+# 転送できる起動引数
+FORWARDED_ARGS = ("--free", "--show", "--minimized")
+
+
+def read_port(config_file):
+    """
+    設定ファイルから待ち受けポートを読み込む (アプリ本体を読み込む前に呼び出すため直接読む)
+    """
+    try:
+        with open(config_file, "r") as f:
+            return int(json.load(f).get("ipc_port", DEFAULT_PORT))
+    except (OSError, ValueError, TypeError, AttributeError):
+        return DEFAULT_PORT
+
+
+def send_message(message, port=DEFAULT_PORT, timeout=2.0):
+    """
+    常駐中のインスタンスにメッセージを1つ送り、応答を返す
+    Returns:
+        dict or None: 応答。常駐中のインスタンスがない場合は None
+    """
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=timeout) as sock:
+            sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        response = json.loads(line) if line else None
+    except (OSError, ValueError):
+        return None
+    # 別のアプリケーションが同じポートを使っている場合は無視する
+    if not isinstance(response, dict) or response.get("app") != APP_ID:
+        return None
+    return response
+
+
+def forward_args(args, port=DEFAULT_PORT):
+    """
+    起動引数を常駐中のインスタンスに転送する
+    Returns:
+        bool: 転送できた場合 True (呼び出し元はそのまま終了する)
+    """
+    forwarded = [arg for arg in args if arg in FORWARDED_ARGS]
+    response = send_message({"cmd": "args", "args": forwarded}, port)
+    return response is not None and response.get("ok", False)
+
+
+class Connection:
+    """
+    待ち受けサーバーへの1つの接続
+    ハンドラに渡され、接続を維持するクライアントへの通知 (サーバーからの送信) に使う
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        """
+        メッセージを送信する (任意のスレッドから呼び出し可能)
+        Returns:
+            bool: 送信できた場合 True
+        """
+        data = json.dumps(message).encode("utf-8") + b"\n"
+        with self._lock:
+            if self.closed:
+                return False
+            try:
+                self.sock.sendall(data)
+                return True
+            except OSError:
+                self.closed = True
+                return False
+
+
+class InstanceServer:
+    """
+    常駐インスタンス側の待ち受けサーバー
+    コマンド名ごとにハンドラを登録し、受信したメッセージを振り分ける
+    二重起動の防止に使うほか、フリート管理用の制御・メトリクスの待ち受けにも使う
+    """
+    def __init__(self, port=DEFAULT_PORT, max_connections=64, host="127.0.0.1", token=None,
+                 auth_timeout=10.0, idle_timeout=None):
+        """
+        Args:
+            port (int): 待ち受けるポート
+            max_connections (int): 同時に処理する接続数の上限 (接続を維持する協調解放のクライアントを含む)
+            host (str): 待ち受けるアドレス (既定はローカルホストのみ)
+            token (str): 指定した場合、"token" が一致しないメッセージを拒否して接続を切る
+                (トークンは平文で送られるため、信頼できるネットワークか SSH/VPN のトンネル越しでのみ使う)
+            auth_timeout (float): トークンを指定した場合に、最初のメッセージを待つ時間 (秒)
+            idle_timeout (float): メッセージを受信しないまま接続を維持する時間 (秒、None は無制限)
+        """
+        self.port = port
+        self.host = host
+        self.token = token or None
+        self.auth_timeout = auth_timeout
+        self.idle_timeout = idle_timeout
+        self.logger = logging.getLogger("MemoryCleaner")
+        self.handlers = {} # コマンド名 -> ハンドラ (message, connection) -> 応答の辞書
+        self._pending = {} # ハンドラの登録を待っているコマンド名 -> 保留中のメッセージ
+        self._handlers_lock = threading.Lock()
+        self._sock = None
+        self._started = False
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._closed = False
+
+    def acquire(self):
+        """
+        ポートを確保してロックを取得する
+        Returns:
+            bool: 取得できた場合 True (既に別のプロセスが使用中なら False)
+        """
+        try:
+            # "::1" などの IPv6 アドレスでも待ち受けられるよう、アドレスからソケットの種類を決める
+            family, _, _, _, address = socket.getaddrinfo(
+                self.host, self.port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE)[0]
+        except OSError:
+            return False
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            if os.name == 'nt':
+                # 他のプロセスが同じポートを横取りできないようにする
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+            else:
+                # TIME_WAIT の接続が残っていても再起動できるようにする (待ち受け中のポートは確保できない)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(address)
+            sock.listen(8)
+        except OSError:
+            sock.close()
+            return False
+        self._sock = sock
+        self.port = sock.getsockname()[1] # 0 を指定した場合は割り当てられたポート
+        return True
+
+    def register(self, cmd, handler):
+        """
+        コマンドのハンドラを登録する (ハンドラは待ち受けスレッドから呼び出される)
+        defer で保留していたメッセージは、登録したスレッドでこのハンドラに渡す (connection は None)
+        """
+        with self._handlers_lock:
+            self.handlers[cmd] = handler
+            pending = self._pending.pop(cmd, [])
+        for message in pending:
+            try:
+                handler(message, None)
+            except Exception as e:
+                self.logger.info(f"IPC: queued {cmd} failed: {e}")
+
+    def defer(self, cmd):
+        """
+        ハンドラを登録するまでに受信したコマンドを保留する
+        (ロックの取得直後に待ち受けを始め、アプリの初期化中に転送された起動引数を取りこぼさない)
+        """
+        with self._handlers_lock:
+            if cmd not in self.handlers:
+                self._pending.setdefault(cmd, [])
+
+    def start(self):
+        """待ち受けスレッドを開始する (開始済みの場合は何もしない)"""
+        if self._sock is not None and not self._started:
+            self._started = True
+            threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def close(self):
+        """待ち受けを終了してロックを解放する"""
+        self._closed = True
+        if self._sock is not None:
+            try:
+                # accept で待機中のスレッドを起こす (close だけでは待ち受けが続く場合がある)
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            if not self._slots.acquire(blocking=False):
+                conn.close()
+                continue
+            try:
+                # 応答は1行ずつ小さいため、Nagle アルゴリズムで遅延させない
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                pass
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        """
+        1つの接続で受信したメッセージを順に処理する
+        トークンを指定した場合は、auth_timeout 秒以内に認証されたメッセージが届かない接続と、
+        認証に失敗した接続を切る (タイムアウトは OSError として扱う)
+        """
+        connection = Connection(conn)
+        try:
+            with conn, conn.makefile("rb") as reader:
+                conn.settimeout(self.auth_timeout if self.token is not None else self.idle_timeout)
+                for line in reader:
+                    if not line.strip():
+                        continue
+                    response, authorized = self._dispatch(line, connection)
+                    response["app"] = APP_ID
+                    if not connection.send(response) or not authorized:
+                        break
+                    conn.settimeout(self.idle_timeout)
+        except OSError:
+            pass
+        finally:
+            connection.closed = True
+            self._slots.release()
+
+    def _dispatch(self, line, connection):
+        """
+        Returns:
+            tuple: (応答, 認証できたか)。認証できなかった場合、呼び出し元は応答を送って接続を切る
+        """
+        try:
+            message = json.loads(line)
+            cmd = message.get("cmd")
+        except (ValueError, AttributeError):
+            return {"ok": False, "error": "invalid message"}, self.token is None
+        if self.token is not None and not hmac.compare_digest(str(message.get("token", "")), self.token):
+            return {"ok": False, "error": "unauthorized"}, False
+        with self._handlers_lock:
+            handler = self.handlers.get(cmd)
+            if handler is None and cmd in self._pending:
+                self._pending[cmd].append(message)
+                return {"ok": True, "queued": True}, True
+        if handler is None:
+            return {"ok": False, "error": f"unknown command: {message.get('cmd')}"}, True
+        try:
+            response = handler(message, connection)
+            return {"ok": True, **(response or {})}, True
+        except Exception as e:
+            self.logger.info(f"IPC: {message.get('cmd')} failed: {e}")
+            return {"ok": False, "error": str(e)}, True
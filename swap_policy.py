@@ -0,0 +1,154 @@
+import os
+import time
+import threading
+import psutil
+
+# 解放方法の選択
+MODE_NORMAL = "normal" # ワーキングセットの解放を含めて通常どおり解放する
+MODE_CACHE_ONLY = "cache_only" # ファイルキャッシュ (スタンバイリスト) のみ解放し、匿名ページを書き出さない
+MODE_ABORT = "abort" # 今回の解放を見送る
+
+
+class SwapState:
+    """スワップ (ページファイル) の使用状況"""
+    __slots__ = ("total", "used", "percent", "in_rate", "out_rate")
+
+    def __init__(self, total, used, percent, in_rate, out_rate):
+        self.total = total
+        self.used = used
+        self.percent = percent
+        self.in_rate = in_rate # スワップインの速度 (バイト/秒、取得できない場合は None)
+        self.out_rate = out_rate # スワップアウトの速度 (バイト/秒、取得できない場合は None)
+
+    def describe(self):
+        """ログ用の説明を返す"""
+        text = f"swap {self.percent:.1f}% of {self.total / (1024 * 1024):.0f} MB used"
+        if self.in_rate is not None:
+            text += f", in {self.in_rate / (1024 * 1024):.2f} MB/s, out {self.out_rate / (1024 * 1024):.2f} MB/s"
+        return text
+
+
+def read_vmstat_swap(path="/proc/vmstat"):
+    """
+    /proc/vmstat のスワップイン・アウトの累計ページ数を返す
+    Returns:
+        tuple or None: (pswpin, pswpout)。取得できない場合は None
+    """
+    pswpin = pswpout = None
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith("pswpin "):
+                    pswpin = int(line.split()[1])
+                elif line.startswith("pswpout "):
+                    pswpout = int(line.split()[1])
+    except (OSError, ValueError):
+        return None
+    if pswpin is None or pswpout is None:
+        return None
+    return (pswpin, pswpout)
+
+
+class SwapMonitor:
+    """
+    スワップの使用率とスワップイン・アウトの速度を取得するクラス
+    速度は前回の取得からの差分で求めるため、サンプラーの通知先に登録して使用率と同じ間隔で更新する
+    (Windows ではページファイルの入出力の累計を取得できないため、使用率のみで判定する)
+    """
+    def __init__(self, vmstat_path="/proc/vmstat", min_interval=0.5):
+        """
+        Args:
+            vmstat_path (str): /proc/vmstat のパス (Linux)
+            min_interval (float): 速度を計算し直す最短の間隔 (秒、これより短い間隔では前回の速度を使う)
+        """
+        self.vmstat_path = vmstat_path
+        self.min_interval = min_interval
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self.state = None # 直近の SwapState
+        self._last = None # (時刻, pswpin, pswpout)
+        self._lock = threading.Lock() # サンプラー (UIスレッド) と解放処理のスレッドの排他
+
+    def add_sample(self, sample=None):
+        """サンプラーの通知先として登録する"""
+        self.read()
+
+    def read(self):
+        """
+        スワップの使用状況を取得する
+        Returns:
+            SwapState: 使用状況 (スワップが存在しない場合は total 0)
+        """
+        swap = psutil.swap_memory()
+        counters = read_vmstat_swap(self.vmstat_path) if os.name != 'nt' else None
+        now = time.monotonic()
+        with self._lock:
+            in_rate = out_rate = None
+            if self.state is not None:
+                in_rate, out_rate = self.state.in_rate, self.state.out_rate
+            if counters is not None:
+                if self._last is None:
+                    self._last = (now, *counters)
+                elif now - self._last[0] >= self.min_interval:
+                    elapsed = now - self._last[0]
+                    in_rate = max(0, counters[0] - self._last[1]) * self.page_size / elapsed
+                    out_rate = max(0, counters[1] - self._last[2]) * self.page_size / elapsed
+                    self._last = (now, *counters)
+            self.state = SwapState(swap.total, swap.used, swap.percent, in_rate, out_rate)
+            return self.state
+
+
+class SwapPolicy:
+    """
+    スワップの逼迫度から解放方法を選ぶクラス
+    スワップが満杯に近い、またはスワップの入出力が多い状態でワーキングセットを空にすると、
+    匿名ページがディスクに書き出され、すぐに読み戻されてシステム全体が遅くなる
+    """
+    def __init__(self, cache_only_percent=80, abort_percent=95, cache_only_mb_s=8, abort_mb_s=64):
+        """
+        Args:
+            cache_only_percent (float): キャッシュのみ解放に切り替えるスワップ使用率 (%)
+            abort_percent (float): 解放を見送るスワップ使用率 (%)
+            cache_only_mb_s (float): キャッシュのみ解放に切り替えるスワップの入出力の合計 (MB/秒)
+            abort_mb_s (float): 解放を見送るスワップの入出力の合計 (MB/秒)
+        """
+        self.cache_only_percent = cache_only_percent
+        self.abort_percent = abort_percent
+        self.cache_only_mb_s = cache_only_mb_s
+        self.abort_mb_s = abort_mb_s
+
+    def decide(self, state, trigger="manual"):
+        """
+        解放方法を選ぶ
+        Args:
+            state (SwapState): スワップの使用状況
+            trigger (str): 実行の契機 (手動の解放は見送らず、キャッシュのみの解放にとどめる)
+        Returns:
+            tuple: (MODE_NORMAL / MODE_CACHE_ONLY / MODE_ABORT, 理由)
+        """
+        if state is None or state.total <= 0:
+            # スワップがなければ匿名ページは書き出されない
+            return MODE_NORMAL, "no swap"
+        rate_mb = None
+        if state.in_rate is not None:
+            rate_mb = (state.in_rate + state.out_rate) / (1024 * 1024)
+
+        mode = MODE_NORMAL
+        reasons = []
+        if state.percent >= self.abort_percent:
+            mode = MODE_ABORT
+            reasons.append(f"swap usage {state.percent:.1f}% >= {self.abort_percent}%")
+        elif state.percent >= self.cache_only_percent:
+            mode = MODE_CACHE_ONLY
+            reasons.append(f"swap usage {state.percent:.1f}% >= {self.cache_only_percent}%")
+        if rate_mb is not None:
+            if rate_mb >= self.abort_mb_s:
+                mode = MODE_ABORT
+                reasons.append(f"swap I/O {rate_mb:.2f} MB/s >= {self.abort_mb_s} MB/s")
+            elif rate_mb >= self.cache_only_mb_s:
+                if mode == MODE_NORMAL:
+                    mode = MODE_CACHE_ONLY
+                reasons.append(f"swap I/O {rate_mb:.2f} MB/s >= {self.cache_only_mb_s} MB/s")
+        if mode == MODE_ABORT and trigger == "manual":
+            mode = MODE_CACHE_ONLY
+            reasons.append("manual run downgraded to cache only")
+        return mode, "; ".join(reasons) or state.describe()
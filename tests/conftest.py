@@ -0,0 +1,9 @@
+import os
+import sys
+import logging
+
+# リポジトリ直下のモジュールを import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# MemoryCleanerLogic はハンドラがない場合にリポジトリ直下へログファイルを作るため、テストでは出力しない
+logging.getLogger("MemoryCleaner").addHandler(logging.NullHandler())
@@ -0,0 +1,66 @@
+import json
+import os
+
+from app_config import AppConfig
+
+
+def test_values_are_validated_and_saved_atomically(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"warning_threshold": 150, "topmost": True, "future_option": 1}))
+    config = AppConfig(str(path))
+    assert config.load()
+    assert config["warning_threshold"] == 80 # 範囲外は既定値
+    assert config["topmost"] is True
+    config.set("warning_threshold", "85")
+    assert config.flush()
+    saved = json.loads(path.read_text())
+    assert saved["warning_threshold"] == 85 and saved["future_option"] == 1
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_corrupt_file_is_kept_aside_before_saving(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{"warning_threshold": 85,')
+    config = AppConfig(str(path))
+    assert not config.load()
+    assert config["warning_threshold"] == 80
+    assert config.flush()
+    assert (tmp_path / "config.json.corrupt").read_text() == '{"warning_threshold": 85,'
+    assert json.loads(path.read_text())["warning_threshold"] == 80
+
+
+def test_unreadable_file_is_never_overwritten(tmp_path):
+    path = tmp_path / "config.json"
+    path.mkdir() # 読み込みで OSError になる
+    config = AppConfig(str(path))
+    assert not config.load()
+    config.set("warning_threshold", 85)
+    assert not config.flush()
+    assert path.is_dir()
+
+
+def test_missing_file_is_created_with_defaults(tmp_path):
+    path = tmp_path / "config.json"
+    config = AppConfig(str(path))
+    assert config.load()
+    assert json.loads(path.read_text())["warning_threshold"] == 80
+
+
+def test_missing_file_in_missing_directory_is_reported(tmp_path):
+    config = AppConfig(str(tmp_path / "missing" / "config.json"))
+    assert not config.load()
+    assert config["warning_threshold"] == 80
+
+
+def test_subscribers_receive_their_own_copy_of_lists(tmp_path):
+    config = AppConfig(str(tmp_path / "config.json"))
+    received = []
+
+    def mutate(changed):
+        changed["exclusion_list"].append("mutated")
+
+    config.subscribe(("exclusion_list",), mutate)
+    config.subscribe(("exclusion_list",), lambda changed: received.append(changed["exclusion_list"]))
+    config.update({"exclusion_list": ["game.exe"]}, persist=False)
+    assert config["exclusion_list"] == ["game.exe"]
+    assert received == [["game.exe"]]
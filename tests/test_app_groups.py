@@ -0,0 +1,74 @@
+import os
+import pytest
+
+pytest.importorskip("psutil")
+
+from app_groups import AppGrouper, read_app_scope
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason="uses a fake procfs")
+
+APP_SLICE = "/user.slice/user-1000.slice/user@1000.service/app.slice"
+
+
+def make_proc(root, pid, exe, scope=None):
+    path = root / str(pid)
+    path.mkdir()
+    os.symlink(exe, path / "exe")
+    cgroup = f"{APP_SLICE}/{scope}" if scope else "/user.slice/user-1000.slice/session-2.scope"
+    (path / "cgroup").write_text(f"0::{cgroup}\n")
+
+
+def group_names(grouper, pids):
+    return [grouper.group_name(pid) for pid in pids]
+
+
+def test_reads_app_scopes_only(tmp_path):
+    make_proc(tmp_path, 10, "/opt/app/app", "app-firefox-10.scope")
+    make_proc(tmp_path, 11, "/usr/bin/bash")
+    assert read_app_scope(10, str(tmp_path)) == f"{APP_SLICE}/app-firefox-10.scope"
+    assert read_app_scope(11, str(tmp_path)) is None
+    assert read_app_scope(12, str(tmp_path)) is None
+
+
+def test_helpers_join_their_parent_by_install_dir(tmp_path):
+    make_proc(tmp_path, 100, "/opt/google/chrome/chrome")
+    make_proc(tmp_path, 101, "/opt/google/chrome/chrome")
+    make_proc(tmp_path, 102, "/opt/google/chrome/nacl_helper")
+    make_proc(tmp_path, 103, "/usr/bin/python3")
+    grouper = AppGrouper(str(tmp_path))
+    processes = [(100, "chrome", 300), (101, "chrome", 200), (102, "nacl_helper", 50), (103, "python3", 10)]
+    grouper.update(processes, {100: 1, 101: 100, 102: 100, 103: 100})
+    assert group_names(grouper, [100, 101, 102, 103]) == ["chrome", "chrome", "chrome", "python3"]
+    [group] = grouper.multi_process_groups()
+    assert group.rss == 550 and group.source == "tree"
+
+
+def test_app_scope_groups_reparented_processes(tmp_path):
+    make_proc(tmp_path, 200, "/usr/lib/firefox/firefox", "app-firefox-200.scope")
+    make_proc(tmp_path, 201, "/usr/bin/crashhelper", "app-firefox-200.scope")
+    grouper = AppGrouper(str(tmp_path))
+    grouper.update([(200, "firefox", 500), (201, "crashhelper", 5)], {200: 1, 201: 1})
+    assert group_names(grouper, [200, 201]) == ["firefox", "firefox"]
+    assert grouper.group_of(201).source == "cgroup"
+
+
+def test_terminal_scope_falls_back_to_per_process_groups(tmp_path):
+    scope = "app-org.gnome.Terminal-300.scope"
+    make_proc(tmp_path, 300, "/usr/libexec/gnome-terminal-server", scope)
+    make_proc(tmp_path, 301, "/usr/bin/bash", scope)
+    make_proc(tmp_path, 302, "/home/user/.cargo/bin/cargo", scope)
+    make_proc(tmp_path, 303, "/usr/bin/vim", scope)
+    grouper = AppGrouper(str(tmp_path))
+    processes = [(300, "gnome-terminal-server", 40), (301, "bash", 5), (302, "cargo", 900), (303, "vim", 20)]
+    grouper.update(processes, {300: 1, 301: 300, 302: 301, 303: 301})
+    assert group_names(grouper, [302, 303]) == ["cargo", "vim"]
+    assert grouper.group_of(302) is not grouper.group_of(303)
+    assert all(group.source == "tree" for group in grouper.groups.values())
+
+
+def test_disabled_grouper_keeps_no_groups(tmp_path):
+    make_proc(tmp_path, 400, "/opt/app/app")
+    grouper = AppGrouper(str(tmp_path))
+    grouper.enabled = False
+    grouper.update([(400, "app", 1)], {400: 1})
+    assert len(grouper) == 0 and grouper.group_name(400, "app") == "app"
@@ -0,0 +1,64 @@
+from cgroup_reclaimer import CgroupReclaimer
+
+MB = 1024 * 1024
+
+
+def make_cgroup(root, name, current, maximum="max", stat=None, reclaim=True):
+    path = root / name
+    path.mkdir(parents=True)
+    (path / "memory.current").write_text(f"{current}\n")
+    (path / "memory.max").write_text(f"{maximum}\n")
+    if stat is not None:
+        (path / "memory.stat").write_text("".join(f"{key} {value}\n" for key, value in stat.items()))
+    if reclaim:
+        (path / "memory.reclaim").write_text("")
+    return path
+
+
+def test_reads_current_and_stat(tmp_path):
+    make_cgroup(tmp_path, "user.slice", 512 * MB, stat={"inactive_file": 64 * MB, "anon": 300 * MB})
+    reclaimer = CgroupReclaimer(str(tmp_path))
+    assert reclaimer.is_available("user.slice")
+    assert reclaimer.read_current("user.slice") == 512 * MB
+    assert reclaimer.read_stat("user.slice") == {"inactive_file": 64 * MB, "anon": 300 * MB}
+    assert reclaimer.read_pressure("user.slice") == {}
+
+
+def test_policy_below_threshold_is_skipped(tmp_path):
+    make_cgroup(tmp_path, "user.slice", 512 * MB, stat={})
+    reclaimer = CgroupReclaimer(str(tmp_path))
+    result = reclaimer.evaluate({"cgroup": "user.slice", "threshold_gb": 1, "reclaim_percent": 20})
+    assert result["skipped"]
+    assert (tmp_path / "user.slice" / "memory.reclaim").read_text() == ""
+
+
+def test_policy_over_threshold_writes_reclaim_amount(tmp_path):
+    make_cgroup(tmp_path, "user.slice", 2048 * MB, stat={})
+    reclaimer = CgroupReclaimer(str(tmp_path))
+    result = reclaimer.evaluate({"cgroup": "user.slice", "threshold_gb": 1, "reclaim_percent": 25})
+    assert not result["skipped"]
+    assert result["requested"] == 512 * MB
+    assert (tmp_path / "user.slice" / "memory.reclaim").read_text() == str(512 * MB)
+
+    result = reclaimer.evaluate({"cgroup": "user.slice", "threshold_gb": 1, "reclaim_mb": 100})
+    assert result["requested"] == 100 * MB
+
+
+def test_missing_stat_does_not_abort_remaining_policies(tmp_path):
+    make_cgroup(tmp_path, "a.slice", 2048 * MB) # memory.stat なし
+    make_cgroup(tmp_path, "b.slice", 2048 * MB, stat={"inactive_file": 0})
+    reclaimer = CgroupReclaimer(str(tmp_path))
+    reclaimer.set_policies([
+        {"cgroup": "a.slice", "threshold_gb": 1, "reclaim_mb": 10},
+        {"cgroup": "gone.slice", "threshold_gb": 1, "reclaim_mb": 10},
+        {"cgroup": "b.slice", "threshold_gb": 1, "reclaim_mb": 10},
+    ])
+    results = reclaimer.run_policies()
+    assert [r["cgroup"] for r in results] == ["a.slice", "b.slice"]
+    assert (tmp_path / "b.slice" / "memory.reclaim").read_text() == str(10 * MB)
+
+
+def test_invalid_policies_are_ignored(tmp_path):
+    reclaimer = CgroupReclaimer(str(tmp_path))
+    reclaimer.set_policies([{"threshold_gb": 1}, "user.slice", {"cgroup": "user.slice"}])
+    assert reclaimer.policies == [{"cgroup": "user.slice"}]
@@ -0,0 +1,144 @@
+import time
+import socket
+import pytest
+
+from single_instance import InstanceServer
+from fleet_agent import FleetAgent, validate_policy
+from fleet_aggregator import FleetAggregator, FleetHost
+
+
+class FakeSample:
+    def __init__(self, percent):
+        self.timestamp = 1700000000.0
+        self.percent = percent
+        self.used = 1024
+        self.total = 4096
+        self.source = "host"
+
+
+class FakeSampler:
+    def __init__(self, percent):
+        self.sample = FakeSample(percent)
+
+    def latest(self):
+        return self.sample
+
+
+class FakeHistory:
+    def run_stats(self, since):
+        return {"runs": 2, "total_mb": 300.0, "average_mb": 150.0}
+
+    def __init__(self):
+        self.minute = int(time.time() // 60) * 60
+
+    def query_samples(self, since, resolution="minute"):
+        return [(self.minute, 40.0, 35.0, 45.0)]
+
+    def query_runs(self, since, limit=None):
+        return [(1, self.minute + 10.0, "auto", 150.0)]
+
+
+class FakeKsm:
+    enabled = False
+
+
+class FakeLogic:
+    last_report = None
+    ksm = FakeKsm()
+
+
+class Instance:
+    """エフェメラルポートで待ち受ける1つのインスタンス"""
+    def __init__(self, name, percent, token=None, auth_timeout=10.0):
+        self.name = name
+        self.freed = 0
+        self.policies = []
+        self.server = InstanceServer(0, token=token, auth_timeout=auth_timeout)
+        assert self.server.acquire()
+        FleetAgent("test", FakeSampler(percent), FakeHistory(), FakeLogic(),
+                   self._free, self.policies.append).attach(self.server)
+        self.server.start()
+
+    def _free(self):
+        self.freed += 1
+        return True
+
+    def host(self, token=None, groups=("build",)):
+        return FleetHost({"name": self.name, "host": "127.0.0.1", "port": self.server.port,
+                          "token": token, "groups": list(groups)})
+
+
+@pytest.fixture
+def fleet():
+    instances = [Instance("a", 40.0, token="secret"), Instance("b", 60.0, token="secret"), Instance("c", 80.0)]
+    hosts = [instances[0].host("secret"), instances[1].host("secret"), instances[2].host(groups=("office",))]
+    aggregator = FleetAggregator(hosts, timeout=2.0)
+    yield instances, aggregator
+    aggregator.close()
+    for instance in instances:
+        instance.server.close()
+
+
+def test_poll_collects_status_from_every_instance(fleet):
+    instances, aggregator = fleet
+    assert aggregator.poll() == {"a": None, "b": None, "c": None}
+    rows = {row["name"]: row for row in aggregator.summary()}
+    assert [rows[name]["percent"] for name in "abc"] == [40.0, 60.0, 80.0]
+    assert all(row["reachable"] and row["runs_24h"] == 2 for row in rows.values())
+    assert aggregator.fleet_view()[-1][1:] == (3, 40.0, 45.0, 3, 450.0)
+
+
+def test_free_and_policy_reach_only_the_group(fleet):
+    instances, aggregator = fleet
+    results = aggregator.free("build")
+    assert set(results) == {"a", "b"} and all(r["started"] for r in results.values())
+    assert [i.freed for i in instances] == [1, 1, 0]
+    results = aggregator.set_policy({"warning_threshold": 85, "auto_free": True}, "build")
+    assert all(r["applied"] == {"warning_threshold": 85, "auto_free": True} for r in results.values())
+    assert instances[0].policies == [{"warning_threshold": 85, "auto_free": True}]
+
+
+def test_bad_policy_is_rejected_without_applying(fleet):
+    instances, aggregator = fleet
+    results = aggregator.set_policy({"warning_threshold": 85.5}, "build")
+    assert all(not r["ok"] and "integer" in r["error"] for r in results.values())
+    assert instances[0].policies == []
+
+
+def test_wrong_token_is_rejected_and_disconnected(fleet):
+    instances, aggregator = fleet
+    intruder = FleetAggregator([instances[0].host("wrong")], timeout=2.0)
+    try:
+        errors = intruder.poll()
+        assert errors == {"a": "unauthorized"}
+        assert instances[0].freed == 0
+    finally:
+        intruder.close()
+
+
+def test_silent_connection_is_dropped_after_auth_timeout():
+    instance = Instance("a", 40.0, token="secret", auth_timeout=0.2)
+    try:
+        with socket.create_connection(("127.0.0.1", instance.server.port), timeout=2.0) as sock:
+            assert sock.recv(1) == b""
+    finally:
+        instance.server.close()
+
+
+@pytest.mark.parametrize("settings", [
+    {"warning_threshold": True},
+    {"auto_free_interval": 1.5},
+    {"forecast_horizon_sec": float("inf")},
+    {"forecast_horizon_sec": float("nan")},
+    {"warning_threshold": "80"},
+    {"auto_free": 1},
+    {"unknown": 1},
+])
+def test_validate_policy_rejects_bad_values(settings):
+    with pytest.raises(ValueError):
+        validate_policy(settings)
+
+
+def test_validate_policy_accepts_integral_floats():
+    assert validate_policy({"warning_threshold": 85.0, "forecast_horizon_sec": 60}) == {
+        "warning_threshold": 85, "forecast_horizon_sec": 60.0}
@@ -0,0 +1,184 @@
+import math
+import logging
+import threading
+
+import pytest
+
+from forecaster import UsageForecaster
+
+
+def feed(forecaster, start, end, percent=lambda t: 50.0):
+    for t in range(start, end):
+        forecaster.update(float(t), percent(t))
+
+
+def test_forecasts_are_scored_after_the_horizon():
+    forecaster = UsageForecaster(horizon_sec=10)
+    feed(forecaster, 0, 30)
+    stats = forecaster.stats()
+    assert stats["count"] > 0 and stats["affected"] == 0
+    assert stats["mae"] == 0
+
+
+def test_run_keeps_pending_forecasts_and_scores_them_separately():
+    forecaster = UsageForecaster(horizon_sec=10)
+    feed(forecaster, 0, 5, lambda t: 60.0 + t)
+    forecaster.on_run()
+    # 解放で使用率が下がった後も、検証待ちだった予測は捨てずに別に集計する
+    feed(forecaster, 5, 30, lambda t: 40.0)
+    stats = forecaster.stats()
+    assert stats["affected"] == 5
+    assert stats["affected_bias"] < 0
+    assert stats["count"] > 0
+
+
+def test_time_to_threshold_undamped_linear_ramp():
+    forecaster = UsageForecaster(phi=1.0, horizon_sec=400)
+    feed(forecaster, 0, 300, lambda t: 20.0 + 0.1 * t)
+    # 線形の増加にはトレンドが追従し、閾値までの残り (80 - 49.9) / 0.1 秒を予測する
+    assert forecaster.trend == pytest.approx(0.1, rel=1e-3)
+    assert forecaster.time_to_threshold(80) == pytest.approx(301, abs=1)
+    assert forecaster.forecast(301) == pytest.approx(80, abs=0.1)
+    assert forecaster.will_cross(80)
+    assert not forecaster.will_cross(80, horizon_sec=120)
+
+
+def test_time_to_threshold_damped():
+    forecaster = UsageForecaster(phi=0.99)
+    forecaster.level = 50.0
+    forecaster.trend = 0.5
+    # 0.5 * (1 - 0.99^t) / 0.01 = 30
+    eta = forecaster.time_to_threshold(80)
+    assert eta == pytest.approx(math.log(0.4) / math.log(0.99))
+    assert forecaster.forecast(eta) == pytest.approx(80)
+    # 減衰したトレンドの累積 (0.2 / 0.01 = 20 ポイント) では届かない
+    forecaster.trend = 0.2
+    assert forecaster.time_to_threshold(80) is None
+
+
+def test_time_to_threshold_edge_cases():
+    forecaster = UsageForecaster()
+    assert forecaster.time_to_threshold(80) is None
+    forecaster.level = 85.0
+    assert forecaster.time_to_threshold(80) == 0.0
+    forecaster.level = 50.0
+    forecaster.trend = -0.1
+    assert forecaster.time_to_threshold(80) is None
+
+
+def test_will_cross_requires_min_samples():
+    forecaster = UsageForecaster(horizon_sec=120, min_samples=3)
+    feed(forecaster, 0, 2, lambda t: 70.0 + 5 * t)
+    assert forecaster.time_to_threshold(80) is not None
+    assert not forecaster.will_cross(80)
+    feed(forecaster, 2, 3, lambda t: 70.0 + 5 * t)
+    assert forecaster.will_cross(80)
+
+
+class FakeConfig(dict):
+    def subscribe(self, keys, callback):
+        pass
+
+
+class FakeSample:
+    def __init__(self, percent, total=16 * 1024 * 1024 * 1024):
+        self.percent = percent
+        self.total = total
+
+
+class FakeLogic:
+    def __init__(self):
+        self.logger = logging.getLogger("MemoryCleaner")
+        self.calls = []
+
+    def execute(self, **kwargs):
+        self.calls.append(kwargs)
+        return 100.0
+
+
+class FakeRoot:
+    def __init__(self):
+        self.done = threading.Event()
+
+    def after(self, delay, callback):
+        callback()
+        self.done.set()
+
+
+class FakeApp:
+    def __init__(self, forecaster):
+        self.config = FakeConfig(predictive_free=True)
+        self.forecaster = forecaster
+        self.cleaner_logic = FakeLogic()
+        self.root = FakeRoot()
+        self.is_freeing = False
+        self.flashed = 0
+
+    def flash_window(self):
+        self.flashed += 1
+
+    def run_pending_launch(self):
+        pass
+
+    def refresh_memory_info(self):
+        pass
+
+
+def make_scheduler(ramp=lambda t: 50.0 + 0.2 * t):
+    pytest.importorskip("psutil")
+    from auto_free_scheduler import AutoFreeScheduler
+    forecaster = UsageForecaster(horizon_sec=120)
+    feed(forecaster, 0, 100, ramp)
+    app = FakeApp(forecaster)
+    return AutoFreeScheduler(app), app
+
+
+def run_check(scheduler, app, percent, warning=80):
+    app.root.done.clear()
+    scheduler.check_forecast(FakeSample(percent), warning)
+    if app.is_freeing:
+        assert app.root.done.wait(2.0)
+
+
+def test_check_forecast_frees_with_budget_for_the_forecast():
+    scheduler, app = make_scheduler()
+    # 69.8% から 0.2 ポイント/秒で増え、120 秒以内に 80% に達する
+    run_check(scheduler, app, 69.8)
+    assert len(app.cleaner_logic.calls) == 1
+    call = app.cleaner_logic.calls[0]
+    expected = (app.forecaster.forecast() - (80 - scheduler.predictive_margin)) / 100 * 16 * 1024
+    assert call["trigger"] == "predictive"
+    assert call["budget_mb"] == pytest.approx(max(scheduler.predictive_min_budget_mb, expected))
+    assert call["budget_mb"] > scheduler.predictive_min_budget_mb
+    assert app.forecaster.triggers == 1 and app.flashed == 1
+    assert not app.is_freeing
+
+
+def test_check_forecast_respects_cooldown_and_minimum_budget():
+    scheduler, app = make_scheduler()
+    run_check(scheduler, app, 69.8)
+    run_check(scheduler, app, 69.8)
+    # 最短間隔の間は予測による解放をしない
+    assert len(app.cleaner_logic.calls) == 1
+
+    scheduler.predictive_cooldown_sec = 0
+    scheduler.predictive_min_budget_mb = 100000
+    run_check(scheduler, app, 69.8)
+    assert len(app.cleaner_logic.calls) == 2
+    assert app.cleaner_logic.calls[1]["budget_mb"] == 100000
+
+
+def test_check_forecast_skips_when_not_crossing_or_disabled():
+    scheduler, app = make_scheduler(ramp=lambda t: 50.0)
+    run_check(scheduler, app, 50.0)
+    assert app.cleaner_logic.calls == []
+
+    scheduler, app = make_scheduler()
+    # 既に閾値を超えている場合、解放中、無効の場合は予測で解放しない
+    run_check(scheduler, app, 85.0)
+    app.is_freeing = True
+    scheduler.check_forecast(FakeSample(69.8), 80)
+    app.is_freeing = False
+    app.config["predictive_free"] = False
+    run_check(scheduler, app, 69.8)
+    assert app.cleaner_logic.calls == []
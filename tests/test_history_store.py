@@ -0,0 +1,116 @@
+import io
+import csv
+import json
+import time
+
+import pytest
+
+from history_store import HistoryStore
+
+
+class FakeLists:
+    def __init__(self, free, standby, modified):
+        self.free = free
+        self.standby = standby
+        self.modified = modified
+
+
+class FakeSample:
+    def __init__(self, timestamp, percent, used=1024, lists=None):
+        self.timestamp = timestamp
+        self.percent = percent
+        self.used = used
+        self.total = 4096
+        self.source = "host"
+        self.lists = lists
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def write(store, samples=(), runs=()):
+    """書き込みスレッドに反映させてから返す (close は残りのキューを書き込んでから終了する)"""
+    for sample in samples:
+        store.add_sample(sample)
+    for report in runs:
+        store.add_run(report)
+    store.close()
+
+
+def test_minute_and_hour_rollups(store):
+    base = (int(time.time()) // 3600) * 3600
+    write(store, [
+        FakeSample(base + 1, 10.0, used=100),
+        FakeSample(base + 30, 30.0, used=300),
+        FakeSample(base + 61, 50.0, used=500),
+    ])
+    assert store.query_samples(base, base + 3600, "raw") == [
+        (base + 1, 10.0, 10.0, 10.0), (base + 30, 30.0, 30.0, 30.0), (base + 61, 50.0, 50.0, 50.0),
+    ]
+    assert store.query_samples(base, base + 3600, "minute") == [
+        (base, 20.0, 10.0, 30.0), (base + 60, 50.0, 50.0, 50.0),
+    ]
+    assert store.query_samples(base, base + 3600, "hour") == [(base, 30.0, 10.0, 50.0)]
+    row = store._connect().execute("SELECT count, sum_used FROM samples_hour WHERE bucket = ?", (base,)).fetchone()
+    assert row == (3, 900.0)
+
+
+def test_rollup_includes_bucket_containing_since(store):
+    base = (int(time.time()) // 3600) * 3600
+    write(store, [FakeSample(base + 5, 40.0), FakeSample(base + 65, 60.0)])
+    # 開始時刻がバケットの途中でも、そのバケットを返す
+    assert [row[0] for row in store.query_samples(base + 30, base + 120, "minute")] == [base, base + 60]
+    assert [row[0] for row in store.query_samples(base + 1800, base + 3600, "hour")] == [base]
+
+
+def test_retention_drops_expired_rows(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), raw_retention_hours=24, minute_retention_days=7,
+                         retention_days=30, flush_interval=0.01)
+    now = time.time()
+    report = {"timestamp": now - 40 * 86400, "trigger": "auto", "freed_mb": 1.0,
+              "working_set_mb": 1.0, "standby_mb": 0.0, "modified_mb": 0.0}
+    write(store, [
+        FakeSample(now, 10.0),
+        FakeSample(now - 2 * 86400, 20.0),
+        FakeSample(now - 10 * 86400, 30.0),
+        FakeSample(now - 40 * 86400, 40.0),
+    ], [report])
+    assert [row[1] for row in store.query_samples(0, now + 1, "raw")] == [10.0]
+    assert [row[1] for row in store.query_samples(0, now + 1, "minute")] == [20.0, 10.0]
+    assert [row[1] for row in store.query_samples(0, now + 1, "hour")] == [30.0, 20.0, 10.0]
+    assert store.query_runs(0) == []
+
+
+def test_runs_and_outcomes(store):
+    now = time.time()
+    write(store, runs=[
+        {"timestamp": now - 10, "trigger": "manual", "freed_mb": 100.0, "working_set_mb": 80.0,
+         "standby_mb": 20.0, "modified_mb": 0.0, "outcomes": [(10, "a.exe", "trim", True, "")]},
+        {"timestamp": now, "trigger": "auto", "freed_mb": 300.0, "working_set_mb": 300.0,
+         "standby_mb": 0.0, "modified_mb": 0.0, "outcomes": [(20, "b.exe", "limit", False, "denied")]},
+    ])
+    runs = store.query_runs(0)
+    assert [run[2] for run in runs] == ["auto", "manual"]
+    assert store.process_outcomes(runs[0][0]) == [(20, "b.exe", "limit", 0, "denied")]
+    assert store.run_stats(0) == {"runs": 2, "total_mb": 400.0, "average_mb": 200.0, "max_mb": 300.0}
+
+
+def test_export_csv_and_jsonl(store):
+    now = time.time()
+    write(store, [FakeSample(now - 1, 10.0, lists=FakeLists(1, 2, 3)), FakeSample(now, 20.0)])
+    out = io.StringIO()
+    assert store.export("samples", out, "csv", since=now - 1) == 2
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[0] == ["ts", "percent", "used", "total", "source", "free", "standby", "modified"]
+    assert rows[1][5:] == ["1", "2", "3"]
+
+    out = io.StringIO()
+    assert store.export("samples", out, "jsonl", since=now) == 1
+    assert json.loads(out.getvalue())["standby"] is None
+
+    with pytest.raises(ValueError):
+        store.export("sqlite_master", io.StringIO())
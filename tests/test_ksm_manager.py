@@ -0,0 +1,55 @@
+import pytest
+
+from ksm_manager import KsmController
+
+
+def make_ksm(root, **values):
+    defaults = {"run": 0, "pages_to_scan": 100, "sleep_millisecs": 200, "pages_shared": 0, "pages_sharing": 0,
+                "pages_unshared": 0, "pages_volatile": 0, "pages_scanned": 0, "full_scans": 0}
+    defaults.update(values)
+    for name, value in defaults.items():
+        (root / name).write_text(f"{value}\n")
+
+
+def read(root, name):
+    return int((root / name).read_text())
+
+
+def test_adjust_follows_pressure_and_restore_puts_settings_back(tmp_path):
+    make_ksm(tmp_path)
+    ksm = KsmController(str(tmp_path), adjust_interval=0)
+    ksm.set_enabled(True)
+    ksm.adjust(95, 80, now=1.0)
+    assert ksm.level == "high" and read(tmp_path, "pages_to_scan") == 5000 and read(tmp_path, "run") == 1
+    ksm.adjust(10, 80, now=2.0)
+    assert ksm.level == "low"
+    ksm.set_enabled(False)
+    assert ksm.level is None
+    assert (read(tmp_path, "run"), read(tmp_path, "pages_to_scan"), read(tmp_path, "sleep_millisecs")) == (0, 100, 200)
+
+
+def test_boost_suppresses_the_next_adjust(tmp_path):
+    make_ksm(tmp_path)
+    ksm = KsmController(str(tmp_path), adjust_interval=3600)
+    ksm.set_enabled(True)
+    ksm.boost()
+    ksm.adjust(10, 80)
+    assert ksm.level == "high"
+
+
+def test_merge_is_recorded_only_for_clients_that_received_it(monkeypatch):
+    pytest.importorskip("psutil")
+    from memory_cleaner_logic import MemoryCleanerLogic
+
+    logic = MemoryCleanerLogic()
+    logic.rule_engine.set_rules([{"name": "worker", "ksm": True}])
+    logic.processes = [(10, "worker", 1), (11, "worker", 1)]
+    registered = {10}
+    monkeypatch.setattr(logic.cooperative, "registered_pids", lambda: set(registered))
+    monkeypatch.setattr(logic.cooperative, "request_merge", lambda pids: set(pids))
+    logic._manage_ksm("medium")
+    assert logic.ksm_requested == {10}
+    # 後から登録されたプロセスには次回に依頼する
+    registered.add(11)
+    logic._manage_ksm("medium")
+    assert logic.ksm_requested == {10, 11}
@@ -0,0 +1,29 @@
+import time
+import pytest
+
+pytest.importorskip("psutil")
+
+import launch_watcher
+from launch_watcher import LaunchWatcher
+
+
+def test_stop_then_start_does_not_revive_old_thread(monkeypatch):
+    monkeypatch.delattr(launch_watcher.socket, "AF_NETLINK", raising=False)
+    watcher = LaunchWatcher(lambda event: None, poll_interval=0.01)
+    watcher.set_rules([{"name": "game"}])
+    watcher.start()
+    old = watcher._thread
+    watcher.stop()
+    watcher.start()
+    try:
+        old.join(1.0)
+        assert not old.is_alive()
+        assert watcher._thread.is_alive() and watcher.mode == "poll"
+    finally:
+        watcher.stop()
+
+
+def test_start_without_rules_does_nothing():
+    watcher = LaunchWatcher(lambda event: None)
+    watcher.start()
+    assert not watcher.is_running and watcher.mode is None
@@ -0,0 +1,105 @@
+import ctypes
+import pytest
+from win_memory_api import (MemoryListApi, SYSTEM_MEMORY_LIST_INFORMATION_CLASS, MEMORY_EMPTY_WORKING_SETS,
+                            MEMORY_FLUSH_MODIFIED_LIST, MEMORY_PURGE_STANDBY_LIST, MEMORY_PURGE_LOW_PRIORITY_STANDBY_LIST)
+
+
+class FakeNtdll:
+    """NtSetSystemInformation に渡されたコマンドを記録する ntdll の代わり"""
+    def __init__(self):
+        self.commands = []
+        ntdll = self
+
+        class SetInformation:
+            restype = None
+
+            def __call__(self, info_class, ref, size):
+                assert info_class == SYSTEM_MEMORY_LIST_INFORMATION_CLASS
+                assert size == ctypes.sizeof(ctypes.c_ulong)
+                ntdll.commands.append(ref._obj.value)
+                return 0
+
+        class QueryInformation:
+            restype = None
+
+            def __call__(self, *args):
+                return -1 # 取得できない場合はスナップショットを psutil で取る
+
+        self.NtSetSystemInformation = SetInformation()
+        self.NtQuerySystemInformation = QueryInformation()
+
+
+def test_api_issues_one_command_per_call():
+    ntdll = FakeNtdll()
+    api = MemoryListApi(ntdll)
+    assert api.available
+    assert api.empty_working_sets()
+    assert api.flush_modified_list()
+    assert api.purge_standby_list()
+    assert api.purge_standby_list(low_priority_only=True)
+    assert api.query() is None
+    assert ntdll.commands == [MEMORY_EMPTY_WORKING_SETS, MEMORY_FLUSH_MODIFIED_LIST,
+                              MEMORY_PURGE_STANDBY_LIST, MEMORY_PURGE_LOW_PRIORITY_STANDBY_LIST]
+
+
+@pytest.fixture
+def logic(monkeypatch):
+    pytest.importorskip("psutil")
+    from memory_cleaner_logic import MemoryCleanerLogic
+    from swap_policy import SwapState
+
+    ntdll = FakeNtdll()
+    logic = MemoryCleanerLogic(memory_api=MemoryListApi(ntdll))
+    logic.ntdll = ntdll
+    logic.fast_mode = True
+    logic.refault_tracker.set_auto_exclusions([])
+    monkeypatch.setattr(logic, "_enable_privilege", lambda name: None)
+    monkeypatch.setattr(logic, "_sweep_processes", lambda: [])
+    monkeypatch.setattr(logic, "_clean_linux_processes", lambda: ntdll.commands.append("per-process"))
+    monkeypatch.setattr(logic.swap_monitor, "read", lambda: SwapState(0, 0, 0.0, None, None))
+    return logic
+
+
+def test_fast_mode_sequence(logic):
+    logic.execute(trigger="manual")
+    assert logic.ntdll.commands == [MEMORY_EMPTY_WORKING_SETS, MEMORY_FLUSH_MODIFIED_LIST, MEMORY_PURGE_STANDBY_LIST]
+
+
+def test_fast_mode_low_priority_standby(logic):
+    logic.low_priority_standby_only = True
+    logic.execute(trigger="manual")
+    assert logic.ntdll.commands[-1] == MEMORY_PURGE_LOW_PRIORITY_STANDBY_LIST
+
+
+def test_exclusions_fall_back_to_per_process_trim(logic):
+    logic.exclusion_list = ["game.exe"]
+    logic.execute(trigger="manual")
+    # 除外がある場合は一括解放を使わず、プロセスごとに解放してから変更済みリストとスタンバイリストを処理する
+    assert logic.ntdll.commands == ["per-process", MEMORY_FLUSH_MODIFIED_LIST, MEMORY_PURGE_STANDBY_LIST]
+
+
+def test_normal_mode_purges_standby_before_trimming(logic):
+    logic.fast_mode = False
+    logic.execute(trigger="manual")
+    assert logic.ntdll.commands == [MEMORY_PURGE_STANDBY_LIST, "per-process"]
+
+
+def test_saturated_swap_skips_run_and_replaces_last_report(logic, monkeypatch):
+    from swap_policy import SwapState, MODE_ABORT
+    logic.fast_mode = False
+    logic.execute(trigger="auto")
+    previous = logic.last_report
+    assert previous["working_set_mb"] is not None and "swap" not in previous
+
+    reports = []
+    logic.run_listeners.append(reports.append)
+    logic.ntdll.commands.clear()
+    monkeypatch.setattr(logic.swap_monitor, "read", lambda: SwapState(4096, 4000, 97.7, None, None))
+    assert logic.execute(trigger="fleet") == 0.0
+    # 何も解放せず、前回の結果の代わりに見送ったことを記録する
+    assert logic.ntdll.commands == []
+    assert logic.last_report is not previous
+    assert logic.last_report["trigger"] == "fleet" and logic.last_report["freed_mb"] == 0
+    assert logic.last_report["swap"]["mode"] == MODE_ABORT
+    assert "97.7%" in logic.last_report["swap"]["reason"]
+    assert reports == []
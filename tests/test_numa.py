@@ -0,0 +1,93 @@
+from numa import NumaMonitor, NodeStats, read_node_meminfo, read_numastat, pressured_node, reclaim_budget
+
+GB = 1024 ** 3
+
+
+def write_node(root, node, total_kb, free_kb, file_kb=0, numastat=None, reclaim=False):
+    path = root / f"node{node}"
+    path.mkdir()
+    lines = [
+        f"Node {node} MemTotal:       {total_kb} kB",
+        f"Node {node} MemFree:        {free_kb} kB",
+        f"Node {node} Active(file):   {file_kb // 2} kB",
+        f"Node {node} Inactive(file): {file_kb - file_kb // 2} kB",
+        f"Node {node} AnonPages:      1024 kB",
+        f"Node {node} HugePages_Total:     4",
+    ]
+    (path / "meminfo").write_text("\n".join(lines) + "\n")
+    if numastat is not None:
+        (path / "numastat").write_text("".join(f"{key} {value}\n" for key, value in numastat.items()))
+    if reclaim:
+        (path / "reclaim").write_text("")
+    return path
+
+
+def test_parses_node_meminfo_and_numastat(tmp_path):
+    path = write_node(tmp_path, 0, 16 * 1024 * 1024, 4 * 1024 * 1024, numastat={"numa_hit": 10, "numa_miss": 3})
+    meminfo = read_node_meminfo(str(path / "meminfo"))
+    assert meminfo["MemTotal"] == 16 * GB
+    assert meminfo["AnonPages"] == 1024 * 1024
+    assert meminfo["HugePages_Total"] == 4 # 件数は単位を付けない
+    assert read_numastat(str(path / "numastat")) == {"numa_hit": 10, "numa_miss": 3}
+    assert read_numastat(str(tmp_path / "missing")) == {}
+
+
+def test_node_stats_estimates_available_from_free_and_file(tmp_path):
+    stats = NodeStats(0, {"MemTotal": 10 * GB, "MemFree": 1 * GB, "Active(file)": 2 * GB, "SReclaimable": 2 * GB}, {})
+    assert stats.available == 1 * GB + 1 * GB + 1 * GB
+    assert stats.percent == 70.0
+
+
+def test_discovers_nodes_and_skips_memoryless_ones(tmp_path):
+    write_node(tmp_path, 0, 8 * 1024 * 1024, 1 * 1024 * 1024)
+    write_node(tmp_path, 1, 8 * 1024 * 1024, 6 * 1024 * 1024)
+    write_node(tmp_path, 2, 0, 0) # CPU のみのノード
+    (tmp_path / "node3").mkdir() # meminfo のないノード
+    (tmp_path / "possible").write_text("0-3\n")
+    monitor = NumaMonitor(str(tmp_path))
+    assert monitor.nodes == [0, 1, 2]
+    assert monitor.is_numa
+    assert [s.node for s in monitor.read()] == [0, 1]
+
+
+def test_single_node_is_not_numa(tmp_path):
+    write_node(tmp_path, 0, 8 * 1024 * 1024, 1 * 1024 * 1024)
+    assert not NumaMonitor(str(tmp_path)).is_numa
+    assert not NumaMonitor(str(tmp_path / "missing")).is_numa
+
+
+def test_pressured_node_picks_the_fullest_over_threshold(tmp_path):
+    write_node(tmp_path, 0, 8 * 1024 * 1024, 2 * 1024 * 1024) # 75%
+    write_node(tmp_path, 1, 8 * 1024 * 1024, 512 * 1024) # 93.8%
+    write_node(tmp_path, 2, 8 * 1024 * 1024, 256 * 1024) # 96.9%
+    stats = NumaMonitor(str(tmp_path)).read()
+    assert pressured_node(stats, 90).node == 2
+    assert pressured_node(stats, 97) is None
+
+
+def test_reclaim_budget_targets_threshold_minus_margin():
+    node = NodeStats(0, {"MemTotal": 100 * GB, "MemFree": 5 * GB}, {})
+    assert reclaim_budget(node, 90) == int(95 * GB - 85 * GB)
+    assert reclaim_budget(node, 100) == 256 * 1024 * 1024 # 下げる必要がなくても最小量は回収する
+
+
+def test_process_node_usage_and_ranges(tmp_path):
+    proc = tmp_path / "proc"
+    (proc / "42").mkdir(parents=True)
+    (proc / "42" / "numa_maps").write_text(
+        "7f0000000000 default anon=10 dirty=10 N0=6 N1=4 kernelpagesize_kB=4\n"
+        "7f1000000000 default file=/lib/libc.so mapped=3 N1=3 kernelpagesize_kB=4\n"
+        "7f2000000000 default huge anon=2 N0=2 kernelpagesize_kB=2048\n"
+    )
+    monitor = NumaMonitor(str(tmp_path / "nodes"), proc_root=str(proc))
+    assert monitor.process_node_usage(42) == {0: 6 * 4096 + 2 * 2048 * 1024, 1: 7 * 4096}
+    assert monitor.node_ranges(42, 1) == {0x7f0000000000, 0x7f1000000000}
+
+
+def test_reclaim_writes_amount_when_interface_exists(tmp_path):
+    path = write_node(tmp_path, 0, 8 * 1024 * 1024, 1 * 1024 * 1024, reclaim=True)
+    write_node(tmp_path, 1, 8 * 1024 * 1024, 1 * 1024 * 1024)
+    monitor = NumaMonitor(str(tmp_path))
+    assert monitor.reclaim(0, 64 * 1024 * 1024, swappiness=0) == 0
+    assert (path / "reclaim").read_text() == f"{64 * 1024 * 1024} swappiness=0"
+    assert monitor.reclaim(1, 64 * 1024 * 1024) is None
@@ -0,0 +1,106 @@
+import os
+import shutil
+
+import pytest
+
+import process_rules
+from process_rules import ProcessRuleEngine
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="cgroup v2 は Linux のみ")
+
+MB = 1024 * 1024
+
+
+def make_engine(root, rules):
+    engine = ProcessRuleEngine(cgroup_root=str(root))
+    engine.set_rules(rules)
+    return engine
+
+
+def test_limit_is_applied_per_process(tmp_path):
+    engine = make_engine(tmp_path, [{"name": "worker", "max_ws_mb": 256}])
+    rule = engine.match("worker")
+    engine.apply_cap(100, "worker", rule)
+    engine.apply_cap(200, "worker", rule)
+    parent = tmp_path / "memory_cleaner"
+    for pid in (100, 200):
+        group = parent / f"worker-{pid}"
+        assert (group / "memory.high").read_text() == str(256 * MB)
+        assert (group / "cgroup.procs").read_text() == str(pid)
+        assert not (group / "memory.max").exists()
+    assert (parent / "cgroup.subtree_control").read_text() == "+memory"
+    assert [outcome.detail for outcome in engine.outcomes] == ["soft 256 MB", "soft 256 MB"]
+
+
+def test_hard_limit_uses_memory_max(tmp_path):
+    engine = make_engine(tmp_path, [{"name": "game bin", "max_ws_mb": 512, "hard": True}])
+    engine.apply_cap(42, "game bin", engine.match("game bin"))
+    assert (tmp_path / "memory_cleaner" / "game_bin-42" / "memory.max").read_text() == str(512 * MB)
+
+
+def test_memory_controller_is_enabled_on_existing_parent(tmp_path):
+    parent = tmp_path / "memory_cleaner"
+    parent.mkdir()
+    (parent / "cgroup.subtree_control").write_text("cpu\n")
+    engine = make_engine(tmp_path, [{"name": "worker", "max_ws_mb": 256}])
+    engine.apply_cap(100, "worker", engine.match("worker"))
+    assert (parent / "cgroup.subtree_control").read_text() == "+memory"
+
+
+def test_memory_controller_already_enabled_is_not_rewritten(tmp_path):
+    parent = tmp_path / "memory_cleaner"
+    parent.mkdir()
+    (parent / "cgroup.subtree_control").write_text("cpu memory\n")
+    engine = make_engine(tmp_path, [{"name": "worker", "max_ws_mb": 256}])
+    engine.apply_cap(100, "worker", engine.match("worker"))
+    assert (parent / "cgroup.subtree_control").read_text() == "cpu memory\n"
+
+
+def test_cap_is_applied_once_per_process(tmp_path):
+    engine = make_engine(tmp_path, [{"name": "worker", "max_ws_mb": 256}])
+    rule = engine.match("worker")
+    engine.apply_cap(100, "worker", rule)
+    engine.apply_cap(100, "worker", rule)
+    assert len(engine.outcomes) == 1
+
+
+def test_prune_removes_cgroups_of_exited_processes(tmp_path, monkeypatch):
+    # cgroupfs ではインターフェースファイルが残ったまま rmdir できるため、それを再現する
+    rmdir = os.rmdir
+
+    def rmdir_cgroup(path):
+        for name in os.listdir(path):
+            os.unlink(os.path.join(path, name))
+        rmdir(path)
+
+    monkeypatch.setattr(process_rules.os, "rmdir", rmdir_cgroup)
+    engine = make_engine(tmp_path, [{"name": "worker", "max_ws_mb": 256}])
+    rule = engine.match("worker")
+    engine.apply_cap(100, "worker", rule)
+    engine.apply_cap(200, "worker", rule)
+    engine.prune({("worker", 200)})
+    parent = tmp_path / "memory_cleaner"
+    assert not (parent / "worker-100").exists()
+    assert (parent / "worker-200").is_dir()
+    # 再び現れた pid には上限を設定し直す
+    engine.apply_cap(100, "worker", rule)
+    assert (parent / "worker-100" / "cgroup.procs").read_text() == "100"
+
+
+def test_failed_removal_is_retried(tmp_path):
+    engine = make_engine(tmp_path, [{"name": "worker", "max_ws_mb": 256}])
+    engine.apply_cap(100, "worker", engine.match("worker"))
+    # 通常のディレクトリはファイルが残っていると削除できない (プロセスが残った cgroup と同じ扱い)
+    engine.prune(set())
+    assert engine._cgroups
+    shutil.rmtree(tmp_path / "memory_cleaner" / "worker-100")
+    engine.prune(set())
+    assert not engine._cgroups
+
+
+def test_limit_failure_is_reported(tmp_path):
+    (tmp_path / "memory_cleaner").write_text("")
+    engine = make_engine(tmp_path, [{"name": "worker", "max_ws_mb": 256}])
+    engine.apply_cap(100, "worker", engine.match("worker"))
+    outcome = engine.outcomes[0]
+    assert outcome.action == "limit" and not outcome.success
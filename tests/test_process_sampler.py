@@ -0,0 +1,25 @@
+import threading
+
+import pytest
+
+pytest.importorskip("psutil")
+
+from process_sampler import ProcessSampler
+
+
+def test_restart_does_not_revive_the_stopped_thread(monkeypatch):
+    sampler = ProcessSampler(interval=60.0)
+    sampled = threading.Event()
+    monkeypatch.setattr(sampler, "sample", sampled.set)
+    sampler.start()
+    assert sampled.wait(2.0)
+    old = sampler._thread
+    # 古いスレッドが待機から戻る前に再開しても、古いスレッドは終了する
+    sampler.stop()
+    sampler.start()
+    old.join(2.0)
+    assert not old.is_alive()
+    assert sampler.is_running and sampler._thread.is_alive()
+    sampler.stop()
+    sampler._thread.join(2.0)
+    assert not sampler.is_running and not sampler._thread.is_alive()
@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+pytest.importorskip("psutil")
+
+import refault_tracker
+from refault_tracker import RefaultTracker
+from fast_readers import PAGE_SIZE
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="偽の /proc を使う")
+
+MB = 1024 * 1024
+
+
+class FakeTimer:
+    """observe() が起動する観測タイマーを記録し、テストから観測期間の終了を呼び出す"""
+    started = []
+
+    def __init__(self, interval, function, args=()):
+        self.interval = interval
+        self.function = function
+        self.args = args
+        self.daemon = False
+
+    def start(self):
+        FakeTimer.started.append(self)
+
+    def fire(self):
+        self.function(*self.args)
+
+
+class FakeProc:
+    """/proc/<pid>/statm と /proc/<pid>/stat を持つ偽の procfs"""
+    def __init__(self, root):
+        self.root = root
+
+    def set(self, pid, name, rss, minflt=0, majflt=0):
+        path = self.root / str(pid)
+        path.mkdir(exist_ok=True)
+        pages = rss // PAGE_SIZE
+        (path / "statm").write_text(f"{pages * 2} {pages} 0 0 0 0 0\n")
+        (path / "stat").write_text(f"{pid} ({name}) S 1 1 1 0 -1 0 {minflt} 0 {majflt} 0 0 0\n")
+
+
+@pytest.fixture
+def proc(tmp_path, monkeypatch):
+    FakeTimer.started = []
+    monkeypatch.setattr(refault_tracker.threading, "Timer", FakeTimer)
+    return FakeProc(tmp_path)
+
+
+def trim_and_regrow(tracker, proc, pid, name, faults):
+    """100 MB から 10 MB に解放し、観測期間内に 100 MB まで戻る"""
+    proc.set(pid, name, 10 * MB)
+    tracker.observe([(pid, name, 100 * MB)])
+    timer = FakeTimer.started.pop()
+    proc.set(pid, name, 100 * MB, minflt=faults)
+    timer.fire()
+
+
+def test_fast_refaulting_process_is_auto_excluded(proc):
+    tracker = RefaultTracker(window=1.0, min_observations=2, proc_root=str(proc.root))
+    trim_and_regrow(tracker, proc, 10, "game", faults=500)
+    assert "game" not in tracker.auto_excluded
+    trim_and_regrow(tracker, proc, 10, "game", faults=500)
+    assert "game" in tracker.auto_excluded
+
+    tracker.begin_run()
+    assert tracker.should_skip(10, "game") == "auto_excluded"
+    assert tracker.should_skip(11, "game") == "auto_excluded"
+    assert tracker.skipped == [(10, "game", "auto_excluded"), (11, "game", "auto_excluded")]
+
+    # 除外を解除すると統計も初期化され、再び解放する
+    tracker.remove_auto_exclusion("game")
+    tracker.begin_run()
+    assert tracker.should_skip(10, "game") is None
+    assert tracker.report() == []
+
+
+def test_slow_regrowth_without_faults_is_only_downranked(proc):
+    tracker = RefaultTracker(window=1.0, min_observations=2, downrank_every=3, proc_root=str(proc.root))
+    trim_and_regrow(tracker, proc, 20, "daemon", faults=1)
+    trim_and_regrow(tracker, proc, 20, "daemon", faults=1)
+    assert "daemon" not in tracker.auto_excluded
+    assert tracker.report()[0][4] == "downranked"
+    assert tracker.has_skips
+
+    decisions = []
+    for _ in range(3):
+        tracker.begin_run()
+        decisions.append(tracker.should_skip(20, "daemon"))
+    # 3回に1回だけ解放する
+    assert decisions == ["downranked", "downranked", None]
+
+    tracker.clear_auto_exclusions()
+    assert not tracker.has_skips
+
+
+def test_processes_of_one_app_are_recorded_as_one_observation(proc):
+    tracker = RefaultTracker(window=2.0, proc_root=str(proc.root))
+    proc.set(30, "browser", 10 * MB)
+    proc.set(31, "browser", 10 * MB)
+    tracker.observe([(30, "browser", 100 * MB), (31, "browser", 50 * MB)])
+    proc.set(30, "browser", 10 * MB, minflt=10)
+    proc.set(31, "browser", 50 * MB, majflt=30)
+    FakeTimer.started.pop().fire()
+    name, ratio, fault_rate, observations, status = tracker.report()[0]
+    # 解放量 90 + 40 MB のうち 40 MB が戻った
+    assert (name, observations, status) == ("browser", 1, "normal")
+    assert ratio == pytest.approx(40 / 130)
+    assert fault_rate == pytest.approx(20.0)
+
+
+def test_small_trims_and_exited_processes_are_not_observed(proc):
+    tracker = RefaultTracker(window=1.0, min_trim_mb=1.0, proc_root=str(proc.root))
+    proc.set(40, "tiny", 100 * MB)
+    tracker.observe([(40, "tiny", 100 * MB), (41, "gone", 100 * MB), (42, "zero", 0)])
+    assert FakeTimer.started == []
@@ -0,0 +1,63 @@
+import json
+import socket
+
+import pytest
+
+import single_instance
+from single_instance import InstanceServer, forward_args
+
+
+def test_args_forwarded_during_startup_are_queued_until_registered():
+    server = InstanceServer(port=0)
+    assert server.acquire()
+    server.defer("args")
+    server.start()
+    try:
+        assert forward_args(["--free", "--unknown"], server.port)
+        received = []
+        server.register("args", lambda message, connection: received.append((message["args"], connection)))
+        assert received == [(["--free"], None)]
+        # 登録後はそのまま処理する
+        response = single_instance.send_message({"cmd": "args", "args": []}, server.port)
+        assert response["ok"] and "queued" not in response
+        assert received[-1][0] == [] and received[-1][1] is not None
+    finally:
+        server.close()
+
+
+def test_second_acquire_fails_while_held():
+    server = InstanceServer(port=0)
+    assert server.acquire()
+    try:
+        assert not InstanceServer(port=server.port).acquire()
+    finally:
+        server.close()
+
+
+def ipv6_loopback_available():
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as sock:
+            sock.bind(("::1", 0))
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+@pytest.mark.skipif(not ipv6_loopback_available(), reason="IPv6 のループバックがない")
+def test_listens_on_ipv6_loopback():
+    server = InstanceServer(port=0, host="::1")
+    assert server.acquire()
+    server.register("ping", lambda message, connection: {"pong": True})
+    server.start()
+    try:
+        with socket.create_connection(("::1", server.port), timeout=2.0) as sock:
+            sock.sendall(json.dumps({"cmd": "ping"}).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                response = json.loads(reader.readline())
+        assert response["pong"]
+    finally:
+        server.close()
+
+
+def test_unresolvable_host_is_not_acquired():
+    assert not InstanceServer(port=0, host="no-such-host.invalid").acquire()
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("psutil")
+
+from swap_policy import SwapPolicy, SwapState, read_vmstat_swap, MODE_NORMAL, MODE_CACHE_ONLY, MODE_ABORT
+
+MB = 1024 * 1024
+
+
+def state(percent, rate_mb=None, total=4096 * MB):
+    rate = None if rate_mb is None else rate_mb * MB / 2
+    return SwapState(total, int(total * percent / 100), percent, rate, rate)
+
+
+def test_no_swap_is_normal():
+    policy = SwapPolicy()
+    assert policy.decide(None) == (MODE_NORMAL, "no swap")
+    assert policy.decide(state(99.0, total=0))[0] == MODE_NORMAL
+
+
+def test_usage_thresholds():
+    policy = SwapPolicy(cache_only_percent=80, abort_percent=95)
+    mode, reason = policy.decide(state(10.0), "auto")
+    assert mode == MODE_NORMAL and reason.startswith("swap 10.0%")
+    assert policy.decide(state(85.0), "auto")[0] == MODE_CACHE_ONLY
+    mode, reason = policy.decide(state(96.0), "fleet")
+    assert mode == MODE_ABORT and "96.0% >= 95%" in reason
+
+
+def test_swap_io_rate_thresholds():
+    policy = SwapPolicy(cache_only_mb_s=8, abort_mb_s=64)
+    assert policy.decide(state(10.0, rate_mb=1), "auto")[0] == MODE_NORMAL
+    assert policy.decide(state(10.0, rate_mb=10), "auto")[0] == MODE_CACHE_ONLY
+    mode, reason = policy.decide(state(85.0, rate_mb=100), "auto")
+    # 使用率と入出力の両方の理由を記録し、厳しい方を選ぶ
+    assert mode == MODE_ABORT and "swap usage" in reason and "swap I/O" in reason
+
+
+def test_manual_run_is_downgraded_to_cache_only():
+    mode, reason = SwapPolicy().decide(state(99.0), "manual")
+    assert mode == MODE_CACHE_ONLY
+    assert reason.endswith("manual run downgraded to cache only")
+
+
+def test_read_vmstat_swap(tmp_path):
+    path = tmp_path / "vmstat"
+    path.write_text("nr_free_pages 100\npswpin 12\npswpout 34\n")
+    assert read_vmstat_swap(str(path)) == (12, 34)
+    path.write_text("nr_free_pages 100\n")
+    assert read_vmstat_swap(str(path)) is None
+    assert read_vmstat_swap(str(tmp_path / "missing")) is None
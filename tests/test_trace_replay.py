@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from trace_replay import TraceRecorder, ReplayPolicy, ReplaySimulator, read_trace
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+
+class FakeLists:
+    def __init__(self, free, standby, modified):
+        self.free = free
+        self.standby = standby
+        self.modified = modified
+
+
+class FakeSample:
+    def __init__(self, timestamp, percent, used, total=4 * GB, lists=None):
+        self.timestamp = timestamp
+        self.percent = percent
+        self.used = used
+        self.total = total
+        self.lists = lists
+
+
+def run_report(timestamp, trigger, freed_mb):
+    return {"timestamp": timestamp, "trigger": trigger, "freed_mb": freed_mb,
+            "working_set_mb": freed_mb, "standby_mb": 0.0, "modified_mb": 0.0}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "trace.mct")
+    recorder = TraceRecorder(path)
+    recorder.add_sample(FakeSample(100.0, 50.0, 2 * GB, lists=FakeLists(1 * GB, 512 * MB, 8 * MB)))
+    recorder.add_sample(FakeSample(110.0, 60.0, 2 * GB + 400 * MB))
+    recorder.add_run(run_report(105.0, "auto", 128.0))
+    recorder.add_run(run_report(108.0, "unknown", 1.0))
+    recorder.close()
+    assert recorder.records == 4
+
+    samples, runs = read_trace(path)
+    assert samples == [
+        (100.0, 50.0, 2 * GB, 4 * GB, 1 * GB, 512 * MB, 8 * MB),
+        (110.0, 60.0, 2 * GB + 400 * MB, 4 * GB, 0, 0, 0),
+    ]
+    assert runs == [(105.0, "auto", 128.0, 128.0, 0.0, 0.0), (108.0, "other", 1.0, 1.0, 0.0, 0.0)]
+
+
+def test_appending_adds_a_second_gzip_member(tmp_path):
+    path = str(tmp_path / "trace.mct")
+    first = TraceRecorder(path)
+    first.add_sample(FakeSample(200.0, 70.0, GB))
+    first.close()
+    second = TraceRecorder(path)
+    second.add_sample(FakeSample(100.0, 40.0, GB))
+    second.add_run(run_report(150.0, "launch", 64.0))
+    second.close()
+
+    samples, runs = read_trace(path)
+    # メンバーごとの先頭を読み飛ばし、時刻順に並べる
+    assert [sample[0] for sample in samples] == [100.0, 200.0]
+    assert runs == [(150.0, "launch", 64.0, 64.0, 0.0, 0.0)]
+
+
+def test_truncated_tail_is_tolerated(tmp_path):
+    path = str(tmp_path / "trace.mct")
+    recorder = TraceRecorder(path, flush_every=1)
+    for i in range(200):
+        recorder.add_sample(FakeSample(float(i), 50.0, GB))
+    recorder.close()
+    size = os.path.getsize(path)
+    # 終了時に書き込みが完了しなかった場合を再現する (末尾の CRC と途中のブロックが欠ける)
+    with open(path, "r+b") as f:
+        f.truncate(size - 40)
+
+    samples, _ = read_trace(path)
+    assert 0 < len(samples) < 200
+    assert [sample[0] for sample in samples] == [float(i) for i in range(len(samples))]
+
+
+def flat_trace(percent, duration=600, step=10, total=4 * GB):
+    used = int(total * percent / 100)
+    return [(float(ts), percent, used, total, 0, 0, 0) for ts in range(0, duration + 1, step)]
+
+
+def test_replay_without_freeing_counts_time_above_warning():
+    simulator = ReplaySimulator(flat_trace(90.0), [])
+    result = simulator.run(ReplayPolicy({"name": "none", "warning_threshold": 80}))
+    assert result["runs"] == 0
+    assert result["duration_sec"] == 600
+    assert result["above_warning_sec"] == 600
+    assert result["above_warning_ratio"] == 1.0
+    assert result["peak_percent"] == pytest.approx(90.0)
+
+
+def test_replay_interval_and_threshold_policies():
+    # トレースに解放がないため、1回の解放で使用量の 5% (default_yield) が減る
+    simulator = ReplaySimulator(flat_trace(82.0), [])
+    periodic, threshold = simulator.compare([
+        ReplayPolicy({"interval_min": 1, "warning_threshold": 80}),
+        ReplayPolicy({"free_above": 95, "warning_threshold": 80}),
+    ])
+    assert periodic["runs"] == 10 and periodic["runs_by_trigger"] == {"auto": 10}
+    # 最初の解放 (60 秒) までは警告閾値を超えていて、解放後は閾値を下回る
+    assert periodic["above_warning_sec"] == pytest.approx(60)
+    assert periodic["freed_mb"] > 0
+    assert threshold["runs"] == 0 and threshold["above_warning_sec"] == 600
+
+
+def test_policy_validation_and_names():
+    assert ReplayPolicy({"interval_min": 5, "free_above": 85}).name == "every 5 min, >= 85%"
+    with pytest.raises(ValueError):
+        ReplayPolicy({"interval_min": -1})
+    with pytest.raises(ValueError):
+        ReplaySimulator([], [])
+
+
+@pytest.mark.parametrize("trigger", ["predictive", "fleet", "numa"])
+def test_trigger_is_recorded(tmp_path, trigger):
+    path = str(tmp_path / "trace.mct")
+    recorder = TraceRecorder(path)
+    recorder.add_sample(FakeSample(100.0, 70.0, GB))
+    recorder.add_run(run_report(100.0, trigger, 256.0))
+    recorder.close()
+    assert read_trace(path)[1][0][1] == trigger
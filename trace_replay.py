@@ -0,0 +1,451 @@
+"""
+メモリ使用状況のトレースの記録と、解放ポリシーのオフライン再生
+
+TraceRecorder はサンプラーのサンプルと解放結果を固定長のレコードとして gzip 圧縮したファイルに追記する。
+ReplaySimulator は記録したトレースを模擬時間で再生し、定期解放や閾値による解放のポリシーごとに
+解放回数、警告閾値を超えていた時間、再フォールトの推定コストを求める。
+
+    python trace_replay.py trace.mct
+    python trace_replay.py trace.mct --policy '{"name": "5min", "interval_min": 5}' --policy '{"free_above": 85}'
+
+再生のモデル:
+    実際の解放の効果をトレースから差し引いた「解放しなかった場合の使用量」を求め、そこに各ポリシーの
+    解放の効果を重ねる。解放できるのは使用量の yield_ratio までで、1回の解放ではそのうちまだ解放して
+    いない分が減る (間隔を詰めるほど1回の解放量は小さくなる)。減った分のうち refault_ratio が時定数
+    refault_tau_sec で指数的に戻る (再フォールト)。各係数はトレース中の実際の解放から推定する。
+"""
+import gzip
+import json
+import math
+import zlib
+import time
+import struct
+import logging
+import argparse
+import threading
+from forecaster import UsageForecaster
+
+MAGIC = b"MCTR1\n" # ファイルの先頭 (形式のバージョンを含む)
+
+# レコード: 種別 (1バイト) + 時刻 (float64) + 本体
+# サンプル: 使用率 (float32)、使用量・総量・空き・スタンバイ・変更済み (KiB、uint32)
+_SAMPLE = struct.Struct("<cdfIIIII")
+# 解放結果: 契機 (uint8)、解放量・ワーキングセット・スタンバイ・変更済み (MB、float32)
+_RUN = struct.Struct("<cdBffff")
+_SAMPLE_TAG = b"S"
+_RUN_TAG = b"R"
+
+# 解放結果の契機 (コードは位置で決まるため、記録済みのトレースを読めるよう新しい契機は末尾に追加する)
+TRIGGERS = ("manual", "auto", "launch", "predictive", "fleet", "numa")
+
+_KIB = 1024
+_MB = 1024 * 1024
+
+
+def _kib(value):
+    """バイトを KiB (uint32 の範囲) に変換する"""
+    return min(0xFFFFFFFF, max(0, int(value or 0) // _KIB))
+
+
+class TraceRecorder:
+    """
+    サンプルと解放結果をトレースファイルに追記するクラス
+    サンプラーの listeners と MemoryCleanerLogic の run_listeners に登録して使う
+    """
+    def __init__(self, path, flush_every=60):
+        """
+        Args:
+            path (str): トレースファイルのパス (既存のファイルには追記する)
+            flush_every (int): 何レコードごとに圧縮ストリームをファイルに書き出すか
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.records = 0
+        self._pending = 0
+        self._lock = threading.Lock() # サンプル (UIスレッド) と解放結果 (解放スレッド) の排他
+        self._file = gzip.open(path, "ab")
+        # 追記の場合も gzip のメンバーごとに先頭を書き、読み込み時に読み飛ばす
+        self._file.write(MAGIC)
+
+    def add_sample(self, sample):
+        """サンプラーのサンプル (Sample) を記録する"""
+        lists = sample.lists
+        self._write(_SAMPLE.pack(
+            _SAMPLE_TAG, sample.timestamp, sample.percent, _kib(sample.used), _kib(sample.total),
+            _kib(lists.free if lists else 0), _kib(lists.standby if lists else 0), _kib(lists.modified if lists else 0),
+        ))
+
+    def add_run(self, report):
+        """解放結果 (MemoryCleanerLogic.execute() の結果) を記録する"""
+        trigger = report.get("trigger", "manual")
+        code = TRIGGERS.index(trigger) if trigger in TRIGGERS else 255
+        self._write(_RUN.pack(
+            _RUN_TAG, report["timestamp"], code, report["freed_mb"],
+            report["working_set_mb"], report["standby_mb"], report["modified_mb"],
+        ))
+
+    def _write(self, record):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(record)
+            self.records += 1
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self):
+        """書き込みを完了させてファイルを閉じる"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(path):
+    """
+    トレースファイルを読み込む
+    終了時に書き込みが完了しなかった末尾 (壊れたレコード) は読み飛ばす
+    Returns:
+        tuple: (samples, runs)
+            samples: (時刻, 使用率, 使用量, 総量, 空き, スタンバイ, 変更済み) のリスト (バイト)
+            runs: (時刻, 契機, 解放量 MB, ワーキングセット MB, スタンバイ MB, 変更済み MB) のリスト
+    """
+    data = _decompress(path)
+
+    samples = []
+    runs = []
+    pos = 0
+    size = len(data)
+    while pos < size:
+        if data.startswith(MAGIC, pos):
+            pos += len(MAGIC)
+            continue
+        tag = data[pos:pos + 1]
+        if tag == _SAMPLE_TAG and pos + _SAMPLE.size <= size:
+            _, ts, percent, used, total, free, standby, modified = _SAMPLE.unpack_from(data, pos)
+            samples.append((ts, percent, used * _KIB, total * _KIB, free * _KIB, standby * _KIB, modified * _KIB))
+            pos += _SAMPLE.size
+        elif tag == _RUN_TAG and pos + _RUN.size <= size:
+            _, ts, code, freed, ws, standby, modified = _RUN.unpack_from(data, pos)
+            trigger = TRIGGERS[code] if code < len(TRIGGERS) else "other"
+            runs.append((ts, trigger, freed, ws, standby, modified))
+            pos += _RUN.size
+        else:
+            break
+    samples.sort()
+    runs.sort()
+    return samples, runs
+
+
+def _decompress(path):
+    """
+    gzip のメンバーを順に展開して連結する
+    追記のたびに増えるメンバーと、書き込みが完了しなかった最後のメンバーの途中までを読み込む
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    chunks = []
+    while raw:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            chunks.append(decompressor.decompress(raw))
+        except zlib.error:
+            break
+        if not decompressor.eof:
+            break
+        raw = decompressor.unused_data
+    return b"".join(chunks)
+
+
+class ReplayPolicy:
+    """
+    再生する解放ポリシー (AutoFreeScheduler と同じく一定間隔で解放し、必要に応じて閾値でも解放する)
+    """
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): ポリシーの設定
+                {"name": "5min", "interval_min": 5, "warning_threshold": 80, "free_above": 85, "cooldown_sec": 120}
+                interval_min: 定期解放の間隔 (分、省略時は定期解放しない)
+                warning_threshold: 警告閾値 (%、閾値を超えていた時間の集計に使う)
+                free_above: 使用率がこの値 (%) 以上になったら解放する (省略時は閾値で解放しない)
+                cooldown_sec: 閾値・予測による解放の最短間隔 (秒)
+                predictive_horizon_sec: 使用率の予測がこの時間内に警告閾値に達する場合に解放する
+                    (予測による解放、省略時は予測しない)
+        Raises:
+            ValueError: 設定が不正な場合
+        """
+        interval = config.get("interval_min")
+        self.interval_sec = float(interval) * 60 if interval else None
+        self.warning_threshold = float(config.get("warning_threshold", 80))
+        free_above = config.get("free_above")
+        self.free_above = float(free_above) if free_above is not None else None
+        self.cooldown_sec = float(config.get("cooldown_sec", 60))
+        horizon = config.get("predictive_horizon_sec")
+        self.forecaster = UsageForecaster(horizon_sec=float(horizon)) if horizon else None
+        if self.interval_sec is not None and self.interval_sec <= 0:
+            raise ValueError("interval_min must be positive")
+        parts = []
+        if self.interval_sec is not None:
+            parts.append(f"every {self.interval_sec / 60:g} min")
+        if self.free_above is not None:
+            parts.append(f">= {self.free_above:g}%")
+        if self.forecaster is not None:
+            parts.append(f"forecast {self.forecaster.horizon_sec:g} s")
+        self.name = config.get("name") or (", ".join(parts) if parts else "none")
+        self._next_due = None
+        self._last_run = None
+
+    def reset(self, start):
+        """再生の開始時刻で状態を初期化する"""
+        self._next_due = start + self.interval_sec if self.interval_sec is not None else None
+        self._last_run = None
+        if self.forecaster is not None:
+            self.forecaster = UsageForecaster(horizon_sec=self.forecaster.horizon_sec)
+
+    def should_run(self, now, percent):
+        """
+        この時刻に解放するかどうかを返す
+        Returns:
+            str: 解放する場合は契機 ("auto" / "threshold" / "predictive")、しない場合は None
+        """
+        trigger = None
+        cooled = self._last_run is None or now - self._last_run >= self.cooldown_sec
+        if self.forecaster is not None:
+            self.forecaster.update(now, percent)
+        if self._next_due is not None and now >= self._next_due:
+            # サンプルの間隔が定期解放の間隔より長い場合も1回にまとめる
+            while self._next_due <= now:
+                self._next_due += self.interval_sec
+            trigger = "auto"
+        elif self.free_above is not None and percent >= self.free_above and cooled:
+            trigger = "threshold"
+        elif (self.forecaster is not None and percent < self.warning_threshold and cooled
+                and self.forecaster.will_cross(self.warning_threshold)):
+            trigger = "predictive"
+            self.forecaster.triggers += 1
+        if trigger is not None:
+            self._last_run = now
+            if self.forecaster is not None:
+                self.forecaster.on_run()
+        return trigger
+
+
+class _ReclaimEffect:
+    """
+    解放による使用量の減少分を追跡する (永続的に減った分と、再フォールトで戻りつつある分)
+    減衰を逐次更新するため、1サンプルあたり O(1) で求められる
+    """
+    __slots__ = ("refault_ratio", "tau", "permanent", "decaying", "timestamp")
+
+    def __init__(self, refault_ratio, tau):
+        self.refault_ratio = refault_ratio
+        self.tau = tau
+        self.permanent = 0.0
+        self.decaying = 0.0
+        self.timestamp = None
+
+    def advance(self, now, cap):
+        """
+        now 時点の減少分 (バイト) を返す
+        Args:
+            cap (float): 減少分の上限 (解放できる量。使用量が減った場合は解放済みの分も減る)
+        """
+        if self.timestamp is not None and now > self.timestamp:
+            self.decaying *= math.exp(-(now - self.timestamp) / self.tau)
+        self.timestamp = now
+        self.permanent = min(self.permanent, cap)
+        self.decaying = min(self.decaying, cap - self.permanent)
+        return self.permanent + self.decaying
+
+    def add(self, freed):
+        self.permanent += freed * (1 - self.refault_ratio)
+        self.decaying += freed * self.refault_ratio
+
+
+class ReplaySimulator:
+    """
+    トレースを模擬時間で再生し、ポリシーごとの結果を求めるクラス
+    """
+    def __init__(self, samples, runs, refault_window_sec=60, refault_ms_per_mb=5.0,
+                 default_yield=0.05, default_refault=0.5):
+        """
+        Args:
+            samples (list): read_trace() のサンプル
+            runs (list): read_trace() の解放結果
+            refault_window_sec (float): 解放後に使用量の戻りを観測する時間 (秒)
+            refault_ms_per_mb (float): 再フォールト 1 MB あたりの推定コスト (ミリ秒)
+            default_yield (float): トレースに解放がない場合の、1回の解放で減る使用量の割合
+            default_refault (float): トレースに解放がない場合の再フォールト率
+        """
+        if not samples:
+            raise ValueError("trace has no samples")
+        self.samples = samples
+        self.runs = runs
+        self.refault_window_sec = refault_window_sec
+        self.refault_tau = refault_window_sec / 3 # 観測時間内に約95%が戻る時定数
+        self.refault_ms_per_mb = refault_ms_per_mb
+        self.yield_ratio, self.refault_ratio = self._estimate(default_yield, default_refault)
+        self.organic = self._organic_usage()
+
+    def _used_at(self, ts):
+        """ts 以降で最初のサンプルの使用量を返す (なければ最後のサンプル)"""
+        lo, hi = 0, len(self.samples)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.samples[mid][0] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self.samples[min(lo, len(self.samples) - 1)][2]
+
+    def _estimate(self, default_yield, default_refault):
+        """
+        トレース中の解放から、1回の解放で減る使用量の割合と再フォールト率を推定する
+        再フォールト率 = 解放直後から観測時間後までの使用量の増加 / 解放量 (解放量を上限とする)
+        """
+        freed_total = 0.0
+        returned_total = 0.0
+        yields = []
+        for ts, _, freed_mb, *_ in self.runs:
+            freed = freed_mb * _MB
+            if freed <= 0:
+                continue
+            after = self._used_at(ts)
+            before = after + freed
+            yields.append(freed / before)
+            later = self._used_at(ts + self.refault_window_sec)
+            returned_total += min(freed, max(0.0, later - after))
+            freed_total += freed
+        if not yields:
+            return default_yield, default_refault
+        return min(0.9, sum(yields) / len(yields)), returned_total / freed_total
+
+    def _organic_usage(self):
+        """トレースから実際の解放の効果を除いた、解放しなかった場合の使用量 (バイト) を求める"""
+        effect = _ReclaimEffect(self.refault_ratio, self.refault_tau)
+        organic = []
+        run_index = 0
+        for ts, _, used, total, *_ in self.samples:
+            reduction = effect.advance(ts, used / (1 - self.yield_ratio) * self.yield_ratio)
+            organic.append(min(total, used + reduction))
+            while run_index < len(self.runs) and self.runs[run_index][0] <= ts:
+                effect.add(self.runs[run_index][2] * _MB)
+                run_index += 1
+        return organic
+
+    def run(self, policy):
+        """
+        1つのポリシーでトレースを再生する
+        Returns:
+            dict: {"policy", "runs", "runs_by_trigger", "freed_mb", "above_warning_sec",
+                   "above_warning_ratio", "peak_percent", "refault_mb", "refault_cost_sec", "duration_sec"}
+        """
+        effect = _ReclaimEffect(self.refault_ratio, self.refault_tau)
+        start = self.samples[0][0]
+        policy.reset(start)
+        runs_by_trigger = {}
+        freed_total = 0.0
+        above = 0.0
+        peak = 0.0
+        prev_ts = None
+        prev_above = False
+        for (ts, _, _, total, *_), organic in zip(self.samples, self.organic):
+            reclaimable = organic * self.yield_ratio
+            reduction = effect.advance(ts, reclaimable)
+            used = max(0.0, organic - reduction)
+            percent = used / total * 100 if total else 0.0
+            if prev_ts is not None and prev_above:
+                above += ts - prev_ts
+            trigger = policy.should_run(ts, percent)
+            if trigger is not None:
+                # 前回までの解放で減っている分は解放できない
+                freed = max(0.0, reclaimable - reduction)
+                effect.add(freed)
+                freed_total += freed
+                runs_by_trigger[trigger] = runs_by_trigger.get(trigger, 0) + 1
+                used -= freed
+                percent = used / total * 100 if total else 0.0
+            peak = max(peak, percent)
+            prev_ts = ts
+            prev_above = percent >= policy.warning_threshold
+
+        duration = self.samples[-1][0] - start
+        refault_mb = freed_total * self.refault_ratio / _MB
+        return {
+            "policy": policy.name,
+            "runs": sum(runs_by_trigger.values()),
+            "runs_by_trigger": runs_by_trigger,
+            "freed_mb": freed_total / _MB,
+            "above_warning_sec": above,
+            "above_warning_ratio": above / duration if duration > 0 else 0.0,
+            "peak_percent": peak,
+            "refault_mb": refault_mb,
+            "refault_cost_sec": refault_mb * self.refault_ms_per_mb / 1000,
+            "duration_sec": duration,
+        }
+
+    def compare(self, policies):
+        """複数のポリシーを再生して結果のリストを返す"""
+        return [self.run(policy) for policy in policies]
+
+
+def default_policies(config_path=None):
+    """
+    比較に使う既定のポリシーを返す
+    設定ファイルを指定した場合は、現在の設定 (警告閾値、定期解放の間隔) を先頭に加える
+    """
+    configs = []
+    warning = 80
+    if config_path:
+        try:
+            with open(config_path, "r") as f:
+                config = json.load(f)
+            warning = float(config.get("warning_threshold", warning))
+            configs.append({"name": "current", "interval_min": float(config.get("auto_free_interval", 1)), "warning_threshold": warning})
+        except (OSError, ValueError, TypeError):
+            pass
+    configs += [
+        {"name": "none", "warning_threshold": warning},
+        {"interval_min": 1, "warning_threshold": warning},
+        {"interval_min": 5, "warning_threshold": warning},
+        {"interval_min": 15, "warning_threshold": warning},
+        {"free_above": warning, "warning_threshold": warning, "cooldown_sec": 120},
+        {"predictive_horizon_sec": 120, "warning_threshold": warning},
+    ]
+    return [ReplayPolicy(config) for config in configs]
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="メモリ使用状況のトレースで解放ポリシーを比較する")
+    parser.add_argument("trace", help="トレースファイル (config.json の trace_file で記録)")
+    parser.add_argument("--policy", action="append", default=[], help="ポリシーの設定 (JSON、複数指定可)")
+    parser.add_argument("--config", help="現在の設定として比較に加える config.json")
+    parser.add_argument("--refault-window", type=float, default=60, help="再フォールトを観測する時間 (秒)")
+    parser.add_argument("--refault-ms-per-mb", type=float, default=5.0, help="再フォールト 1 MB あたりのコスト (ミリ秒)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    samples, runs = read_trace(args.trace)
+    simulator = ReplaySimulator(samples, runs, refault_window_sec=args.refault_window, refault_ms_per_mb=args.refault_ms_per_mb)
+    policies = [ReplayPolicy(json.loads(text)) for text in args.policy] or default_policies(args.config)
+
+    started = time.perf_counter()
+    results = simulator.compare(policies)
+    elapsed = time.perf_counter() - started
+    duration = results[0]["duration_sec"]
+
+    print(f"trace: {len(samples)} samples, {len(runs)} runs, {duration / 3600:.2f} h "
+          f"(yield {simulator.yield_ratio:.1%}, refault {simulator.refault_ratio:.1%})")
+    print(f"{'policy':<24}{'runs':>7}{'freed MB':>11}{'above warn':>12}{'peak %':>8}{'refault MB':>12}{'cost s':>8}")
+    for r in results:
+        print(f"{r['policy']:<24}{r['runs']:>7}{r['freed_mb']:>11.0f}{r['above_warning_ratio']:>11.1%} "
+              f"{r['peak_percent']:>7.1f}{r['refault_mb']:>12.0f}{r['refault_cost_sec']:>8.1f}")
+    speedup = duration * len(policies) / elapsed if elapsed > 0 else float("inf")
+    print(f"replayed {len(policies)} policies in {elapsed:.3f} s ({speedup:,.0f}x real time)")
+
+
+if __name__ == "__main__":
+    _main()
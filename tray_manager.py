@@ -14,6 +14,7 @@ class TrayManager:
         self.app = app
         self.icon = None
         self.thread = None
+        self.title = None # 現在のツールチップ (変化したときのみ更新する)
 
     @property
     def is_running(self):
@@ -33,6 +34,7 @@ class TrayManager:
             pystray.MenuItem("終了", self._handle_quit)
         )
         self.icon = pystray.Icon("MemoryCleaner", image, "メモリ解放ツール", menu)
+        self.title = None
         self.thread = threading.Thread(target=self.icon.run, daemon=True)
         self.thread.start()
 
@@ -43,12 +45,16 @@ class TrayManager:
             threading.Thread(target=self.icon.stop, daemon=True).start()
             self.icon = None # 後続の処理でis_runningがFalseになるように
 
-    def update(self, usage_percent):
+    def update(self, usage_percent, source="host"):
         """アイコンの画像とツールチップを更新する"""
         if self.is_running:
             # 負荷軽減のため、アイコン画像の動的更新は行わない
             # self.icon.icon = self._create_icon_image(usage_percent)
-            self.icon.title = f"メモリ使用率: {usage_percent}%"
+            suffix = " (コンテナ)" if source == "cgroup" else ""
+            title = f"メモリ使用率: {usage_percent}%{suffix}"
+            if title != self.title:
+                self.icon.title = title
+                self.title = title
 
     def notify(self, message, title):
         """トレイから通知を表示する"""
@@ -29,6 +29,9 @@ class UIBuilder:
 
         app.memory_progress = ttk.Progressbar(app.main_frame, orient="horizontal", length=300, mode="determinate")
         app.memory_progress.pack(pady=5)
+
+        # NUMA ノードごとの使用率 (NUMA 構成の場合のみ表示する)
+        app.numa_label = ttk.Label(app.main_frame, text="", font=("Helvetica", 9))
         
         # --- 手動解放エリア ---
         manual_free_button = ttk.Button(app.main_frame, text="今すぐメモリを解放", command=app.free_memory)
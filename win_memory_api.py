@@ -0,0 +1,108 @@
+import os
+import ctypes
+
+# SYSTEM_INFORMATION_CLASS
+SYSTEM_MEMORY_LIST_INFORMATION_CLASS = 80
+
+# SYSTEM_MEMORY_LIST_COMMAND
+MEMORY_EMPTY_WORKING_SETS = 2
+MEMORY_FLUSH_MODIFIED_LIST = 3
+MEMORY_PURGE_STANDBY_LIST = 4
+MEMORY_PURGE_LOW_PRIORITY_STANDBY_LIST = 5
+
+
+class SYSTEM_MEMORY_LIST_INFORMATION(ctypes.Structure):
+    """NtQuerySystemInformation(SystemMemoryListInformation) の結果 (単位はページ数)"""
+    _fields_ = [
+        ("ZeroPageCount", ctypes.c_size_t),
+        ("FreePageCount", ctypes.c_size_t),
+        ("ModifiedPageCount", ctypes.c_size_t),
+        ("ModifiedNoWritePageCount", ctypes.c_size_t),
+        ("BadPageCount", ctypes.c_size_t),
+        ("PageCountByPriority", ctypes.c_size_t * 8),
+        ("RepurposedPagesByPriority", ctypes.c_size_t * 8),
+        ("ModifiedPageCountPageFile", ctypes.c_size_t),
+    ]
+
+
+class MemoryListApi:
+    """
+    NtSetSystemInformation / NtQuerySystemInformation (SystemMemoryListInformation) のラッパー
+    ntdll を差し替えることで、Windows以外でもコマンドの発行順を検証できる
+    """
+    def __init__(self, ntdll=None):
+        """
+        Args:
+            ntdll: ntdll.dll の代わりに使用するオブジェクト (省略時は実際のDLLを読み込む)
+        """
+        self._ntdll = ntdll
+
+    @property
+    def available(self):
+        """メモリリスト操作が利用可能かどうかを返す"""
+        return self._ntdll is not None or os.name == 'nt'
+
+    def _get_ntdll(self):
+        if self._ntdll is None:
+            self._ntdll = ctypes.WinDLL('ntdll.dll')
+        return self._ntdll
+
+    def command(self, command):
+        """
+        メモリリストコマンドを1回のシステムコールで発行する
+        Args:
+            command (int): SYSTEM_MEMORY_LIST_COMMAND の値
+        Returns:
+            bool: NTSTATUS が成功を示した場合 True
+        """
+        if not self.available:
+            return False
+        NtSetSystemInformation = self._get_ntdll().NtSetSystemInformation
+        NtSetSystemInformation.restype = ctypes.c_long
+        value = ctypes.c_ulong(command)
+        status = NtSetSystemInformation(
+            SYSTEM_MEMORY_LIST_INFORMATION_CLASS,
+            ctypes.byref(value),
+            ctypes.sizeof(value)
+        )
+        return status is not None and status >= 0
+
+    def query(self):
+        """
+        各メモリリストのページ数を取得する
+        Returns:
+            SYSTEM_MEMORY_LIST_INFORMATION or None: 取得に失敗した場合は None
+        """
+        if not self.available:
+            return None
+        NtQuerySystemInformation = self._get_ntdll().NtQuerySystemInformation
+        NtQuerySystemInformation.restype = ctypes.c_long
+        info = SYSTEM_MEMORY_LIST_INFORMATION()
+        return_length = ctypes.c_ulong(0)
+        status = NtQuerySystemInformation(
+            SYSTEM_MEMORY_LIST_INFORMATION_CLASS,
+            ctypes.byref(info),
+            ctypes.sizeof(info),
+            ctypes.byref(return_length)
+        )
+        if status is None or status < 0:
+            return None
+        return info
+
+    def empty_working_sets(self):
+        """全プロセスのワーキングセットを空にする"""
+        return self.command(MEMORY_EMPTY_WORKING_SETS)
+
+    def flush_modified_list(self):
+        """変更済みページリストをディスクに書き出してスタンバイリストへ移す"""
+        return self.command(MEMORY_FLUSH_MODIFIED_LIST)
+
+    def purge_standby_list(self, low_priority_only=False):
+        """
+        スタンバイリストを解放する
+        Args:
+            low_priority_only (bool): 優先度の低いスタンバイページのみを解放する
+        """
+        if low_priority_only:
+            return self.command(MEMORY_PURGE_LOW_PRIORITY_STANDBY_LIST)
+        return self.command(MEMORY_PURGE_STANDBY_LIST)